@@ -0,0 +1,228 @@
+"""
+场景批量运行程序:
+对 (场景, 随机种子, 配置覆盖) 组成的任务矩阵，每个任务在独立的子进程中以无界面模式运行
+    - 端口 ：每个任务自动分配空闲的TraCI端口，多个SUMO可以同时运行
+    - 输出 ：每个任务有独立的数据库 Database/<任务名>.db、日志与SUMO错误日志 DEBUG_TSRL/batch/<任务名>*.log
+    - 摘要 ：任务结束后立即将耗时、每秒步数、碰撞车辆数返回父进程并打印，全部摘要另存为JSON Lines
+用法:
+    python Batch_Scenarios_Runner.py -s Forward_Collision_Warning bilbao --seeds 1 2 3 -j 4
+    python Batch_Scenarios_Runner.py -s roundabout --set DEAREA=30,50 --max-time 60
+    python Batch_Scenarios_Runner.py --matrix jobs.json -j 8
+matrix文件为任务列表，例如 [{"scenario": "bilbao", "seed": 1, "overrides": {"DEAREA": 30}}]
+"""
+import argparse
+import itertools
+import json
+import multiprocessing
+import os
+import queue
+import sys
+import time
+
+import yaml
+from sumolib.miscutils import getFreeSocketPort
+
+import logger
+from Classic_Scenarios_Selection import (file_paths, SCENARIO_EGO_IDS, run_model,
+                                         loc_config)
+
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# networkFiles 中的其他路网：(net.xml, rou.xml, 默认主车ID)
+MAP_FILES = {
+    "CarlaTown01": ("networkFiles/CarlaTown01/Town01.net.xml",
+                    "networkFiles/CarlaTown01/Town01.rou.xml", "0"),
+    "CarlaTown05": ("networkFiles/CarlaTown05/Town05.net.xml",
+                    "networkFiles/CarlaTown05/Town05.rou.xml", "0"),
+    "Ramp_Merging_and_Exiting": ("networkFiles/Ramp_Merging_and_Exiting/Ramp_Merging_and_Exiting.net.xml",
+                                 "networkFiles/Ramp_Merging_and_Exiting/Ramp_Merging_and_Exiting.rou.xml", "0"),
+    "bigInter": ("networkFiles/bigInter/bigInter.net.xml",
+                 "networkFiles/bigInter/bigInter.rou.xml", "0"),
+    "bilbao": ("networkFiles/bilbao/osm.net.xml",
+               "networkFiles/bilbao/osm.rou.xml", "0"),
+    "roundabout": ("networkFiles/roundabout/roundabout.net.xml",
+                   "networkFiles/roundabout/roundabout.rou.xml", "0"),
+}
+
+ALL_SCENARIOS = list(file_paths.keys()) + list(MAP_FILES.keys())
+
+
+def scenario_files(scenario):
+    """返回场景的 (net_file, rou_file, add_file, 默认主车ID)"""
+    if scenario in file_paths:
+        path_info = file_paths[scenario]
+        if len(path_info) == 3:
+            net_file, rou_file, add_file = path_info
+        else:
+            net_file, rou_file = path_info
+            add_file = None
+        return net_file, rou_file, add_file, SCENARIO_EGO_IDS.get(scenario, "AV_0")
+    net_file, rou_file, ego_id = MAP_FILES[scenario]
+    return net_file, rou_file, None, ego_id
+
+
+def build_jobs(scenarios, seeds, override_grid, max_time):
+    """场景 × 种子 × 配置覆盖 的笛卡尔积"""
+    keys = list(override_grid.keys())
+    override_sets = [dict(zip(keys, values))
+                     for values in itertools.product(*(override_grid[k] for k in keys))]
+    jobs = []
+    for scenario, seed, overrides in itertools.product(scenarios, seeds, override_sets):
+        jobs.append({"scenario": scenario, "seed": seed,
+                     "overrides": overrides, "max_time": max_time})
+    return jobs
+
+
+def parse_override(text):
+    """解析 KEY=V1,V2 形式的配置覆盖，取值按YAML标量解析"""
+    if '=' not in text:
+        raise argparse.ArgumentTypeError(f"配置覆盖应为 KEY=VALUE 形式: {text}")
+    key, values = text.split('=', 1)
+    return key, [yaml.safe_load(v) for v in values.split(',')]
+
+
+def run_job(job, result_queue):
+    """子进程入口：运行一个任务，并将摘要放入结果队列"""
+    name = job["name"]
+    batch_dir = job["log_dir"]
+    log_path = os.path.join(batch_dir, f"{name}.log")
+    # 子进程的标准输出（包括SUMO的输出）全部写入任务日志
+    log_stream = open(log_path, 'a', buffering=1, encoding='utf-8')
+    os.dup2(log_stream.fileno(), 1)
+    os.dup2(log_stream.fileno(), 2)
+    sys.stdout = sys.stderr = log_stream
+    logger.setup_app_level_logger(file_name=os.path.join(batch_dir, f"{name}.app.log"))
+
+    summary = {"job": name, "scenario": job["scenario"], "seed": job["seed"],
+               "overrides": job["overrides"], "status": "ok"}
+    try:
+        net_file, rou_file, add_file, ego_id = scenario_files(job["scenario"])
+        port = getFreeSocketPort()
+        summary["port"] = port
+        result = run_model(
+            scenario_name=name,  # 以任务名区分消息历史等按场景名存放的文件
+            net_file=net_file,
+            rou_file=rou_file,
+            add_file=add_file,
+            ego_veh_id=job.get("ego_id") or ego_id,
+            data_base=f"{name}.db",
+            SUMOGUI=0,
+            max_sim_time=job["max_time"],
+            if_clear_message_file=True,
+            headless=True,
+            port=port,
+            seed=job["seed"],
+            config_overrides=job["overrides"],
+            sumo_log=os.path.join(batch_dir, f"{name}.sumo.log")
+        )
+        result.pop("scenario", None)
+        summary.update(result)
+    except Exception as e:
+        summary["status"] = "error"
+        summary["error"] = str(e)
+    result_queue.put(summary)
+
+
+def run_batch(jobs, num_workers, log_dir, on_result=None):
+    """最多同时运行 num_workers 个子进程，每个任务完成后调用 on_result(summary)"""
+    ctx = multiprocessing.get_context('spawn')
+    result_queue = ctx.Queue()
+    os.makedirs(log_dir, exist_ok=True)
+    pending = list(enumerate(jobs))
+    running = {}  # 任务名 -> (Process, 任务)
+    summaries = []
+
+    while pending or running:
+        while pending and len(running) < num_workers:
+            idx, job = pending.pop(0)
+            job = dict(job, name=f"{idx:03d}_{job['scenario']}_seed{job['seed']}",
+                       log_dir=log_dir)
+            proc = ctx.Process(target=run_job, args=(job, result_queue), daemon=True)
+            proc.start()
+            running[job["name"]] = (proc, job)
+
+        try:
+            summary = result_queue.get(timeout=1.0)
+        except queue.Empty:
+            summary = None
+        if summary is not None:
+            proc, _ = running.pop(summary["job"])
+            proc.join()
+        else:
+            # 子进程异常退出（例如SUMO崩溃导致进程被杀死）时不会返回摘要
+            for name, (proc, job) in list(running.items()):
+                if not proc.is_alive() and result_queue.empty():
+                    running.pop(name)
+                    summary = {"job": name, "scenario": job["scenario"], "seed": job["seed"],
+                               "overrides": job["overrides"], "status": "crashed",
+                               "error": f"exit code {proc.exitcode}"}
+                    break
+        if summary is not None:
+            summaries.append(summary)
+            if on_result:
+                on_result(summary)
+    return summaries
+
+
+def print_summary(summary):
+    if summary["status"] == "ok":
+        print(f"{summary['job']:<48}{summary['steps']:>8}{summary['wall_time']:>12.2f}"
+              f"{summary['steps_per_sec']:>10.1f}{summary['collisions']:>12}", flush=True)
+    else:
+        print(f"{summary['job']:<48} {summary['status']}: {summary.get('error', '')}", flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='场景批量并行运行程序')
+    parser.add_argument('-s', '--scenario', type=str, nargs='*', choices=ALL_SCENARIOS,
+                        default=list(file_paths.keys()),
+                        help='参与运行的场景 (默认: 五个经典场景)')
+    parser.add_argument('--seeds', type=int, nargs='*', default=[None],
+                        help='SUMO随机种子列表 (默认: SUMO默认种子)')
+    parser.add_argument('--set', type=parse_override, action='append', default=[],
+                        dest='overrides', metavar='KEY=V1,V2',
+                        help='覆盖config.yaml中的配置项，多个取值组成参数网格')
+    parser.add_argument('--matrix', type=str, default=None,
+                        help='JSON任务列表文件，指定时忽略 -s/--seeds/--set')
+    parser.add_argument('--max-time', type=int, default=300,
+                        help='每个任务的最大仿真时间（秒） (默认: 300)')
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count(),
+                        help='同时运行的仿真数量 (默认: CPU核数)')
+    parser.add_argument('--output', type=str, default=None,
+                        help='摘要输出文件 (默认: DEBUG_TSRL/batch/summary_<时间>.jsonl)')
+    args = parser.parse_args()
+
+    os.chdir(PROJECT_ROOT)
+    if args.matrix:
+        with open(args.matrix, 'r', encoding='utf-8') as f:
+            jobs = json.load(f)
+        for job in jobs:
+            if job["scenario"] not in ALL_SCENARIOS:
+                parser.error(f"场景 {job['scenario']} 不存在")
+            job.setdefault("seed", None)
+            job.setdefault("overrides", {})
+            job.setdefault("max_time", args.max_time)
+    else:
+        jobs = build_jobs(args.scenario, args.seeds, dict(args.overrides), args.max_time)
+
+    log_dir = os.path.join(loc_config["LOC_DEBUG"], "batch")
+    output = args.output or os.path.join(
+        log_dir, time.strftime("summary_%Y-%m-%d_%H-%M-%S.jsonl"))
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    print(f"{len(jobs)} jobs, {args.jobs} workers, logs in {log_dir}")
+    print(f"{'job':<48}{'steps':>8}{'time [s]':>12}{'steps/s':>10}{'collisions':>12}")
+
+    t_start = time.perf_counter()
+    with open(output, 'w', encoding='utf-8') as f:
+        def on_result(summary):
+            print_summary(summary)
+            f.write(json.dumps(summary, ensure_ascii=False) + '\n')
+            f.flush()
+        summaries = run_batch(jobs, max(1, args.jobs), log_dir, on_result)
+    failed = sum(1 for s in summaries if s["status"] != "ok")
+    print(f"finished {len(summaries)} jobs in {time.perf_counter() - t_start:.1f}s, "
+          f"{failed} failed, summary written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -17,6 +17,7 @@ import sys
 import os
 import time
 import argparse
+import multiprocessing
 
 # 定义项目根目录
 PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
@@ -30,7 +31,11 @@ log_dir = loc_config["LOC_DEBUG"]
 if not os.path.exists(log_dir):
     os.makedirs(log_dir)
 log_file_path = os.path.join(log_dir, "app_debug_Classic_Scenarios.log")
-log = logger.setup_app_level_logger(file_name=log_file_path)
+if multiprocessing.parent_process() is None:
+    log = logger.setup_app_level_logger(file_name=log_file_path)
+else:
+    # 批量运行的子进程：日志文件由 Batch_Scenarios_Runner 为每个任务单独设置
+    log = logger.get_logger(__name__)
 
 # 场景名称常量
 SCENARIO_FORWARD_COLLISION = "Forward_Collision_Warning"
@@ -90,19 +95,30 @@ def run_model(
     carla_cosim=False,
     max_sim_time=300,  # 单位秒
     communication=True,  # 全局通信管理器
-    if_clear_message_file=True  # 是否清理消息文件本体
+    if_clear_message_file=True,  # 是否清理消息文件本体
+    headless=False,  # 无界面模式，不创建GUI也不绘制场景
+    port=8813,  # TraCI端口，None时自动分配
+    seed=None,  # SUMO随机种子
+    config_overrides=None,  # 覆盖config.yaml中的配置项
+    sumo_log="sumo_errors.log"  # SUMO错误日志文件
 ):
-    """运行指定场景的模拟"""
+    """运行指定场景的模拟，返回仿真步数、耗时、每秒步数、碰撞车辆数与数据库写入统计"""
     # 设置默认参数
     if data_base is None:
         data_base = f"{scenario_name}.db"
     if sim_note is None:
         sim_note = f"{scenario_name} simulation, ATSISP-v-1.0."
+    summary = {"scenario": scenario_name, "headless": headless, "steps": 0, "wall_time": 0.0,
+               "collisions": 0}
+    model = None
+    t_start = None  # 主循环开始的时间，初始化过程中出错时为 None
     
     try:
         # 加载配置文件
         from utils.load_config import load_config
         config = load_config(loc_config["LOC_CONFIG"])
+        if config_overrides:
+            config.update(config_overrides)
         log.info(f"Starting {scenario_name} simulation")
         
         model = Model(
@@ -117,12 +133,17 @@ def run_model(
             max_steps=int(max_sim_time * 10), # 将max_sim_time转换为步长
             communication=communication, # 全局通信管理器
             Scenario_Name=scenario_name, # 场景名称
-            config=config  # 传递配置信息
+            config=config,  # 传递配置信息
+            headless=headless,
+            port=port,
+            seed=seed,
+            sumoLog=sumo_log
         )
         model.start() # 初始化
-        planner = TrafficManager(model) # 初始化车辆规划模块
+        planner = TrafficManager(model, config=config) # 初始化车辆规划模块，与 Model 使用同一份配置
         # 清理消息文件or清理消息内容：
         model.clear_message_files(planner, if_clear_message_file)
+        t_start = time.perf_counter()
         # 主循环
         # 当自车未到达终点时，继续模拟
         while not model.tpEnd:
@@ -185,7 +206,7 @@ def run_model(
                         log.info(f"Frame {model.timeStep}: Completed planner.plan")
                         model.setTrajectories(trajectories) # 设置轨迹
                     else:
-                        model.ego.exitControlMode() # 退出控制模式
+                        model.ego.exitControlMode(model.cmdQueue) # 退出控制模式
                 model.updateVeh()
             except TraCIException as e:
                 log.error(f"TraCI error at step {model.timeStep}: {str(e)}")
@@ -199,8 +220,19 @@ def run_model(
         log.error(f"Error during model execution: {str(e)}")
         raise
     finally:
+        if model is not None and model.timeStep:
+            summary["steps"] = model.timeStep
+            if t_start is not None:
+                summary["wall_time"] = time.perf_counter() - t_start
+            summary["collisions"] = model.vehSub.collidingCnt
         traci.close()
+        if model is not None:
+            # 有界等待写线程写完剩余数据，并记录写入的背压统计
+            model.dataWriter.stop()
+            summary["db_writer"] = model.dataWriter.stats()
         log.info(f"{scenario_name} simulation ended")
+    summary["steps_per_sec"] = summary["steps"] / summary["wall_time"] if summary["wall_time"] else 0.0
+    return summary
 
 def main():
     """主函数：处理命令行参数并运行对应场景"""
@@ -240,6 +272,11 @@ def main():
         action='store_true',
         help='清理消息文件'
     )
+    parser.add_argument(
+        '--headless',
+        action='store_true',
+        help='无界面模式运行（不创建dearpygui界面）'
+    )
     args = parser.parse_args()
     try:
         # 获取场景对应的路网文件
@@ -281,7 +318,8 @@ def main():
             ego_veh_id=ego_veh_id,
             SUMOGUI=sumo_gui,
             max_sim_time=args.max_time,
-            if_clear_message_file=args.clear_messages
+            if_clear_message_file=args.clear_messages,
+            headless=args.headless
         )
         
     except Exception as e:
@@ -22,16 +22,21 @@ from add.display import NonBlockingInferenceWindow, NonBlockingVehicleDisplayWin
 from TSRL_interaction.vehicle_communication import Communicator, CommunicationManager, Message, MessageList, Performative
 class VehicleCommunicator(Communicator):
     """车辆通信器，负责车辆间通信"""
+    SPATIAL = True
+
     def __init__(self, vehicle_id, vehicle: 'control_Vehicle', communication_manager: CommunicationManager, if_egoCar: bool = False):
-        super().__init__(vehicle_id, communication_manager)
         self.if_egoCar = if_egoCar
         self.vehicle = vehicle
-        self.id = vehicle_id
         # 添加vehicles和roadgraph参数的存储
         self.vehicles = None
         self.roadgraph = None
-        # 注册到通信管理器
-        communication_manager.register(self)
+        # 注册到通信管理器（需要先设置vehicle以获得位置）
+        super().__init__(vehicle_id, communication_manager)
+
+    def position(self) -> Optional[tuple]:
+        """返回车辆当前位置"""
+        state = getattr(self.vehicle, 'current_state', None)
+        return (state.x, state.y) if state is not None else None
     
     # 添加设置vehicles和roadgraph的方法
     def set_context(self, vehicles: Dict[str, 'control_Vehicle'], roadgraph):
@@ -151,16 +156,22 @@ class VehicleCommunicator(Communicator):
 
 class RSUCommunicator(Communicator):
     """路侧单元通信器，负责路侧单元的通信"""
+    # 只接收需要RSU处理的广播
+    TOPICS = ("EmergencyStation", "InformationRequest2RSU")
+
     def __init__(self, rsu_id: str, rsu: 'control_RSU', communication_manager: CommunicationManager):
-        super().__init__(rsu_id, communication_manager)
-        self.id=rsu_id
         self.rsu = rsu
         self.category = self
         # 添加vehicles和roadgraph参数的存储
         self.vehicles = None
         self.roadgraph = None
         # 注册到通信管理器
-        communication_manager.register(self)
+        super().__init__(rsu_id, communication_manager)
+
+    def position(self) -> Optional[tuple]:
+        """返回RSU位置"""
+        state = getattr(self.rsu, 'current_state', None)
+        return (state.x, state.y) if state is not None else None
     
     # 添加设置vehicles和roadgraph的方法
     def set_context(self, vehicles: Dict[str, 'control_Vehicle'], roadgraph):
@@ -300,12 +311,13 @@ class RSUCommunicator(Communicator):
 
 class EnvCommunicator(Communicator):
     """环境通信器，负责环境信息的通信"""
+    # 只接收需要环境处理的广播
+    TOPICS = ("IsJunction",)
+
     def __init__(self, env_id: str, communication_manager: CommunicationManager):
-        super().__init__(env_id, communication_manager)
-        self.id = env_id
         self.environment_adapter = None
         # 注册到通信管理器
-        communication_manager.register(self)
+        super().__init__(env_id, communication_manager)
     
     def set_context(self, environment_adapter):
         """设置环境适配器"""
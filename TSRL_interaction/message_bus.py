@@ -0,0 +1,152 @@
+"""
+功能：通信管理器使用的内存消息总线
+MessageBus：
+    - 接收者索引 ：按交通主体ID建立字典索引，定向消息O(1)找到接收者
+    - 主题订阅   ：按述行词（Performative）与消息内容类型（EmergencyStation、InformationRequest2RSU、IsJunction等）订阅广播
+    - 空间订阅   ：只接收半径R内发送者的广播，按与路网geohash相同的100m网格索引接收者位置
+    - 历史记录   ：全局消息历史为有界环形缓冲区
+广播的投递代价只取决于感兴趣的接收者数量，而不是交通主体总数
+"""
+from __future__ import annotations
+import math
+import re
+from collections import deque
+from enum import Enum
+from typing import Deque, Dict, Iterable, List, Optional, Set, Tuple
+
+# 与 NetworkBuild 的 geohash 网格大小一致
+GEOHASH_SIZE = 100.0
+
+# 消息内容中 TSRL 语句的谓词名，例如 "EmergencyStation(v1);" -> EmergencyStation
+PREDICATE_RE = re.compile(r'([A-Za-z_]\w*)\s*\(')
+
+
+def content_types(content: str) -> Set[str]:
+    """返回消息内容中出现的全部谓词名，作为消息的内容类型"""
+    return set(PREDICATE_RE.findall(content or ""))
+
+
+def topic_key(topic) -> str:
+    """述行词与内容类型统一使用字符串作为主题"""
+    return topic.value if isinstance(topic, Enum) else str(topic)
+
+
+def geohash_id(x: float, y: float) -> Tuple[int, int]:
+    return int(x // GEOHASH_SIZE), int(y // GEOHASH_SIZE)
+
+
+class MessageBus:
+    """
+    按接收者的订阅方式投递消息。接收者可以：
+        - 接收全部广播（默认）
+        - 只接收 topics 中述行词或内容类型的广播
+        - 只接收 radius 米以内发送者的广播（没有位置的发送者视为全域广播）
+    同时指定 topics 与 radius 时，两者任一满足即投递。定向消息总是投递给目标接收者，
+    目标不存在时按广播处理。
+    """
+
+    def __init__(self, history_size: int = 1000):
+        self.receivers: Dict[str, object] = {} # 接收者ID -> 通信器
+        self.order: Dict[str, int] = {} # 接收者ID -> 注册顺序，保证投递顺序稳定
+        self.wildcard: Set[str] = set() # 接收全部广播的接收者
+        self.topics: Dict[str, Set[str]] = {} # 主题 -> 接收者ID
+        self.receiverTopics: Dict[str, Set[str]] = {} # 接收者ID -> 主题
+        self.radius: Dict[str, float] = {} # 空间订阅的接收者ID -> 半径
+        self.positions: Dict[str, Tuple[float, float]] = {} # 交通主体ID -> 位置
+        self.cells: Dict[Tuple[int, int], Set[str]] = {} # geohash -> 空间订阅的接收者ID
+        self.history: Deque = deque(maxlen=history_size) # 全局消息历史
+        self.deliveredCnt = 0 # 累计投递次数
+        self._seq = 0
+
+    def register(self, receiver_id: str, receiver, topics: Optional[Iterable] = None,
+                 radius: Optional[float] = None, position: Optional[Tuple[float, float]] = None):
+        """注册接收者，重复注册同一ID时替换原有的通信器与订阅"""
+        seq = self.order.get(receiver_id)
+        if seq is None:
+            seq = self._seq
+            self._seq += 1
+        else:
+            self.unregister(receiver_id)
+        self.receivers[receiver_id] = receiver
+        self.order[receiver_id] = seq
+        if not topics and radius is None:
+            self.wildcard.add(receiver_id)
+        for topic in topics or ():
+            self.subscribe(receiver_id, topic)
+        if radius is not None:
+            self.radius[receiver_id] = radius
+        if position is not None:
+            self.update_position(receiver_id, *position)
+
+    def unregister(self, receiver_id: str):
+        self.receivers.pop(receiver_id, None)
+        self.order.pop(receiver_id, None)
+        self.wildcard.discard(receiver_id)
+        for topic in self.receiverTopics.pop(receiver_id, ()):
+            self.topics[topic].discard(receiver_id)
+        self.radius.pop(receiver_id, None)
+        self._remove_from_cell(receiver_id)
+        self.positions.pop(receiver_id, None)
+
+    def subscribe(self, receiver_id: str, topic):
+        key = topic_key(topic)
+        self.topics.setdefault(key, set()).add(receiver_id)
+        self.receiverTopics.setdefault(receiver_id, set()).add(key)
+
+    def _remove_from_cell(self, receiver_id: str):
+        pos = self.positions.get(receiver_id)
+        if pos is not None:
+            cell = self.cells.get(geohash_id(*pos))
+            if cell:
+                cell.discard(receiver_id)
+
+    def update_position(self, agent_id: str, x: float, y: float):
+        """更新交通主体位置，空间订阅的接收者同时更新其geohash网格"""
+        if agent_id in self.radius:
+            self._remove_from_cell(agent_id)
+            self.cells.setdefault(geohash_id(x, y), set()).add(agent_id)
+        self.positions[agent_id] = (x, y)
+
+    def _nearby(self, x: float, y: float) -> Set[str]:
+        """返回把 (x, y) 处的发送者包含在订阅半径内的接收者"""
+        if not self.radius:
+            return set()
+        maxRadius = max(self.radius.values())
+        gx0, gy0 = geohash_id(x - maxRadius, y - maxRadius)
+        gx1, gy1 = geohash_id(x + maxRadius, y + maxRadius)
+        nearby = set()
+        for gx in range(gx0, gx1 + 1):
+            for gy in range(gy0, gy1 + 1):
+                for rid in self.cells.get((gx, gy), ()):
+                    rx, ry = self.positions[rid]
+                    if math.hypot(rx - x, ry - y) <= self.radius[rid]:
+                        nearby.add(rid)
+        return nearby
+
+    def recipients(self, message) -> List[str]:
+        """返回消息的接收者ID，按注册顺序排列"""
+        target = message.Receiver_id
+        if target in self.receivers:
+            return [target]
+        ids = set(self.wildcard)
+        for key in content_types(message.content) | {topic_key(message.performative)}:
+            ids |= self.topics.get(key, set())
+        senderPos = self.positions.get(message.sender_id)
+        if senderPos is None:
+            ids |= self.radius.keys()
+        else:
+            ids |= self._nearby(*senderPos)
+        ids.discard(message.sender_id)
+        return sorted(ids, key=self.order.__getitem__)
+
+    def publish(self, message) -> int:
+        """投递消息，返回投递次数"""
+        self.history.append(message)
+        recipients = self.recipients(message)
+        for rid in recipients:
+            receiver = self.receivers.get(rid)
+            # 接收者在处理消息时可能注销了其他接收者
+            if receiver is not None:
+                receiver.receive_message(message)
+        self.deliveredCnt += len(recipients)
+        return len(recipients)
@@ -0,0 +1,164 @@
+"""
+功能：只追加的消息历史日志
+MessageJournal：
+    - 追加写入 ：每条消息历史记录写为 message_journal.jsonl 中的一行，不再重写整个文件
+    - 尾部索引 ：内存中为每个交通主体保留最近 tail_size 条消息，读取最近K条为O(K)且不读磁盘
+    - 场景共享 ：同一场景的通信器与决策器通过 MessageJournal.for_scenario 共用一个实例
+    - 格式兼容 ：可与旧的 message_<ID>_history.txt 文本格式互相转换
+用法:
+    python -m TSRL_interaction.message_journal message_history/<场景名>           # txt -> jsonl
+    python -m TSRL_interaction.message_journal message_history/<场景名> --export  # jsonl -> txt
+"""
+from __future__ import annotations
+import argparse
+import glob
+import json
+import os
+import re
+import threading
+from collections import deque
+from typing import Deque, Dict, List, Optional
+
+import logger
+
+JOURNAL_FILE = "message_journal.jsonl"
+TXT_PATTERN = "message_*_history.txt"
+
+
+class MessageJournal:
+    """某个场景目录下的消息历史日志，所有交通主体的消息历史写入同一个文件"""
+    _journals: Dict[str, MessageJournal] = {}
+
+    def __init__(self, loc: str, tail_size: int = 200):
+        self.loc = loc
+        self.file_path = os.path.join(loc, JOURNAL_FILE)
+        self.tail_size = tail_size # 每个交通主体在内存中保留的消息数
+        self.tails: Dict[str, Deque[str]] = {} # 交通主体ID -> 最近的消息内容
+        self.logger = logger.get_logger(__name__)
+        self._lock = threading.Lock()
+        os.makedirs(loc, exist_ok=True)
+        self._load()
+        self._file = open(self.file_path, "a", encoding="utf-8", buffering=1)
+
+    @classmethod
+    def for_scenario(cls, Scenario_Name: str) -> MessageJournal:
+        """返回场景对应的日志实例（message_history/<场景名>），不存在时创建"""
+        loc = os.path.join("message_history", str(Scenario_Name))
+        key = os.path.abspath(loc)
+        if key not in cls._journals:
+            cls._journals[key] = cls(loc)
+        return cls._journals[key]
+
+    def _load(self):
+        """从已有的日志文件重建尾部索引"""
+        if not os.path.exists(self.file_path):
+            return
+        with open(self.file_path, "r", encoding="utf-8") as file:
+            for line in file:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue # 跳过写入中断产生的不完整行
+                self._tail(record["owner"]).append(record["content"])
+
+    def _tail(self, owner: str) -> Deque[str]:
+        tail = self.tails.get(owner)
+        if tail is None:
+            tail = self.tails[owner] = deque(maxlen=self.tail_size)
+        return tail
+
+    def append(self, owner: str, message) -> None:
+        """将一条消息追加到 owner 的消息历史中"""
+        record = {
+            "owner": owner,
+            "time": message.timestamp,
+            "sender": message.sender_id,
+            "receiver": message.Receiver_id,
+            "performative": str(getattr(message.performative, "value", message.performative)),
+            "message_id": message.message_id,
+            "content": message.content,
+        }
+        with self._lock:
+            self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+            self._tail(owner).append(message.content)
+
+    def last(self, owner: str, k: Optional[int] = None) -> List[str]:
+        """返回 owner 最近的 k 条非空消息内容（k 为空时返回内存中保留的全部消息）"""
+        tail = self.tails.get(owner)
+        if not tail:
+            return []
+        messages = []
+        for content in reversed(tail):
+            content = content.strip()
+            if content:
+                messages.append(content)
+                if k and len(messages) == k:
+                    break
+        messages.reverse()
+        return messages
+
+    def clear(self) -> None:
+        """清空日志文件与尾部索引"""
+        with self._lock:
+            self._file.truncate(0)
+            self.tails.clear()
+
+    def close(self) -> None:
+        self._file.close()
+        self._journals.pop(os.path.abspath(self.loc), None)
+
+    def import_txt(self) -> int:
+        """将目录中旧格式的 message_<ID>_history.txt 追加到日志，返回导入的消息数"""
+        cnt = 0
+        for file_path in sorted(glob.glob(os.path.join(self.loc, TXT_PATTERN))):
+            owner = re.match(r"message_(.*)_history\.txt$", os.path.basename(file_path)).group(1)
+            with open(file_path, "r", encoding="utf-8") as file:
+                contents = [line.strip() for line in file if line.strip()]
+            with self._lock:
+                for content in contents:
+                    record = {"owner": owner, "time": None, "sender": None, "receiver": None,
+                              "performative": None, "message_id": None, "content": content}
+                    self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+                    self._tail(owner).append(content)
+            cnt += len(contents)
+            self.logger.info(f"Imported {len(contents)} messages from {file_path}")
+        return cnt
+
+    def export_txt(self) -> int:
+        """将日志按交通主体写出为旧格式的 message_<ID>_history.txt，返回写出的文件数"""
+        self._file.flush()
+        histories: Dict[str, List[str]] = {}
+        with open(self.file_path, "r", encoding="utf-8") as file:
+            for line in file:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                histories.setdefault(record["owner"], []).append(record["content"])
+        for owner, contents in histories.items():
+            file_path = os.path.join(self.loc, f"message_{owner}_history.txt")
+            with open(file_path, "w", encoding="utf-8") as file:
+                for content in contents:
+                    file.write(f"{content}\n")
+        return len(histories)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='消息历史日志与旧txt格式的转换工具')
+    parser.add_argument('loc', type=str, help='消息历史目录，例如 message_history/<场景名>')
+    parser.add_argument('--export', action='store_true',
+                        help='将日志写出为 message_<ID>_history.txt (默认: 将txt导入日志)')
+    args = parser.parse_args()
+
+    journal = MessageJournal(args.loc)
+    if args.export:
+        cnt = journal.export_txt()
+        print(f"{cnt} history files written to {args.loc}")
+    else:
+        cnt = journal.import_txt()
+        print(f"{cnt} messages imported into {journal.file_path}")
+    journal.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+测试通信半径（COMM_RADIUS）内的广播投递随接收者的移动而变化
+功能：
+1. 接收者驶出发送者的通信半径后不再收到广播
+2. 注册时在半径外的接收者驶入半径后开始收到广播
+用法: python -m pytest TSRL_interaction/test_comm_radius.py 或 python TSRL_interaction/test_comm_radius.py
+"""
+import os
+import shutil
+import sys
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, PROJECT_ROOT)
+
+from TSRL_interaction.vehicle_communication import CommunicationManager, Message, Performative
+
+SCENARIO = "test_comm_radius"
+COMM_RADIUS = 50.0
+
+
+class FakeVehicleCommunicator:
+    """只含通信管理器用到的属性的车辆通信器"""
+    SPATIAL = True
+    TOPICS = None
+
+    def __init__(self, agent_id, x, y):
+        self.id = agent_id
+        self.x, self.y = x, y
+        self.received = []
+
+    def position(self):
+        return self.x, self.y
+
+    def receive_message(self, message):
+        self.received.append(message.content)
+
+
+def broadcast(manager, sender, content):
+    manager.send_message(Message(sender.id, "Vehicle", "", "Vehicle", content, Performative.Inform))
+
+
+def make_manager():
+    return CommunicationManager(SCENARIO, comm_radius=COMM_RADIUS)
+
+
+def teardown_module(module=None):
+    shutil.rmtree(os.path.join("message_history", SCENARIO), ignore_errors=True)
+
+
+def test_receiver_moves_out_of_range():
+    manager = make_manager()
+    sender = FakeVehicleCommunicator("S", 0.0, 0.0)
+    receiver = FakeVehicleCommunicator("R", 10.0, 0.0)
+    manager.register(sender)
+    manager.register(receiver)
+    broadcast(manager, sender, "EmergencyStation(S);")
+    assert receiver.received == ["EmergencyStation(S);"]
+
+    # 接收者驶离到半径之外（跨过多个geohash网格）
+    receiver.x = 500.0
+    manager.update_positions({"S": sender.position(), "R": receiver.position()})
+    broadcast(manager, sender, "EmergencyStation(S);")
+    assert receiver.received == ["EmergencyStation(S);"]
+
+
+def test_receiver_moves_into_range():
+    manager = make_manager()
+    sender = FakeVehicleCommunicator("S", 0.0, 0.0)
+    receiver = FakeVehicleCommunicator("R", 1000.0, 0.0)
+    manager.register(sender)
+    manager.register(receiver)
+    broadcast(manager, sender, "IsJunction(J1);")
+    assert receiver.received == []
+
+    receiver.x = 30.0
+    manager.update_positions({"S": sender.position(), "R": receiver.position()})
+    broadcast(manager, sender, "IsJunction(J1);")
+    assert receiver.received == ["IsJunction(J1);"]
+
+
+def test_sender_moves():
+    manager = make_manager()
+    sender = FakeVehicleCommunicator("S", 0.0, 0.0)
+    receiver = FakeVehicleCommunicator("R", 300.0, 0.0)
+    manager.register(sender)
+    manager.register(receiver)
+    broadcast(manager, sender, "IsJunction(J1);")
+    assert receiver.received == []
+
+    sender.x = 280.0
+    manager.update_positions({"S": sender.position(), "R": receiver.position()})
+    broadcast(manager, sender, "IsJunction(J1);")
+    assert receiver.received == ["IsJunction(J1);"]
+
+
+if __name__ == "__main__":
+    try:
+        test_receiver_moves_out_of_range()
+        test_receiver_moves_into_range()
+        test_sender_moves()
+        print("ok")
+    finally:
+        teardown_module()
@@ -17,6 +17,8 @@ import logger
 from logger import Logger
 from enum import Enum
 from add.display import NonBlockingInferenceWindow, NonBlockingVehicleDisplayWindow
+from TSRL_interaction.message_journal import MessageJournal
+from TSRL_interaction.message_bus import MessageBus
 
 # 迁移回vehicle_communication.py的核心通信类
 class Performative(str, Enum):
@@ -104,6 +106,7 @@ class Message:
 class MessageList:
     def __init__(self):
         self.message_list: List[Message] = []
+        self.saved_count = 0 # 已写入消息历史日志的消息数
     
     # 定义方法：将消息添加到列表
     def append_message(self, message: Message):
@@ -116,29 +119,33 @@ class MessageList:
         for msg in self.message_list:
             print(f"{msg.sender_id} -> {msg.Receiver_id}: {msg.content}\n")
     
-    # 定义方法：将当前车辆的消息列表保存到当前文件夹的文本文档中
-    def save_message_list(self, vehicle_id: str, loc: str):
-        """将消息列表保存到当前文件夹的文本文档中"""
-        # 确保路径存在
-        os.makedirs(loc, exist_ok=True)
-        file_path = os.path.join(loc, f"message_{vehicle_id}_history.txt")
-        with open(file_path, "a") as file:
-            # 9.18 先将当前文件中的消息列表清空
-            file.truncate(0)
-            for msg in self.message_list:
-                # file.write(f"{msg.sender_id} -> {msg.Receiver_id}: {msg.content}\n")
-                file.write(f"{msg.content}\n")
+    # 定义方法：将当前车辆尚未保存的消息追加到消息历史日志中
+    def save_message_list(self, vehicle_id: str, journal: MessageJournal):
+        """将尚未保存的消息追加到消息历史日志（只追加，不重写）"""
+        for msg in self.message_list[self.saved_count:]:
+            journal.append(vehicle_id, msg)
+        self.saved_count = len(self.message_list)
 
 class Communicator:
     """基础通信器，作为其他通信器的基类"""
+    # 订阅的广播主题（述行词或消息内容类型），为空时接收全部广播
+    TOPICS: tuple = ()
+    # 是否使用空间订阅（只接收通信半径内发送者的广播）
+    SPATIAL: bool = False
+
     def __init__(self, id: str, communication_manager: CommunicationManager):
         self.id = id  # 交通主体ID
         self.communication_manager = communication_manager  # 通信管理器
         self.message_history: MessageList = MessageList()  # 消息历史列表
         self.logger = logger.get_logger(__name__)  # 日志记录器
         self.Scenario_Name = self.communication_manager.Scenario_Name
+        self.journal = self.communication_manager.journal  # 场景消息历史日志
         communication_manager.register(self)
 
+    def position(self) -> Optional[tuple]:
+        """返回交通主体当前位置 (x, y)，没有位置时返回None"""
+        return None
+
     def _save_display_text(self, content: str):
         """保存显示文本到文件"""
         # 确保目录存在
@@ -149,47 +156,46 @@ class Communicator:
 
     def _save_message_history(self):
         """保存消息历史到文件"""
-        # 将消息列表在message_history文件夹中的文本文件中打印出来
-        self.message_history.save_message_list(self.id, loc=f"message_history/{self.Scenario_Name}")
+        # 将新消息追加到message_history文件夹中的消息历史日志
+        self.message_history.save_message_list(self.id, self.journal)
     
 class CommunicationManager:
     """通信管理器，负责消息路由和分发"""
-    def __init__(self, Scenario_Name: str):
-        self.subscribers: Dict[str, Communicator] = {} # 订阅者列表
+    def __init__(self, Scenario_Name: str, comm_radius: Optional[float] = None, history_size: int = 1000):
+        self.bus = MessageBus(history_size) # 消息总线
+        self.subscribers: Dict[str, Communicator] = self.bus.receivers # 订阅者列表
         self.logger = logger.get_logger(__name__)# 日志记录器
-        self.message_history: List[Message] = [] # 全局消息历史记录列表
+        self.message_history = self.bus.history # 全局消息历史记录（有界）
         self.Scenario_Name = Scenario_Name
+        self.comm_radius = comm_radius # 车辆只接收该半径内发送者的广播，None时接收全部广播
+        self.journal = MessageJournal.for_scenario(Scenario_Name) # 场景消息历史日志
 
     def register(self, communicator: Communicator):
         """将通信器注册在通信管理器"""
-        self.subscribers[communicator.id] = communicator
-    
-    # def register_vehicle(self, vehicle: VehicleCommunicator):
-    #     """将车辆注册在通信管理器"""
-    #     self.subscribers[vehicle.vehicle_id] = vehicle
-    
-    # def register_rsu(self, rsu: RSUCommunicator):
-    #     """将RSU注册在通信管理器"""
-    #     self.subscribers[rsu.rsu_id] = rsu
+        radius = self.comm_radius if communicator.SPATIAL else None
+        self.bus.register(communicator.id, communicator, topics=communicator.TOPICS,
+                          radius=radius, position=communicator.position())
+
+    def update_positions(self, positions: Dict[str, tuple]):
+        """刷新已注册交通主体的位置 {ID: (x, y)}，每个仿真步调用，空间订阅的接收者随之更换网格"""
+        if self.comm_radius is None:
+            return
+        for agent_id, position in positions.items():
+            if agent_id in self.subscribers and position is not None:
+                self.bus.update_position(agent_id, *position)
 
     def send_message(self, message: Message):
         """发送消息并路由到接收者"""
         # 记录消息到日志
         self.logger.info(f"Message sent: {message.sender_category}{message.sender_id} -> {message.Receiver_category}{message.Receiver_id}: {message.content}")
-        # 直接发送给目标接收者
-        target_found = False
-        for subscriber_id, subscriber in self.subscribers.items():
-            # 检查接收者ID是否匹配
-            if subscriber_id == message.Receiver_id:
-                # 发送消息给匹配的接收者，不检查类别
-                subscriber.receive_message(message)
-                target_found = True
-                break
-        # 如果没有找到特定接收者，广播给所有通信器（除了发送者本身）
-        if not target_found:
-            for communicator_id, communicator in self.subscribers.items():
-                if communicator_id != message.sender_id:
-                    communicator.receive_message(message)
+        # 空间订阅需要发送者的位置：车辆位置由 update_positions 每步刷新，其余发送者在首次发送时取其位置
+        if self.comm_radius is not None and message.sender_id not in self.bus.positions:
+            sender = self.subscribers.get(message.sender_id)
+            position = sender.position() if sender is not None else None
+            if position is not None:
+                self.bus.update_position(message.sender_id, *position)
+        # 定向消息直接投递给接收者；没有找到特定接收者时，投递给订阅了该广播的通信器（除了发送者本身）
+        self.bus.publish(message)
     
     # 8.19 新增方法：删除所有消息历史文件
     def cleanup_message_files(self):
@@ -207,6 +213,7 @@ class CommunicationManager:
                     self.logger.error(f"Deleting {file_path} Error: {e}")
                     
             self.logger.info(f"{len(files_to_remove)} message_history files deleted")
+            self.journal.clear()
         except Exception as e:
             self.logger.error(f"Error deleting message_history files: {e}")
 
@@ -229,6 +236,7 @@ class CommunicationManager:
                     self.logger.error(f"Error clearing content of {file_path}: {e}")
                     
             self.logger.info(f"{len(files_to_clear)} message_history files content cleared")
+            self.journal.clear()
         except Exception as e:
             self.logger.error(f"Error clearing message_history files content: {e}")
     
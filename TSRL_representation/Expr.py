@@ -51,18 +51,41 @@ class ExprVisitor(ABC):
 
 class Expr:
     # base class for all AST nodes.
+    # 节点构造后不再修改 op 与 args，哈希值在第一次使用时计算并缓存
+    __slots__ = ('op', 'args', 'token', '_hash', '__weakref__')
 
     def __init__(self, op:str,token=None, *args):
         self.op = str(op)
         self.args = args
         self.token = token
+        self._hash = None
 
     def __eq__(self, other):
         """x == y' evaluates to True or False; does not build an Expr."""
-        return isinstance(other, Expr) and self.op == other.op and self.args == other.args
+        if self is other:
+            return True
+        if not isinstance(other, Expr):
+            return False
+        if self._hash is not None and other._hash is not None and self._hash != other._hash:
+            return False
+        return self.op == other.op and self.args == other.args
 
     def __hash__(self):
-        return hash(self.op) ^ hash(self.args)
+        h = self._hash
+        if h is None:
+            h = self._hash = hash(self.op) ^ hash(self.args)
+        return h
+
+    def __getstate__(self):
+        # 字符串的哈希值随进程的哈希种子变化，缓存的 _hash 不写入 pickle，加载后重新计算
+        return {name: getattr(self, name)
+                for cls in type(self).__mro__ for name in getattr(cls, '__slots__', ())
+                if name not in ('_hash', '__weakref__') and hasattr(self, name)}
+
+    def __setstate__(self, state):
+        self._hash = None
+        for name, value in state.items():
+            setattr(self, name, value)
 
     def __repr__(self):
         op = self.op
@@ -82,6 +105,8 @@ class Expr:
         pass
 
 class Implication(Expr):
+    __slots__ = ()
+
     def __init__(self,token=None, *args): #在args中条件在前，结论在后
         super().__init__(':-', *args)
         self.args = args
@@ -91,6 +116,8 @@ class Implication(Expr):
         return visitor.visitImplicationExpr(self)
 
 class Predicate(Expr):
+    __slots__ = ()
+
     def __init__(self,op:str,token=None, *args):
         super().__init__(op, token,*args)
 
@@ -103,6 +130,8 @@ class Binary(Expr):
     """
     所有的+-*/表达式均为二元表达式，二元表达式的前项和后项必须是可计算的表达式。
     """
+    __slots__ = ('left', 'right', 'operator')
+
     def __init__(self, left: Expr, op:str, operator: Token, right: Expr, ):
         super().__init__(op, operator,left, right)
         self.left = left
@@ -114,6 +143,8 @@ class Binary(Expr):
 
 class Literal(Expr):
     #Represents a literal expression.
+    __slots__ = ('value',)
+
     def __init__(self, value: object, op: Token, *args):
       super().__init__(op.lexeme,op, *args)
       self.value = value
@@ -122,6 +153,8 @@ class Literal(Expr):
         return visitor.visitLiteral(self)
 
 class Logical(Expr):
+    __slots__ = ('left', 'operator', 'right')
+
     def __init__(self, left:Expr, operator: Token, right:Expr):
         super().__init__(operator.lexeme, operator,left, right)
         self.left = left
@@ -133,6 +166,8 @@ class Logical(Expr):
 
 class Unary(Expr):
     #Represents a unary expression.
+    __slots__ = ('operator', 'right')
+
     def __init__(self, operator: Token, right: Expr ):
         super().__init__(operator.lexeme,operator, right)
         self.operator = operator
@@ -142,6 +177,8 @@ class Unary(Expr):
         return visitor.visitUnary(self)
 
 class Variable(Expr):
+    __slots__ = ('name',)
+
     def __init__(self, op:str,name=None, *args):
         super().__init__(op,name, *args)
         self.name = name
@@ -150,9 +187,26 @@ class Variable(Expr):
         return visitor.visitVariableExpr(self)
 
 class Constant(Expr):
+    __slots__ = ('name',)
+
     def __init__(self, op:str,name=None, *args):
         super().__init__(op,name, *args)
         self.name = name
 
     def accept(self, visitor: ExprVisitor):
         return visitor.visitConstantExpr(self)
+
+
+# 推理引擎构造的无 token 节点的唯一实例表（hash-consing），超过上限时清空
+INTERN_TABLE_SIZE = 100000
+_interned = {}
+
+def intern_expr(op: str, args: tuple) -> Expr:
+    """返回 op 与 args 相同的唯一 Expr 节点，相同的子句共享同一对象，比较时可直接按 is 判断"""
+    key = (op, args)
+    node = _interned.get(key)
+    if node is None:
+        if len(_interned) >= INTERN_TABLE_SIZE:
+            _interned.clear()
+        node = _interned[key] = Expr(op, None, *args)
+    return node
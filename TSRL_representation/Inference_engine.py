@@ -3,11 +3,13 @@ import os
 # 添加当前目录到Python路径
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
+import bisect
+import copy
+import heapq
 import itertools
-import random
 
 import RuntimeError
-from Expr import Expr,Predicate,Variable,Constant
+from Expr import Expr,Predicate,Variable,Constant,intern_expr
 from Tokentype import Token
 
 
@@ -21,27 +23,6 @@ def extend(s, var, val):
     """Copy dict s and extend it by setting var to val; return copy."""
     return {**s, var: val}
 
-#生成 长整数
-class UniqueEightDigitGenerator:
-    def __init__(self):
-        self.generated = set()
-        # 计算总共可能的组合数：9 * 10^7
-        self.total_possible = 90000000
-
-    def generate(self):
-        """生成一个不重复的8位随机整数"""
-        if len(self.generated) >= self.total_possible:
-            raise RuntimeError("已生成所有可能的8位整数")
-
-        while True:
-            # 生成10000000到99999999之间的随机整数
-            num = random.randint(10000000, 99999999)
-
-            if num not in self.generated:
-                self.generated.add(num)
-                return num
-
-
 class KB:
 
     def __init__(self, sentence=None):
@@ -183,7 +164,14 @@ def vars_elimination(x, s):
         return x
     if is_variable(x):
         return s.get(x, x)
-    return Expr(x.op, None,*[vars_elimination(arg, s) for arg in x.args])
+    return _rebuild(x, [vars_elimination(arg, s) for arg in x.args])
+
+def _rebuild(x, args):
+    """参数都未改变时返回 x 本身（结构共享），否则返回唯一的新节点"""
+    for new, old in zip(args, x.args):
+        if new is not old:
+            return intern_expr(x.op, tuple(args))
+    return x
 
 #变量标准化
 def standardize_variables(sentence:Expr, dic=None):
@@ -197,24 +185,27 @@ def standardize_variables(sentence:Expr, dic=None):
     if not isinstance(sentence, Expr):
         return sentence
     # elif is_var_symbol(sentence.op):
-    elif is_variable(sentence):
+    elif isinstance(sentence, Variable):  # 同 is_variable
         if sentence in dic:
             return dic[sentence]
         else:
-            # v = Variable('v_{}'.format(next(standardize_variables.counter)),
-            #              Token(sentence.token.type,'v_{}'.format(next(standardize_variables.counter)),sentence.token.literal,sentence.token.line))
-            v_iden = generator.generate()
-            v = Variable('v_{}'.format(v_iden),
-                         Token(sentence.token.type,'v_{}'.format(v_iden),sentence.token.literal,sentence.token.line))
+            # 编号补足8位，与 AskResult 中过滤标准化变量（v_ 开头且长度大于9）的规则一致
+            name = 'v_{:08d}'.format(next(standardize_variables.counter))
+            token = sentence.token
+            v = Variable(name, Token(token.type, name, token.literal, token.line) if token else None)
             dic[sentence] = v
             return v
-    elif is_constant(sentence):
+    elif isinstance(sentence, Constant) or not sentence.args:
         return sentence
     else:
-        return Predicate(sentence.op, sentence.token, *[standardize_variables(a, dic) for a in sentence.args])
+        args = [standardize_variables(a, dic) for a in sentence.args]
+        for new, old in zip(args, sentence.args):
+            if new is not old:
+                return Predicate(sentence.op, sentence.token, *args)
+        return sentence  # 不含变量
 
-# standardize_variables.counter = itertools.count()
-generator = UniqueEightDigitGenerator()
+# 单调递增的编号，不会重复，也不需要保存已用过的编号
+standardize_variables.counter = itertools.count(1)
 
 def term_reduction(x, y, s):
     """Apply term reduction to x and y if both are functions and the two root function
@@ -235,11 +226,11 @@ def occur_check(var, x, s):
     如果变量 var 出现在 x 的任何位置（或者如果 s 中有对 x 的绑定，则出现在对 x 应用替换 s 后的结果中），则返回 true。"""
     if var == x:
         return True
-    elif is_variable(x) and x in s:
-        return occur_check(var, s[x], s)
+    elif is_variable(x):
+        return x in s and occur_check(var, s[x], s)
     elif isinstance(x, Expr):
-        return (occur_check(var, x.op, s) or
-                occur_check(var, x.args, s))
+        # 谓词名是字符串，不会等于变量，只需检查参数
+        return any(occur_check(var, arg, s) for arg in x.args)
     elif isinstance(x, (list, tuple)):
         return first(e for e in x if occur_check(var, e, s))
     else:
@@ -256,10 +247,12 @@ def subst(s, x):
         return tuple([subst(s, xi) for xi in x])
     elif not isinstance(x, Expr):
         return x
-    elif is_var_symbol(x.op):
+    elif x.op[:1].islower():  # 同 is_var_symbol(x.op)
         return s.get(x, x)
+    elif not s or not x.args:
+        return x
     else:
-        return Expr(x.op, None,*[subst(s, arg) for arg in x.args])
+        return _rebuild(x, [subst(s, arg) for arg in x.args])
 
 #合一算法，生成置换字典
 def unify_mm(x, y, s={}):
@@ -320,6 +313,150 @@ def unify_mm(x, y, s={}):
         set_eq = s.copy()
 
 
+#判断表达式中是否不含变量
+def is_ground(x):
+    return not any(is_variable(e) for e in subexpressions(x))
+
+#带回溯记录的置换
+class Bindings(dict):
+    """
+    可以原地撤销的置换，本身是 变量 -> 项 的字典，可直接用于 subst 等接受置换的函数。
+    变量可以绑定到另一个变量，取值时沿绑定链解引用（deref），不在每一步展开整个置换；
+    trail 按顺序记录加入绑定的变量，回溯时用 undo(mark) 删除 mark 之后的绑定，不复制字典。
+    """
+    __slots__ = ('trail',)
+
+    def __init__(self):
+        super().__init__()
+        self.trail = []
+
+    def bind(self, var, value):
+        self[var] = value
+        self.trail.append(var)
+
+    def mark(self):
+        return len(self.trail)
+
+    def undo(self, mark):
+        trail = self.trail
+        while len(trail) > mark:
+            del self[trail.pop()]
+
+    def deref(self, x):
+        """沿绑定链找到 x 最终绑定的项，未绑定的变量返回其本身"""
+        while isinstance(x, Variable):
+            value = self.get(x)
+            if value is None:
+                return x
+            x = value
+        return x
+
+    def resolve(self, x):
+        """代入全部绑定后的 x，没有变化的子项保持原对象"""
+        x = self.deref(x)
+        if not isinstance(x, Expr) or not x.args:
+            return x
+        return _rebuild(x, [self.resolve(arg) for arg in x.args])
+
+    def occurs(self, var, x):
+        x = self.deref(x)
+        if x is var or isinstance(x, Variable) and x == var:
+            return True
+        return isinstance(x, Expr) and any(self.occurs(var, arg) for arg in x.args)
+
+#基于回溯记录的合一算法
+def unify_trail(x, y, bindings, occurs_check=False):
+    """
+    在 bindings 上原地合一 x 与 y，成功返回 True；失败时撤销本次加入的绑定并返回 False。
+    与 unify_mm 得到的置换等价，但不复制置换字典；occurs_check 为 False 时不做出现检查
+    （TSRL 中的参数都是常量或变量，不会构造出含自身的项）。
+    """
+    mark = bindings.mark()
+    stack = [(x, y)]
+    while stack:
+        x, y = stack.pop()
+        x, y = bindings.deref(x), bindings.deref(y)
+        if x is y:
+            continue
+        if isinstance(x, Variable):
+            if isinstance(y, Variable) and x == y:
+                # 同名的变量对象是同一个变量（字典键相同），绑定到自身会使 deref 死循环
+                continue
+            if occurs_check and bindings.occurs(x, y):
+                break
+            bindings.bind(x, y)
+        elif isinstance(y, Variable):
+            if occurs_check and bindings.occurs(y, x):
+                break
+            bindings.bind(y, x)
+        elif isinstance(x, Expr) and isinstance(y, Expr):
+            if x.op != y.op or len(x.args) != len(y.args):
+                break
+            if x.args and x != y:
+                stack.extend(zip(reversed(x.args), reversed(y.args)))
+        elif x != y:
+            break
+    else:
+        return True
+    bindings.undo(mark)
+    return False
+
+#子句头部谓词的索引
+class ClauseIndex:
+    """同一 (谓词, 参数个数) 的子句，按加入顺序保存，并以各位置上不含变量的参数做二级索引"""
+
+    def __init__(self, arity):
+        self.all = {}  # seq -> clause
+        self.seqs = {}  # clause -> 与其相等的子句的 seq 列表（递增），删除时不必扫描 all
+        # 第 i 个参数（不含变量） -> {seq: clause}
+        self.by_arg = [{} for _ in range(arity)]
+        # 第 i 个参数含变量的子句 seq -> clause，可与任意取值合一
+        self.var_arg = [{} for _ in range(arity)]
+
+    def add(self, seq, clause, head):
+        self.all[seq] = clause
+        self.seqs.setdefault(clause, []).append(seq)
+        for i, arg in enumerate(head.args):
+            if is_ground(arg):
+                self.by_arg[i].setdefault(arg, {})[seq] = clause
+            else:
+                self.var_arg[i][seq] = clause
+
+    def remove(self, clause, head):
+        # 与原来按加入顺序查找一致，删除最早加入的相等子句
+        seqs = self.seqs[clause]
+        seq = seqs.pop(0)
+        if not seqs:
+            del self.seqs[clause]
+        del self.all[seq]
+        for i, arg in enumerate(head.args):
+            if is_ground(arg):
+                bucket = self.by_arg[i][arg]
+                del bucket[seq]
+                if not bucket:
+                    del self.by_arg[i][arg]
+            else:
+                del self.var_arg[i][seq]
+
+    def candidates(self, goal):
+        """可能与 goal 合一的子句，保持加入顺序"""
+        best = None
+        # 选择候选子句最少的不含变量的参数位置
+        for i, arg in enumerate(goal.args):
+            if not is_ground(arg):
+                continue
+            matched = self.by_arg[i].get(arg, {})
+            size = len(matched) + len(self.var_arg[i])
+            if best is None or size < best[0]:
+                best = (size, matched, self.var_arg[i])
+        if best is None:
+            return list(self.all.values())
+        _, matched, unbound = best
+        if not unbound:
+            return list(matched.values())
+        return [c for _, c in heapq.merge(matched.items(), unbound.items())]
+
+
 class FolKB(KB):
     """A knowledge base consisting of first-order definite clauses.
     >>> kb0 = FolKB([Expr('Farmer',Expr('Mac')),Expr('Rabbit',Expr('Pete')),
@@ -330,35 +467,121 @@ class FolKB(KB):
     Flopsie
     >>> kb0.ask(Expr('Wife',Expr('Pete'),Expr('x')))
     False
+
+    tabling 为 True 时使用带表的反向链接（fol_bc_ask_tabled），子目标的答案保存在 self.tables 中，
+    在多次询问之间复用，加入或删除子句时失效依赖该谓词的答案表
+    unifier 为 'trail' 时反向链接使用 unify_trail（fol_bc_ask_trail），'mm' 时使用 unify_mm
     """
+    occurs_check = False  # unify_trail 是否做出现检查
 
-    def __init__(self, clauses=None):
+    def __init__(self, clauses=None, tabling=False, unifier='mm'):
         super().__init__()
-        self.clauses = []  # inefficient: no indexing
+        if unifier not in ('mm', 'trail'):
+            raise ValueError('Unknown unifier: {}'.format(unifier))
+        self.unifier = unifier
+        self.clauses = []  # 按加入顺序保存的全部子句
+        self.index = {}  # (谓词, 参数个数) -> ClauseIndex
+        self.ground_facts = set()  # 不含变量的事实的 id，推理时无需标准化变量
+        self.seq = itertools.count()
+        self.tables = AnswerTables() if tabling else None
         if clauses:
             for clause in clauses:
                 self.tell(clause)
 
+    @staticmethod
+    def clause_head(sentence):
+        return parse_definite_clause(sentence)[1]
+
     #只接受一阶确定子句
     def tell(self, sentence):
         if is_definite_clause(sentence):
             self.clauses.append(sentence)
+            head = self.clause_head(sentence)
+            key = (head.op, len(head.args))
+            if key not in self.index:
+                self.index[key] = ClauseIndex(len(head.args))
+            self.index[key].add(next(self.seq), sentence, head)
+            if is_symbol(sentence.op) and is_ground(sentence):
+                self.ground_facts.add(id(sentence))
+            if self.tables is not None:
+                self.tables.invalidate(key)
         else:
             # raise Exception('Not a definite clause: {}'.format(sentence))
             raise RuntimeError.CustomRuntimeError(sentence.token, 'Not a definite clause: {}'.format(sentence))
 
     def ask_generator(self, query):
+        if self.unifier == 'trail':
+            return fol_bc_ask_trail(self, query)
+        if self.tables is not None:
+            return fol_bc_ask_tabled(self, query)
         return fol_bc_ask(self, query)
 
     def retract(self, sentence):
         self.clauses.remove(sentence)
+        head = self.clause_head(sentence)
+        key = (head.op, len(head.args))
+        self.index[key].remove(sentence, head)
+        self.ground_facts.discard(id(sentence))
+        if self.tables is not None:
+            self.tables.invalidate(key)
+
+    def is_ground_fact(self, sentence):
+        return id(sentence) in self.ground_facts
 
     def fetch_rules_for_goal(self, goal):
-        return self.clauses
+        """只返回头部谓词和参数个数与 goal 相同、且常量参数可能匹配的子句"""
+        if is_variable(goal):
+            return list(self.clauses)
+        bucket = self.index.get((goal.op, len(goal.args)))
+        if bucket is None:
+            return []
+        return bucket.candidates(goal)
+
+
+class OverlayKB(FolKB):
+    """
+    叠加在只读基础知识库 base 上的知识库。tell 只加入本知识库，询问时先取本知识库的子句，再取 base 的子句，
+    例如把每辆车的消息事实叠加在编译好的规则上，而不复制或修改规则库。
+    答案表只随本知识库的子句失效，base 在使用期间应保持不变。
+    """
+
+    def __init__(self, base=None, clauses=None, tabling=False, unifier='mm'):
+        self.base = base
+        super().__init__(clauses, tabling, unifier)
+
+    def on(self, base):
+        """返回叠加在另一个基础知识库上的视图，与本知识库共享子句与索引，答案表独立"""
+        view = copy.copy(self)
+        view.base = base
+        if self.tables is not None:
+            view.tables = AnswerTables()
+        return view
+
+    def is_ground_fact(self, sentence):
+        return (super().is_ground_fact(sentence) or
+                (self.base is not None and self.base.is_ground_fact(sentence)))
+
+    def fetch_rules_for_goal(self, goal):
+        rules = super().fetch_rules_for_goal(goal)
+        if self.base is None:
+            return rules
+        return rules + self.base.fetch_rules_for_goal(goal)
 
 #前向链接
-def fol_fc_ask(kb, alpha):
-    # TODO: improve efficiency
+def fol_fc_ask(kb, alpha, strategy='naive'):
+    """
+    前向链接，逐个产生使 alpha 成立的置换，推出的新事实会加入 kb
+    strategy: 'naive' 对规则中的变量枚举知识库中全部常量的笛卡尔积；
+              'semi_naive' 半朴素求值，按索引连接规则前提，见 fol_fc_ask_semi_naive
+    """
+    if strategy == 'naive':
+        return fol_fc_ask_naive(kb, alpha)
+    if strategy == 'semi_naive':
+        return fol_fc_ask_semi_naive(kb, alpha)
+    raise ValueError('Unknown forward chaining strategy: {}'.format(strategy))
+
+def fol_fc_ask_naive(kb, alpha):
+    # 置换数量随常量个数按变量个数次方增长，事实较多时使用 fol_fc_ask_semi_naive
     kb_consts = list({c for clause in kb.clauses for c in constant_symbols(clause)}) # 返回不重复的常量列表
 
     def enum_subst(p):
@@ -394,6 +617,307 @@ def fol_fc_ask(kb, alpha):
             kb.tell(clause)
     return None
 
+#事实关系
+class FactRelation:
+    """
+    同一 (谓词, 参数个数) 的不含变量的事实，参数元组按加入顺序保存，并对每个位置上的参数建立索引。
+    前向链接的每一轮只追加，所以旧事实、上一轮新推出的事实(delta)都是 rows 中连续的一段。
+    """
+
+    def __init__(self, arity):
+        self.rows = []  # 参数元组
+        self.row_set = set()
+        self.by_arg = [{} for _ in range(arity)]  # 第 i 个参数 -> 行号列表（递增）
+        self.non_ground = []  # 含变量的事实，不参与连接，只用于判断推出的事实是否已有
+
+    def __len__(self):
+        return len(self.rows)
+
+    def add(self, row):
+        if row in self.row_set:
+            return False
+        n = len(self.rows)
+        self.rows.append(row)
+        self.row_set.add(row)
+        for i, value in enumerate(row):
+            self.by_arg[i].setdefault(value, []).append(n)
+        return True
+
+    def lookup(self, bound, lo, hi):
+        """行号在 [lo, hi) 内，且在 bound 给出的位置上取值相同的行"""
+        if not bound:
+            return self.rows[lo:hi]
+        # 使用最短的索引列表，再检查其余位置
+        positions = min(((i, self.by_arg[i].get(v, ())) for i, v in bound),
+                        key=lambda item: len(item[1]))[1]
+        rows = []
+        for n in positions[bisect.bisect_left(positions, lo):]:
+            if n >= hi:
+                break
+            row = self.rows[n]
+            if all(row[i] == v for i, v in bound):
+                rows.append(row)
+        return rows
+
+def _fc_match(literal, row, bindings):
+    """把前提 literal 与事实的参数元组 row 匹配，成功时绑定留在 bindings 中，失败时撤销并返回 False"""
+    mark = bindings.mark()
+    for arg, value in zip(literal.args, row):
+        if is_variable(arg):
+            bound = bindings.get(arg)
+            if bound is None:
+                bindings.bind(arg, value)
+            elif bound != value:
+                break
+        elif arg != value:
+            # 含变量的复合参数
+            if is_ground(arg) or not unify_trail(arg, value, bindings, occurs_check=True):
+                break
+    else:
+        return True
+    bindings.undo(mark)
+    return False
+
+def _fc_join_order(body, first, sizes):
+    """
+    连接顺序：从 delta 中的前提 first 开始，每次选取已与绑定变量相连、且候选事实最少的前提，
+    避免先连接两个互不相关的前提而得到笛卡尔积
+    """
+    order = [first]
+    bound = set(variables(body[first]))
+    rest = [i for i in range(len(body)) if i != first]
+    while rest:
+        def cost(i):
+            lit_vars = variables(body[i])
+            connected = not lit_vars or bool(lit_vars & bound) or len(lit_vars) < len(body[i].args)
+            return (not connected, sizes[i])
+        best = min(rest, key=cost)
+        rest.remove(best)
+        order.append(best)
+        bound |= variables(body[best])
+    return order
+
+def fol_fc_ask_semi_naive(kb, alpha):
+    """
+    半朴素（semi-naive）前向链接，结果与 fol_fc_ask_naive 相同：
+        - 不枚举常量，而是按各位置参数的索引把规则前提与事实关系逐个连接
+        - 每一轮只计算至少用到一个上一轮新推出事实的推导：对规则的第 j 个前提取 delta，
+          第 j 个之前的前提取旧事实，之后的前提取全部事实，各推导只计算一次
+        - 连接顺序按关系的大小选择，见 _fc_join_order
+    只有不含变量的事实参与连接，与 fol_fc_ask_naive 的子集判断一致。
+    """
+    for q in kb.clauses:
+        phi = unify_mm(q, alpha)
+        if phi is not None:
+            yield phi
+
+    relations = {}
+
+    def relation(expr):
+        key = (expr.op, len(expr.args))
+        if key not in relations:
+            relations[key] = FactRelation(len(expr.args))
+        return relations[key]
+
+    rules = []
+    for clause in kb.clauses:
+        body, head = parse_definite_clause(clause)
+        if body:
+            rules.append((body, head))
+            for lit in body + [head]:
+                relation(lit)
+        elif is_ground(head):
+            relation(head).add(head.args)
+        else:
+            relation(head).non_ground.append(head)
+
+    def is_known(fact, rel):
+        """fact 与已有或已推出的事实合一时不再加入，与 fol_fc_ask_naive 的判断一致"""
+        if is_ground(fact):
+            if fact.args in rel.row_set:
+                return True
+        elif any(_fc_match(fact, row, Bindings()) for row in rel.rows):
+            return True
+        return any(_fc_match(x, fact.args, Bindings()) for x in rel.non_ground)
+
+    # 每个关系的 [0, old) 为旧事实，[old, end) 为上一轮新推出的事实，第一轮全部视为新事实。
+    # 本轮推出的事实直接追加在 end 之后，本轮的连接不会用到
+    old = {}
+    while True:
+        end = {key: len(rel) for key, rel in relations.items()}
+        new = []
+        for body, head in rules:
+            rels = [relation(lit) for lit in body]
+            keys = [(lit.op, len(lit.args)) for lit in body]
+            for j, key in enumerate(keys):
+                if end[key] <= old.get(key, 0):
+                    continue  # 第 j 个前提没有新事实
+                ranges = []
+                for i, other_key in enumerate(keys):
+                    lo, hi = old.get(other_key, 0), end[other_key]
+                    ranges.append((lo, hi) if i == j else (0, lo) if i < j else (0, hi))
+                order = _fc_join_order(body, j, [hi - lo for lo, hi in ranges])
+                for bindings in _fc_join(body, rels, ranges, order, Bindings()):
+                    q_ = bindings.resolve(head)
+                    head_rel = relation(q_)
+                    if is_known(q_, head_rel):
+                        continue
+                    if is_ground(q_):
+                        head_rel.add(q_.args)
+                    else:
+                        head_rel.non_ground.append(q_)
+                    new.append(q_)
+                    phi = unify_mm(q_, alpha)
+                    if phi is not None:
+                        yield phi
+        if not new:
+            break
+        old = end
+        for clause in new:
+            kb.tell(clause)
+    return None
+
+def _fc_join(body, rels, ranges, order, bindings, depth=0):
+    """按 order 依次连接前提，每次产生满足全部前提时的 bindings，回溯时撤销绑定"""
+    if depth == len(order):
+        yield bindings
+        return
+    i = order[depth]
+    literal = body[i]
+    bound = []
+    for pos, arg in enumerate(literal.args):
+        if is_variable(arg):
+            if arg in bindings:
+                bound.append((pos, bindings[arg]))
+        elif is_ground(arg):
+            bound.append((pos, arg))
+    lo, hi = ranges[i]
+    for row in rels[i].lookup(bound, lo, hi):
+        mark = bindings.mark()
+        if _fc_match(literal, row, bindings):
+            yield from _fc_join(body, rels, ranges, order, bindings, depth + 1)
+            bindings.undo(mark)
+
+#多作用域的事实，用于批量询问
+class ScopedFacts:
+    """
+    多个作用域（例如各车辆的消息历史）中不含变量的事实，相同的事实只保存一次。
+    每行记录包含它的作用域（位掩码，第 i 位对应第 i 个加入的作用域）以及它在各作用域中第一次出现的位置，
+    first_answers 在全部作用域的事实上只连接一次规则前提，再按作用域拆分出各自的第一个置换。
+    """
+
+    def __init__(self):
+        self.scopes = []  # 作用域名，按加入顺序编号
+        self.relations = {}  # (谓词, 参数个数) -> FactRelation
+        self.row_ids = {}  # (谓词, 参数个数) -> {参数元组: 行号}
+        self.masks = {}  # (谓词, 参数个数) -> 每行所属作用域的位掩码
+        self.positions = []  # 作用域编号 -> {(谓词, 参数个数, 行号): 第一次出现的位置}
+
+    def add_scope(self, name, facts):
+        """加入一个作用域，facts 为不含变量的原子事实，按其在该作用域知识库中的顺序给出"""
+        bit = 1 << len(self.scopes)
+        self.scopes.append(name)
+        positions = {}
+        self.positions.append(positions)
+        for pos, fact in enumerate(facts):
+            key = (fact.op, len(fact.args))
+            rel = self.relations.get(key)
+            if rel is None:
+                rel = self.relations[key] = FactRelation(len(fact.args))
+                self.row_ids[key] = {}
+                self.masks[key] = []
+            row_ids = self.row_ids[key]
+            n = row_ids.get(fact.args)
+            if n is None:
+                n = row_ids[fact.args] = len(rel)
+                rel.add(fact.args)
+                self.masks[key].append(0)
+            self.masks[key][n] |= bit
+            positions.setdefault(key + (n,), pos)
+
+    def first_answers(self, query, clause):
+        """
+        对每个作用域，返回在 "该作用域的事实 + 规则 clause" 上询问 query 时 fol_bc_ask_trail 产生的第一个置换，
+        未证明的作用域不在结果中。要求 clause 的头部谓词不出现在前提中。
+        反向链接先按加入顺序尝试与 query 匹配的事实，再使用规则；规则前提按书写顺序深度优先搜索，
+        最先找到的解是各前提所用事实的位置按字典序最小的解，所以只需枚举一次全部的解，按作用域取最小者。
+        """
+        body, head = parse_definite_clause(clause)
+        query_vars = variables(query)
+        best = {}  # 作用域编号 -> (搜索顺序, 置换)
+
+        def answer(bindings, target):
+            mark = bindings.mark()
+            if not unify_trail(target, query, bindings):
+                return None
+            theta = {}
+            for var in query_vars:
+                value = bindings.resolve(var)
+                if value is not var:
+                    theta[var] = value
+            bindings.undo(mark)
+            return theta
+
+        def offer(mask, rows, bindings, target, rank):
+            theta = None
+            while mask:
+                low = mask & -mask
+                mask ^= low
+                scope = low.bit_length() - 1
+                positions = self.positions[scope]
+                order = (rank,) + tuple(positions[row] for row in rows)
+                current = best.get(scope)
+                if current is None or order < current[0]:
+                    if theta is None:
+                        theta = answer(bindings, target)
+                        if theta is None:
+                            return
+                    best[scope] = (order, theta)
+
+        # 与 query 匹配的事实排在规则之前
+        key = (query.op, len(query.args))
+        rel = self.relations.get(key)
+        if rel is not None:
+            bindings = Bindings()
+            for row in rel.rows:
+                if _fc_match(query, row, bindings):
+                    n = self.row_ids[key][row]
+                    offer(self.masks[key][n], [key + (n,)], bindings, query, 0)
+                    bindings.undo(0)
+        for bindings, mask, rows in self._join(body, Bindings(), -1, []):
+            offer(mask, rows, bindings, head, 1)
+        return {self.scopes[scope]: theta for scope, (_, theta) in best.items()}
+
+    def _join(self, body, bindings, mask, rows, i=0):
+        """按书写顺序连接前提，产生 (bindings, 共同的作用域, 各前提所用的行)，作用域为空时剪枝"""
+        if i == len(body):
+            yield bindings, mask, rows
+            return
+        literal = body[i]
+        key = (literal.op, len(literal.args))
+        rel = self.relations.get(key)
+        if rel is None:
+            return
+        bound = []
+        for pos, arg in enumerate(literal.args):
+            if is_variable(arg):
+                if arg in bindings:
+                    bound.append((pos, bindings[arg]))
+            elif is_ground(arg):
+                bound.append((pos, arg))
+        row_ids, masks = self.row_ids[key], self.masks[key]
+        for row in rel.lookup(bound, 0, len(rel)):
+            n = row_ids[row]
+            row_mask = mask & masks[n]
+            if not row_mask:
+                continue
+            mark = bindings.mark()
+            if _fc_match(literal, row, bindings):
+                rows.append(key + (n,))
+                yield from self._join(body, bindings, row_mask, rows, i + 1)
+                rows.pop()
+                bindings.undo(mark)
+
 
 #反向链接
 def fol_bc_ask(kb, query):
@@ -402,7 +926,10 @@ def fol_bc_ask(kb, query):
 #或搜索
 def fol_bc_or(kb, goal, theta):
     for rule in kb.fetch_rules_for_goal(goal):
-        lhs, rhs = parse_definite_clause(standardize_variables(rule))
+        # 不含变量的事实标准化后不变，跳过以减少子句复制
+        if not kb.is_ground_fact(rule):
+            rule = standardize_variables(rule)
+        lhs, rhs = parse_definite_clause(rule)
         for theta1 in fol_bc_and(kb, lhs, unify_mm(rhs, goal, theta)):
             yield theta1
 
@@ -419,5 +946,211 @@ def fol_bc_and(kb, goals, theta):
                 yield theta2
 
 
+#带表的反向链接
+def variant_key(x, names=None):
+    """调用变体的键：变量按首次出现的顺序编号，只差变量改名的两个表达式键相同"""
+    if names is None:
+        names = {}
+    if is_variable(x):
+        return ('?', names.setdefault(x, len(names)))
+    if not isinstance(x, Expr) or not x.args or is_ground(x):
+        return x
+    return (x.op,) + tuple(variant_key(arg, names) for arg in x.args)
 
+class AnswerTable:
+    """一个调用变体的答案表"""
 
+    def __init__(self, key, goal):
+        self.key = key
+        self.goal = goal
+        self.answers = []  # 代入置换后的 goal，按求得的顺序保存
+        self.answer_keys = set()
+        self.deps = {(goal.op, len(goal.args))}  # 答案依赖的 (谓词, 参数个数)
+        self.complete = False
+        self.evaluating = False
+        self.dfn = 0  # 本次求值开始的顺序号
+        self.low = 0  # 求值中用到的未完成的表的最小 dfn，等于 dfn 时为其所在强连通分量的首领
+
+    def add(self, answer):
+        key = variant_key(answer)
+        if key in self.answer_keys:
+            return False
+        self.answer_keys.add(key)
+        self.answers.append(answer)
+        return True
+
+class AnswerTables:
+    """
+    知识库的答案表（SLG 式的表推理），以及正在进行的求值的状态：
+        - 按调用变体建表，同一变体的子目标只求值一次，之后直接从表中取答案
+        - 调用正在求值的变体（递归、包括左递归）时只取表中已有的答案，不再展开，因此总会终止；
+          由强连通分量的首领重复求值直到没有新答案（不动点），再把分量中的表一起标记为完成
+        - 每张表记录依赖的谓词，加入或删除该谓词的子句时失效
+    """
+
+    def __init__(self):
+        self.tables = {}  # 调用变体的键 -> AnswerTable
+        self.stack = []  # 正在求值的表
+        self.incomplete = []  # 已开始求值、尚未完成的表
+        self.dfn = itertools.count()
+        self.num_answers = 0  # 加入的答案总数，用于判断是否到达不动点
+        self.num_loops = 0  # 调用正在求值的变体的次数，为 0 时一次求值即可完成
+
+    def __len__(self):
+        return len(self.tables)
+
+    def clear(self):
+        self.tables.clear()
+        self.incomplete.clear()
+
+    def invalidate(self, key):
+        """删除依赖 (谓词, 参数个数) 为 key 的答案表"""
+        if self.tables:
+            self.tables = {k: t for k, t in self.tables.items() if key not in t.deps}
+
+    def lookup(self, kb, goal):
+        """返回 goal 的调用变体的答案表，必要时先求值"""
+        key = variant_key(goal)
+        table = self.tables.get(key)
+        if table is None:
+            table = self.tables[key] = AnswerTable(key, goal)
+        if table.evaluating:
+            self.num_loops += 1
+        elif not table.complete:
+            self.evaluate(kb, table)
+        if self.stack:
+            caller = self.stack[-1]
+            caller.deps |= table.deps
+            if not table.complete:
+                caller.low = min(caller.low, table.dfn if table.evaluating else table.low)
+        return table
+
+    def evaluate(self, kb, table):
+        table.evaluating = True
+        table.dfn = table.low = next(self.dfn)
+        if table not in self.incomplete:
+            self.incomplete.append(table)
+        self.stack.append(table)
+        try:
+            while True:
+                num_answers, num_loops = self.num_answers, self.num_loops
+                pass_start = next(self.dfn)
+                for answer in _table_pass(kb, table.goal):
+                    if table.add(answer):
+                        self.num_answers += 1
+                # 不是首领时由首领重新求值；没有递归调用时一次求值即可完成
+                if table.low < table.dfn or self.num_loops == num_loops:
+                    break
+                if self.num_answers == num_answers:
+                    # 本轮没有调用到的分量成员也重新求值一次，都没有新答案时到达不动点
+                    for t in [t for t in self.incomplete if table.dfn < t.dfn < pass_start]:
+                        self.evaluate(kb, t)
+                    if self.num_answers == num_answers:
+                        break
+        except BaseException:
+            # 求值中断时丢弃未完成的表
+            for t in self.incomplete:
+                self.tables.pop(t.key, None)
+            self.incomplete.clear()
+            raise
+        finally:
+            self.stack.pop()
+            table.evaluating = False
+        if table.low == table.dfn:
+            members = [t for t in self.incomplete if t.dfn >= table.dfn]
+            self.incomplete = [t for t in self.incomplete if t.dfn < table.dfn]
+            deps = set().union(*(t.deps for t in members))
+            for t in members:
+                t.deps = deps
+                t.complete = True
+
+def _table_pass(kb, goal):
+    """用 goal 的全部子句求值一遍，产生代入置换后的 goal"""
+    bindings = Bindings() if kb.unifier == 'trail' else None
+    for rule in kb.fetch_rules_for_goal(goal):
+        if not kb.is_ground_fact(rule):
+            rule = standardize_variables(rule)
+        lhs, rhs = parse_definite_clause(rule)
+        if bindings is None:
+            for theta in fol_bc_and_tabled(kb, lhs, unify_mm(rhs, goal, {})):
+                yield subst(theta, goal)
+        elif unify_trail(rhs, goal, bindings, kb.occurs_check):
+            for _ in fol_bc_and_trail(kb, lhs, bindings):
+                yield bindings.resolve(goal)
+            bindings.undo(0)
+
+def fol_bc_ask_tabled(kb, query):
+    return fol_bc_or_tabled(kb, query, {})
+
+def fol_bc_or_tabled(kb, goal, theta):
+    if is_variable(goal):
+        # 目标为变量时无法按谓词建表
+        yield from fol_bc_or(kb, goal, theta)
+        return
+    table = kb.tables.lookup(kb, goal)
+    # 未完成的表在求值过程中还会加入答案，只取当前已有的答案
+    answers = table.answers if table.complete else list(table.answers)
+    for answer in answers:
+        if not is_ground(answer):
+            answer = standardize_variables(answer)
+        theta1 = unify_mm(goal, answer, theta)
+        if theta1 is not None:
+            yield theta1
+
+def fol_bc_and_tabled(kb, goals, theta):
+    if theta is None:
+        pass
+    elif not goals:
+        yield theta
+    else:
+        first, rest = goals[0], goals[1:]
+        for theta1 in fol_bc_or_tabled(kb, subst(theta, first), theta):
+            for theta2 in fol_bc_and_tabled(kb, rest, theta1):
+                yield theta2
+
+
+#基于回溯记录的反向链接
+def fol_bc_ask_trail(kb, query):
+    """
+    与 fol_bc_ask 按相同的顺序搜索，全程在一个 Bindings 上绑定与回溯，不在每一步复制置换。
+    产生的置换只含询问中的变量，取值已代入全部绑定。kb 启用表推理时子目标从答案表中取答案。
+    """
+    bindings = Bindings()
+    query_vars = variables(query)
+    for _ in fol_bc_or_trail(kb, query, bindings):
+        theta = {}
+        for var in query_vars:
+            value = bindings.resolve(var)
+            if value is not var:
+                theta[var] = value
+        yield theta
+
+def fol_bc_or_trail(kb, goal, bindings):
+    """每找到一种证明 goal 的方式产生一次，此时 bindings 中为对应的绑定"""
+    resolved = bindings.resolve(goal)
+    if kb.tables is not None and not is_variable(resolved):
+        table = kb.tables.lookup(kb, resolved)
+        answers = table.answers if table.complete else list(table.answers)
+        for answer in answers:
+            if not is_ground(answer):
+                answer = standardize_variables(answer)
+            mark = bindings.mark()
+            if unify_trail(resolved, answer, bindings, kb.occurs_check):
+                yield
+                bindings.undo(mark)
+        return
+    for rule in kb.fetch_rules_for_goal(resolved):
+        if not kb.is_ground_fact(rule):
+            rule = standardize_variables(rule)
+        lhs, rhs = parse_definite_clause(rule)
+        mark = bindings.mark()
+        if unify_trail(rhs, resolved, bindings, kb.occurs_check):
+            yield from fol_bc_and_trail(kb, lhs, bindings)
+            bindings.undo(mark)
+
+def fol_bc_and_trail(kb, goals, bindings, i=0):
+    if i == len(goals):
+        yield
+    else:
+        for _ in fol_bc_or_trail(kb, goals[i], bindings):
+            yield from fol_bc_and_trail(kb, goals, bindings, i + 1)
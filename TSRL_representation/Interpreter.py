@@ -26,15 +26,51 @@ import errorHanding
 # import time
 # from Return import Return
 
-from typing import Any
+from typing import Any, Optional
+
+
+class AskResult:
+    """
+    一条ASK语句的推理结果
+    substitution: 询问语句中变量的置换（不含推理过程中标准化产生的 v_ 变量），均为字符串
+    action: 代入置换后的询问语句，例如 LeftChangeLane(1)，未证明时为 None
+    """
+
+    def __init__(self, query: Expr.Expr, theta):
+        self.query = query
+        self.theta = theta  # 推理得到的完整置换，未证明时为 None
+        self.substitution = {}
+        if theta is not None:
+            for key, value in theta.items():
+                if str(key)[:2] == "v_" and len(str(key))>9: #这里对于无关变量须在斟酌
+                    pass
+                else:
+                    self.substitution[str(key)] = str(value)
+
+    @property
+    def proved(self) -> bool:
+        return self.theta is not None
+
+    @property
+    def action(self) -> Optional[str]:
+        if not self.proved:
+            return None
+        args = [self.substitution.get(str(arg), str(arg))
+                if Inference_engine.is_variable(arg) else str(arg)
+                for arg in self.query.args]
+        return '{}({})'.format(self.query.op, ', '.join(args)) if args else self.query.op
+
+    def __repr__(self):
+        return 'AskResult({}, {})'.format(self.query, self.substitution if self.proved else False)
 
 
 class Interpreter(Expr.ExprVisitor, Stmt.StmtVisitor):
 
-    def __init__(self):
-        self.kb = Inference_engine.FolKB()  # 存储知识库
+    def __init__(self, output_file=sys.stdout):
+        self.kb = Inference_engine.FolKB(tabling=True, unifier='trail')  # 存储知识库，子目标的答案在多次ASK之间复用
         self.subset = {} # 储存置换表
-        self.output_file = sys.stdout  # 添加这行初始化输出文件
+        self.output_file = output_file  # 输出文件，为 None 时ASK结果只返回不输出
+        self.answers: List[AskResult] = []  # 本次 interpret 中各ASK语句的结果
 
     def set_output_file(self, file_path):  # 添加此方法
         """设置输出文件路径"""
@@ -45,13 +81,25 @@ class Interpreter(Expr.ExprVisitor, Stmt.StmtVisitor):
             # 如果已经是文件对象，则直接使用
             self.output_file = file_path
 
-    def interpret(self,  statements:List[Stmt.Stmt]):
+    def interpret(self,  statements:List[Stmt.Stmt]) -> List[AskResult]:
+        self.answers = []
         try:
             for statement in statements:
                 self.__execute__(statement)
 
         except RuntimeError.CustomRuntimeError  as error:
             errorHanding.runtimeError(error)
+        return self.answers
+
+    def tell(self, expr: Expr.Expr):
+        """将已构建的事实或规则表达式加入知识库"""
+        self.kb.tell(self.__evaluate__(expr))
+
+    def ask(self, expr: Expr.Expr) -> AskResult:
+        """对已构建的表达式进行推理，返回结构化结果"""
+        query = self.__evaluate__(expr)
+        theta = self.kb.ask(query)
+        return AskResult(query, theta if theta is not False else None)
 
     def __evaluate__(self, expr: Expr.Expr):
         return expr.accept(self)
@@ -78,16 +126,18 @@ class Interpreter(Expr.ExprVisitor, Stmt.StmtVisitor):
 
     def visitAskStmt(self, stmt):
         """
-        执行询问语句，目的是推断ASK后的语句是否为真，并返回可能的置换,并写入指定的输出文件中
+        执行询问语句，目的是推断ASK后的语句是否为真，返回可能的置换，设置了输出文件时同时写入输出文件
         """
-        Dict = self.kb.ask(self.__evaluate__(stmt.expression))
-        d={}
-        if Dict is not False:
-            for key, value in Dict.items():
-                if str(key)[:2] == "v_" and len(str(key))>9: #这里对于无关变量须在斟酌
-                    pass
-                else:
-                    d[str(key)]=str(value)
+        result = self.ask(stmt.expression)
+        self.answers.append(result)
+        if self.output_file is not None:
+            self.__writeAnswer__(result)
+        return result
+
+    def __writeAnswer__(self, result: AskResult):
+        """将ASK结果以JSON写入输出文件（文件接口使用）"""
+        if result.proved:
+            d = result.substitution
             # 使用self.output_file而不是硬编码的'output.txt'
             # 检查output_file是否可寻址，避免对sys.stdout调用seek方法
             if hasattr(self.output_file, 'seekable') and self.output_file.seekable():
@@ -104,7 +154,7 @@ class Interpreter(Expr.ExprVisitor, Stmt.StmtVisitor):
                 self.output_file.truncate()
             self.output_file.write('False')
             self.output_file.flush()
-            print(Dict)
+            print(False)
 
 
     def visitImplicationExpr(self, expr):
@@ -0,0 +1,212 @@
+"""
+功能：规则库编译器
+将规则文件（例如 TSRL_inference/Rules/Roadsys_rule.txt）编译为只读的子句集合：
+    - 预先解析 ：每条规则只扫描、解析一次，子句中的变量预先标准化
+    - 前提索引 ：记录每条规则前提中的谓词名，按消息中出现的谓词筛选可用的规则
+    - 磁盘缓存 ：编译结果按规则文件内容的sha1缓存在 <规则文件>.compiled.pkl 中
+    - 自动重载 ：RuleBase.for_file 在规则文件的修改时间变化时重新编译
+每次询问只把车辆的消息事实放入 OverlayKB，叠加在单条规则的知识库之上，规则库本身不会被修改。
+多车决策使用 ask_batch：各车的消息事实合并为一份 ScopedFacts，每条规则对全部车辆只连接一次前提。
+前提保持书写顺序：推理取第一个置换，调整顺序会改变返回的置换。
+"""
+from __future__ import annotations
+import hashlib
+import os
+import pickle
+import sys
+from typing import Dict, FrozenSet, Iterable, List, Tuple
+
+# 添加当前目录与项目根目录（logger）到Python路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import Expr
+import Stmt
+from Inference_engine import (FolKB, OverlayKB, ScopedFacts, conjuncts, is_definite_clause, is_ground,
+                              is_symbol, standardize_variables)
+from Interpreter import AskResult, Interpreter
+from TSRL import TSRL
+import logger
+
+logging = logger.get_logger(__name__)
+
+# 编译结果的格式版本，规则的编译方式或其中的数据结构变化时需要加一
+COMPILED_RULES_VERSION = 3
+
+# 消息文本 -> 解析后的事实，消息历史逐步滑动，大部分消息在相邻两次决策之间重复
+FACT_CACHE_SIZE = 10000
+_fact_cache: Dict[str, Tuple[Expr.Expr, ...]] = {}
+
+# 只用于求值表达式，不向其知识库中加入任何子句
+_evaluator = Interpreter(output_file=None)
+
+
+class CompiledRule:
+    """
+    一条编译后的规则
+    source: 规则原文
+    head_text: 规则头部原文，例如 LetStopBeforeJunction(x)
+    head: 规则头部，变量名与原文一致，用作询问语句
+    clause: 变量已标准化的子句
+    body: 前提，保持书写顺序
+    body_predicates: 前提中出现的谓词名
+    """
+
+    def __init__(self, source: str, head: Expr.Expr, clause: Expr.Expr):
+        self.source = source
+        self.head_text = source.split(":-", 1)[0].strip()
+        self.head = head
+        self.clause = clause
+        self.body: List[Expr.Expr] = conjuncts(clause.args[0])
+        self.body_predicates: FrozenSet[str] = frozenset(literal.op for literal in self.body)
+        self.kb = FolKB([clause])  # 只含本条规则的知识库
+
+    def __getstate__(self):
+        # 知识库不写入缓存，加载时重建
+        return {"source": self.source, "head": self.head, "clause": self.clause}
+
+    def __setstate__(self, state):
+        self.__init__(state["source"], state["head"], state["clause"])
+
+    def __repr__(self):
+        return "CompiledRule({})".format(self.clause)
+
+
+class RuleBase:
+    """编译后的规则库，规则按文件中的顺序保存"""
+    _loaded: Dict[str, Tuple[int, RuleBase]] = {}  # 规则文件绝对路径 -> (修改时间, 规则库)
+
+    def __init__(self, rules: Iterable[CompiledRule], file_hash: str = None):
+        self.rules: Tuple[CompiledRule, ...] = tuple(rules)
+        self.file_hash = file_hash
+
+    @classmethod
+    def for_file(cls, rules_file: str) -> RuleBase:
+        """返回规则文件对应的规则库，文件修改时间变化时重新加载"""
+        path = os.path.abspath(rules_file)
+        mtime = os.stat(path).st_mtime_ns
+        loaded = cls._loaded.get(path)
+        if loaded is None or loaded[0] != mtime:
+            loaded = cls._loaded[path] = (mtime, cls.load(path))
+        return loaded[1]
+
+    @classmethod
+    def load(cls, rules_file: str, use_compiled: bool = True) -> RuleBase:
+        """读取 <规则文件>.compiled.pkl，版本或内容哈希不一致时重新编译并写入"""
+        with open(rules_file, "rb") as f:
+            data = f.read()
+        file_hash = hashlib.sha1(data).hexdigest()
+        compiled_file = rules_file + ".compiled.pkl"
+        if use_compiled:
+            try:
+                with open(compiled_file, "rb") as f:
+                    compiled = pickle.load(f)
+                if compiled.get("version") == COMPILED_RULES_VERSION and \
+                        compiled.get("hash") == file_hash:
+                    return cls(compiled["rules"], file_hash)
+            except (OSError, pickle.UnpicklingError, EOFError, AttributeError,
+                    ImportError):
+                pass
+        rule_base = cls(compile_rules(data.decode("utf-8")), file_hash)
+        if use_compiled:
+            rule_base.dump(compiled_file)
+        return rule_base
+
+    def dump(self, compiled_file: str):
+        compiled = {"version": COMPILED_RULES_VERSION, "hash": self.file_hash, "rules": list(self.rules)}
+        # 先写临时文件再替换，避免并行仿真读到写了一半的文件
+        tmp_file = "{}.{}.tmp".format(compiled_file, os.getpid())
+        try:
+            with open(tmp_file, "wb") as f:
+                pickle.dump(compiled, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_file, compiled_file)
+        except OSError as e:
+            logging.warning("Failed to write compiled rules: {}".format(e))
+            if os.path.exists(tmp_file):
+                os.remove(tmp_file)
+
+    @staticmethod
+    def facts(messages: Iterable[str]) -> OverlayKB:
+        """由消息历史构建事实知识库，对每条候选规则用 facts.on(rule.kb) 叠加询问"""
+        kb = OverlayKB(unifier='trail')
+        for message in messages:
+            for fact in parse_facts(message):
+                kb.tell(fact)
+        return kb
+
+    @staticmethod
+    def ask(rule: CompiledRule, facts: OverlayKB) -> AskResult:
+        """在消息事实与单条规则上询问规则头部，事实在前、规则在后，与按源码顺序加入知识库一致"""
+        theta = facts.on(rule.kb).ask(rule.head)
+        return AskResult(rule.head, theta if theta is not False else None)
+
+    def ask_batch(self, histories: Dict[str, List[str]]) -> Dict[str, List[AskResult]]:
+        """
+        批量询问多辆车的消息历史，返回 车辆ID -> 按规则顺序的 AskResult，与逐车、逐条规则调用 ask 的结果相同。
+        多辆车收到的同一条环境消息只加入一次 ScopedFacts，各车的事实以车辆ID为作用域；
+        每条规则在全部车辆的事实上只连接一次前提，再按车辆拆分出各自的第一个置换。
+        消息中含规则或变量的车辆、头部谓词出现在前提中的规则仍逐车询问。
+        """
+        scoped = ScopedFacts()
+        separate = {}  # 逐车询问的车辆ID -> 事实知识库，按需构建
+        for vehicle_id, messages in histories.items():
+            facts = [fact for message in messages for fact in parse_facts(message)]
+            if all(is_symbol(fact.op) and is_ground(fact) for fact in facts):
+                scoped.add_scope(vehicle_id, facts)
+            else:
+                separate[vehicle_id] = None
+
+        def facts_of(vehicle_id):
+            if separate.get(vehicle_id) is None:
+                separate[vehicle_id] = RuleBase.facts(histories[vehicle_id])
+            return separate[vehicle_id]
+
+        results = {vehicle_id: [] for vehicle_id in histories}
+        for rule in self.rules:
+            batched = rule.head.op not in rule.body_predicates
+            answers = scoped.first_answers(rule.head, rule.clause) if batched else {}
+            for vehicle_id, answered in results.items():
+                if batched and vehicle_id not in separate:
+                    answered.append(AskResult(rule.head, answers.get(vehicle_id)))
+                else:
+                    answered.append(RuleBase.ask(rule, facts_of(vehicle_id)))
+        return results
+
+
+def message_predicates(messages: Iterable[str]) -> FrozenSet[str]:
+    """消息中的谓词名（第一个左括号之前的部分）"""
+    return frozenset(message.rstrip(";").split("(")[0] for message in messages if "(" in message)
+
+
+def compile_rules(source: str) -> List[CompiledRule]:
+    """编译规则文件内容，只保留含 :- 的规则行，跳过空行与注释"""
+    rules = []
+    for line in source.splitlines():
+        line = line.strip()
+        if not line or line.startswith("#") or ":-" not in line:
+            continue
+        for stmt in TSRL.parse(line):
+            if not isinstance(stmt, Stmt.Expression):
+                continue
+            clause = _evaluator.__evaluate__(stmt.expression)
+            if not isinstance(clause, Expr.Implication):
+                continue
+            rules.append(CompiledRule(line, clause.args[1], standardize_variables(clause)))
+    return rules
+
+
+def parse_facts(message: str) -> Tuple[Expr.Expr, ...]:
+    """解析一条消息中的事实，跳过不能加入知识库的语句，结果按消息文本缓存"""
+    facts = _fact_cache.get(message)
+    if facts is None:
+        facts = []
+        for stmt in TSRL.parse(message):
+            if isinstance(stmt, Stmt.Expression):
+                fact = _evaluator.__evaluate__(stmt.expression)
+                if isinstance(fact, Expr.Expr) and is_definite_clause(fact):
+                    facts.append(fact)
+        facts = tuple(facts)
+        if len(_fact_cache) >= FACT_CACHE_SIZE:
+            _fact_cache.clear()
+        _fact_cache[message] = facts
+    return facts
@@ -8,9 +8,10 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 from Parser import Parser
 from Scanner import Scanner
 from errorHanding import *
-from Interpreter import Interpreter
+from Interpreter import Interpreter, AskResult
 import Inference_engine
 import Expr
+import Stmt
 
 class TSRL:
     # 在类级别定义TSRL_interpreter，确保在任何地方都可以访问
@@ -26,8 +27,43 @@ class TSRL:
         if output_file:
             # 设置输出文件路径
             TSRL.TSRL_interpreter.set_output_file(output_file)
+        # 每次运行使用新的知识库，避免重复运行时子句不断累积
+        TSRL.TSRL_interpreter.kb = Inference_engine.FolKB(tabling=True, unifier='trail')
         TSRL.__run_file(input_file)
 
+    @staticmethod
+    def parse(source: str):
+        """将TSRL源码解析为语句列表"""
+        scanner = Scanner(source)
+        tokens = scanner.scan_tokens()
+        parser = Parser(tokens)
+        return parser.parse()
+
+    @staticmethod
+    def query(source, ask=None, interpreter: Interpreter = None):
+        """
+        在内存中执行TSRL语句并返回结构化的推理结果，不读写任何文件
+        :param source: TSRL源码字符串，或由 Stmt / Expr 组成的列表（Expr 作为事实或规则加入知识库）
+        :param ask: 额外的询问，TSRL表达式字符串（不含ASK关键字）或已构建的 Expr
+        :param interpreter: 使用的解释器，默认每次新建，即每次查询使用独立的知识库
+        :return: List[AskResult]，按ASK语句的顺序
+        """
+        if interpreter is None:
+            interpreter = Interpreter(output_file=None)
+        if isinstance(source, str):
+            source = TSRL.parse(source)
+        statements = []
+        for item in source or []:
+            if isinstance(item, Stmt.Stmt):
+                statements.append(item)
+            else:
+                statements.append(Stmt.Expression(item))
+        if isinstance(ask, str):
+            statements.extend(TSRL.parse('ASK {};'.format(ask.strip().rstrip(';'))))
+        elif ask is not None:
+            statements.append(Stmt.Ask(ask))
+        return interpreter.interpret(statements)
+
     @staticmethod
     def __run_file(file_path):
         try:
@@ -53,10 +89,7 @@ class TSRL:
 
     @staticmethod
     def __run(source):
-        scanner = Scanner(source)
-        tokens = scanner.scan_tokens()
-        parser = Parser(tokens)
-        statements = parser.parse() 
+        statements = TSRL.parse(source)
         
         # 使用类级别的TSRL_interpreter
         # 如果没有设置输出文件，则使用默认路径
@@ -67,7 +100,14 @@ class TSRL:
 
 """
 修改TSRL.main()，使其接收输入和输出文件路径作为参数
+文件接口: python TSRL.py <input_file> [output_file]
 """
 # input_file = "TSRL_representation\Infer_input\input_1.txt"
 # output_file = "TSRL_representation\Infer_output\output.txt"
-# TSRL.main(input_file, output_file)
\ No newline at end of file
+# TSRL.main(input_file, output_file)
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python TSRL.py <input_file> [output_file]")
+        sys.exit(64)
+    TSRL.main(sys.argv[1], sys.argv[2] if len(sys.argv) > 2 else None)
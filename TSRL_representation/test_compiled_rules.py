@@ -0,0 +1,57 @@
+"""
+测试编译后的规则缓存在新进程中加载后推理结果不变
+功能：
+1. 第一个进程编译规则文件并写入 <规则文件>.compiled.pkl
+2. 第二个进程使用不同的 PYTHONHASHSEED 读取缓存（不重新编译），对同样的消息给出相同的结论
+用法: python -m pytest TSRL_representation/test_compiled_rules.py 或 python TSRL_representation/test_compiled_rules.py
+"""
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(HERE)
+RULES_FILE = os.path.join(PROJECT_ROOT, "TSRL_inference", "Rules", "Roadsys_rule.txt")
+MESSAGES = ["VehicleInLane(V2,V1,Front);", "GreaterSpeed(V1,V2);"]
+
+# 在子进程中加载规则库并询问，输出得到证明的规则结论
+ASK = """
+import json, sys
+sys.path[:0] = [{here!r}, {root!r}]
+from Rule_base import RuleBase
+rule_base = RuleBase.load(sys.argv[1])
+results = rule_base.ask_batch({{"V1": json.loads(sys.argv[2])}})
+print(json.dumps([result.action for result in results["V1"] if result.proved]))
+""".format(here=HERE, root=PROJECT_ROOT)
+
+
+def ask_in_subprocess(rules_file, hash_seed, cwd):
+    env = dict(os.environ, PYTHONHASHSEED=str(hash_seed))
+    output = subprocess.run([sys.executable, "-c", ASK, rules_file, json.dumps(MESSAGES)],
+                            env=env, cwd=cwd, capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def test_compiled_rules_across_processes():
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        rules_file = os.path.join(tmp_dir, "Roadsys_rule.txt")
+        shutil.copy(RULES_FILE, rules_file)
+        compiled_file = rules_file + ".compiled.pkl"
+        compiled = ask_in_subprocess(rules_file, 1, tmp_dir)
+        assert os.path.exists(compiled_file)
+        assert "CheckChangeLane(V1)" in compiled
+        written = os.stat(compiled_file).st_mtime_ns
+        assert ask_in_subprocess(rules_file, 2, tmp_dir) == compiled
+        # 第二个进程使用了缓存，没有重新编译并写入
+        assert os.stat(compiled_file).st_mtime_ns == written
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    test_compiled_rules_across_processes()
+    print("ok")
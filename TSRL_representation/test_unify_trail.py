@@ -0,0 +1,54 @@
+"""
+测试合一时同名变量不会绑定到自身
+功能：
+1. unify_trail 合一两个同名的变量对象时不加入绑定
+2. 事实或规则头与询问中都含重复变量时，询问能够结束并给出结果
+用法: python -m pytest TSRL_representation/test_unify_trail.py 或 python TSRL_representation/test_unify_trail.py
+"""
+import os
+import sys
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from TSRL import TSRL
+from Expr import Variable
+from Inference_engine import Bindings, unify_trail
+
+TIMEOUT = 10
+
+
+def query(source):
+    """在子线程中执行询问，超时说明推理陷入死循环"""
+    result = {}
+    thread = threading.Thread(target=lambda: result.update(value=TSRL.query(source)), daemon=True)
+    thread.start()
+    thread.join(TIMEOUT)
+    assert not thread.is_alive(), f"query did not finish: {source}"
+    return result["value"]
+
+
+def test_unify_same_name_variables():
+    bindings = Bindings()
+    assert unify_trail(Variable("y"), Variable("y"), bindings)
+    assert not bindings and not bindings.trail
+    assert bindings.deref(Variable("y")) == Variable("y")
+
+
+def test_ask_fact_with_repeated_variable():
+    results = query("Same(y,y); ASK Same(x,x);")
+    assert len(results) == 1 and results[0].proved
+
+
+def test_ask_rule_with_repeated_variable():
+    results = query("P(A); Same(y,y):-P(y); ASK Same(x,x);")
+    assert len(results) == 1 and results[0].proved
+    assert results[0].substitution == {"x": "A"}
+    assert results[0].action == "Same(A, A)"
+
+
+if __name__ == "__main__":
+    test_unify_same_name_variables()
+    test_ask_fact_with_repeated_variable()
+    test_ask_rule_with_repeated_variable()
+    print("ok")
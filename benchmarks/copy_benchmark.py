@@ -0,0 +1,90 @@
+"""
+对象复制开销基准测试:
+AOI内车辆数为 50/200/500 时，比较 utils.data_copy.deepcopy（pickle往返）与 clone() 结构化复制的每步耗时。
+每步复制的内容：全部车辆（含当前状态与50个状态的规划轨迹）、全部输出轨迹，以及一次路网。
+用法: python benchmarks/copy_benchmark.py [--vehicles 50 200 500] [--repeat 5]
+"""
+import argparse
+import os
+import sys
+import time
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+sys.path.insert(0, os.path.join(PROJECT_ROOT, 'utils'))
+
+import numpy as np
+
+import trafficManager  # 将 trafficManager 目录加入 sys.path
+from trafficManager.common.vehicle import control_Vehicle, Behaviour, VehicleType
+from utils import data_copy
+from utils.cubic_spline import Spline2D
+from utils.roadgraph import Edge, NormalLane, RoadGraph
+from utils.trajectory import State, Trajectory
+
+TRAJECTORY_LEN = 50
+NUM_LANES = 200
+
+
+def build_roadgraph():
+    roadgraph = RoadGraph()
+    xs = np.linspace(0, 200, 21)
+    for i in range(NUM_LANES):
+        edge = Edge(id=f"E{i}", lane_num=1, lane_width=3.2, lanes={f"E{i}_0"})
+        roadgraph.edges[edge.id] = edge
+        spline = Spline2D(list(xs), list(np.sin(xs / 40 + i) * 5))
+        roadgraph.lanes[f"E{i}_0"] = NormalLane(id=f"E{i}_0", width=3.2, course_spline=spline,
+                                                affiliated_edge=edge)
+    return roadgraph
+
+
+def build_vehicles(num_vehicles):
+    vehicles = []
+    for i in range(num_vehicles):
+        lane_id = f"E{i % NUM_LANES}_0"
+        state = State(t=0.0, x=i * 7.0, y=0.0, s=i * 7.0, s_d=10.0, vel=10.0, laneID=lane_id)
+        vehicle = control_Vehicle(f"veh{i}", state, lane_id, 13.89, Behaviour.KL,
+                                  VehicleType.IN_AOI, available_lanes=[lane_id])
+        vehicle.trajectory = Trajectory(
+            [State(t=k * 0.1, x=i * 7.0 + k, y=0.0, s=i * 7.0 + k, s_d=10.0, vel=10.0,
+                   laneID=lane_id) for k in range(TRAJECTORY_LEN)])
+        vehicles.append(vehicle)
+    return vehicles
+
+
+def copy_step(copy_fn, vehicles, roadgraph):
+    for vehicle in vehicles:
+        copy_fn(vehicle)
+        copy_fn(vehicle.trajectory)
+    copy_fn(roadgraph)
+
+
+def bench(copy_fn, vehicles, roadgraph, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        copy_step(copy_fn, vehicles, roadgraph)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description='pickle深复制与clone()结构化复制的耗时对比')
+    parser.add_argument('--vehicles', type=int, nargs='*', default=[50, 200, 500],
+                        help='AOI内车辆数 (默认: 50 200 500)')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='每种复制方式的重复次数，取最短耗时 (默认: 5)')
+    args = parser.parse_args()
+
+    roadgraph = build_roadgraph()
+    print(f"{'vehicles':>10}{'deepcopy [ms]':>16}{'clone [ms]':>14}{'saved [ms]':>14}{'speedup':>10}")
+    for num_vehicles in args.vehicles:
+        vehicles = build_vehicles(num_vehicles)
+        t_pickle = bench(data_copy.deepcopy, vehicles, roadgraph, args.repeat)
+        t_clone = bench(data_copy.clone, vehicles, roadgraph, args.repeat)
+        print(f"{num_vehicles:>10}{t_pickle * 1e3:>16.2f}{t_clone * 1e3:>14.2f}"
+              f"{(t_pickle - t_clone) * 1e3:>14.2f}{t_pickle / t_clone:>9.1f}x")
+
+
+if __name__ == '__main__':
+    main()
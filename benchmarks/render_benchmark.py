@@ -0,0 +1,66 @@
+"""
+渲染开销基准测试:
+在自带的经典场景上分别以无界面模式和dearpygui界面模式运行仿真，比较每秒仿真步数
+用法: python benchmarks/render_benchmark.py [--max-time 60] [--scenario ...]
+"""
+import argparse
+import os
+import sys
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+os.chdir(PROJECT_ROOT)
+
+from Classic_Scenarios_Selection import (file_paths, SCENARIO_EGO_IDS, run_model,
+                                         loc_config)
+
+
+def bench_scenario(scenario_name, max_sim_time, headless):
+    path_info = file_paths[scenario_name]
+    if len(path_info) == 3:
+        net_file, rou_file, add_file = path_info
+    else:
+        net_file, rou_file = path_info
+        add_file = None
+    return run_model(
+        scenario_name=scenario_name,
+        net_file=net_file,
+        rou_file=rou_file,
+        add_file=add_file,
+        ego_veh_id=SCENARIO_EGO_IDS.get(scenario_name, "AV_0"),
+        data_base=f"bench_{scenario_name}_{'headless' if headless else 'gui'}.db",
+        SUMOGUI=loc_config["LOC_SUMO"],  # 不使用sumo-gui，只比较dearpygui渲染的开销
+        max_sim_time=max_sim_time,
+        if_clear_message_file=True,
+        headless=headless
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description='无界面/界面模式仿真速度对比')
+    parser.add_argument('--max-time', type=int, default=60,
+                        help='每个场景的最大仿真时间（秒） (默认: 60)')
+    parser.add_argument('--scenario', type=str, nargs='*',
+                        choices=list(file_paths.keys()),
+                        default=list(file_paths.keys()),
+                        help='参与测试的场景 (默认: 全部场景)')
+    parser.add_argument('--headless-only', action='store_true',
+                        help='只测试无界面模式（服务器上没有显示设备时使用）')
+    args = parser.parse_args()
+
+    modes = [True] if args.headless_only else [True, False]
+    rows = []
+    for scenario_name in args.scenario:
+        for headless in modes:
+            summary = bench_scenario(scenario_name, args.max_time, headless)
+            rows.append(summary)
+
+    print(f"{'scenario':<32}{'mode':<10}{'steps':>8}{'time [s]':>12}{'steps/s':>10}")
+    for r in rows:
+        mode = 'headless' if r['headless'] else 'gui'
+        print(f"{r['scenario']:<32}{mode:<10}{r['steps']:>8}"
+              f"{r['wall_time']:>12.2f}{r['steps_per_sec']:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""
+TSRL多车批量询问基准测试:
+模拟 MultiDecisionMaker 的一个决策周期：N 辆车各自的消息历史由本车消息（前后车关系、速度比较、
+变道安全、前方交叉口）与全部车辆都收到的环境消息（交叉口、停车车辆）组成，对每辆车询问 Roadsys_rule.txt 的全部规则。
+比较逐车询问（每辆车构建事实知识库，逐条规则询问）与 RuleBase.ask_batch（相同的事实只加入一次，
+每条规则对全部车辆只连接一次前提）的总耗时，两者的结果相同。
+用法: python benchmarks/tsrl_batch_benchmark.py [--vehicles 10 50 200] [--shared 40] [--repeat 3]
+"""
+import argparse
+import os
+import sys
+import time
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(PROJECT_ROOT, 'TSRL_representation'))
+
+from Rule_base import RuleBase
+
+
+def environment_messages(num_messages):
+    """交叉口与停在交叉口的车辆，每个交叉口两条消息"""
+    messages = []
+    for k in range(num_messages // 2):
+        messages.append('IsJunction(J{});'.format(k))
+        messages.append('StopAt(S{},J{});'.format(k, k))
+    return messages
+
+
+def vehicle_messages(i, num_junctions):
+    vid, front = 'V{}'.format(i), 'V{}'.format(i + 1)
+    return ['VehicleInLane({},{},Front);'.format(front, vid),
+            '{}({},{});'.format('GreaterSpeed' if i % 2 else 'SlowerSpeed', vid, front),
+            'LeftChangeLaneSafe({});'.format(vid),
+            'HasNextJunction({},J{});'.format(vid, i % num_junctions)]
+
+
+def histories(num_vehicles, num_shared):
+    shared = environment_messages(num_shared)
+    num_junctions = max(num_shared // 2, 1)
+    return {'V{}'.format(i): vehicle_messages(i, num_junctions) + shared for i in range(num_vehicles)}
+
+
+def ask_each(rule_base, histories):
+    results = {}
+    for vehicle_id, messages in histories.items():
+        facts = RuleBase.facts(messages)
+        results[vehicle_id] = [RuleBase.ask(rule, facts) for rule in rule_base.rules]
+    return results
+
+
+def bench(ask, rule_base, histories, repeat):
+    best, results = float('inf'), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        results = ask(rule_base, histories)
+        best = min(best, time.perf_counter() - start)
+    return best, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='逐车询问与多车批量询问的决策周期耗时对比')
+    parser.add_argument('--vehicles', type=int, nargs='*', default=[10, 50, 200],
+                        help='车辆数 (默认: 10 50 200)')
+    parser.add_argument('--shared', type=int, default=40,
+                        help='每辆车都收到的环境消息条数 (默认: 40)')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='重复次数，取最短耗时 (默认: 3)')
+    args = parser.parse_args()
+
+    rules_file = os.path.join(PROJECT_ROOT, 'TSRL_inference', 'Rules', 'Roadsys_rule.txt')
+    rule_base = RuleBase.load(rules_file, use_compiled=False)
+    print(f"{'vehicles':>10}{'proved':>8}{'each [ms]':>12}{'batch [ms]':>12}{'speedup':>10}")
+    for num_vehicles in args.vehicles:
+        vehicle_histories = histories(num_vehicles, args.shared)
+        t_each, each = bench(ask_each, rule_base, vehicle_histories, args.repeat)
+        t_batch, batch = bench(RuleBase.ask_batch, rule_base, vehicle_histories, args.repeat)
+        proved = 0
+        for vehicle_id, answers in each.items():
+            assert [a.action for a in answers] == [a.action for a in batch[vehicle_id]]
+            proved += sum(a.proved for a in answers)
+        print(f"{num_vehicles:>10}{proved:>8}{t_each * 1e3:>12.1f}{t_batch * 1e3:>12.1f}"
+              f"{t_each / t_batch:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
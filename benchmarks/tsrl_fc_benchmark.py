@@ -0,0 +1,114 @@
+"""
+TSRL前向链接基准测试:
+在 Roadsys_rule.txt 规则与规模递增的合成事实上，比较 fol_fc_ask 的 naive（枚举常量的笛卡尔积）
+与 semi_naive（按索引连接前提、只计算用到新事实的推导）两种策略推出全部结论的耗时。
+naive 的耗时随常量个数平方增长，超过 --naive-max 个事实时不再运行。
+用法: python benchmarks/tsrl_fc_benchmark.py [--max-exp 4] [--naive-max 100]
+"""
+import argparse
+import os
+import sys
+import time
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(PROJECT_ROOT, 'TSRL_representation'))
+
+import Inference_engine
+import Stmt
+from Expr import Constant, Predicate, Variable
+from Parser import Parser
+from Scanner import Scanner
+from Tokentype import Token, TokenType
+
+
+def parse(source):
+    return Parser(Scanner(source).scan_tokens()).parse()
+
+
+def load_rules(kb):
+    rules_file = os.path.join(PROJECT_ROOT, 'TSRL_inference', 'Rules', 'Roadsys_rule.txt')
+    with open(rules_file, encoding='utf-8') as f:
+        for stmt in parse(f.read()):
+            if isinstance(stmt, Stmt.Expression):
+                kb.tell(stmt.expression)
+
+
+def const(name):
+    return Constant(name, Token(TokenType.IDENTIFIER, name, None, 0))
+
+
+def pred(name, *args):
+    return Predicate(name, Token(TokenType.IDENTIFIER, name, None, 0),
+                     *[const(a) for a in args])
+
+
+def var(name):
+    return Variable(name, Token(TokenType.IDENTIFIER, name, None, 0))
+
+
+def synthetic_facts(num):
+    """模拟路网中的车辆与交叉口：前后车关系、速度比较、紧急停车、变道安全与交叉口拥堵"""
+    facts = []
+    kinds = ('VehicleInLane', 'GreaterSpeed', 'EmergencyStation', 'LeftChangeLaneSafe',
+             'HasNextJunction', 'StopAt')
+    num_junctions = max(1, num // 20)
+    for j in range(num_junctions):
+        facts.append(pred('IsJunction', 'J{}'.format(j)))
+    # 每辆车依次产生 kinds 中的各类事实，使规则能够逐层推出 CheckChangeLane、LeftChangeLane 等结论
+    for i in range(num - num_junctions):
+        kind, k = kinds[i % len(kinds)], i // len(kinds)
+        vid, other, junction = 'V{}'.format(k), 'V{}'.format(k + 1), 'J{}'.format(k % num_junctions)
+        if kind == 'VehicleInLane':
+            facts.append(pred(kind, other, vid, 'Front'))
+        elif kind == 'GreaterSpeed':
+            facts.append(pred(kind, vid, other))
+        elif kind in ('HasNextJunction', 'StopAt'):
+            facts.append(pred(kind, vid, junction))
+        else:
+            facts.append(pred(kind, vid))
+    return facts
+
+
+def build_kb(facts):
+    kb = Inference_engine.FolKB()
+    for fact in facts:
+        kb.tell(fact)
+    load_rules(kb)
+    return kb
+
+
+def time_fc(facts, query, strategy):
+    """在新建的知识库上推出全部结论，返回 (耗时, 答案个数)"""
+    kb = build_kb(facts)
+    start = time.perf_counter()
+    answers = list(Inference_engine.fol_fc_ask(kb, query, strategy=strategy))
+    return time.perf_counter() - start, len(answers)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='fol_fc_ask 朴素与半朴素前向链接的耗时对比')
+    parser.add_argument('--max-exp', type=int, default=4,
+                        help='最大事实数量为 10^max-exp (默认: 4)')
+    parser.add_argument('--naive-max', type=int, default=100,
+                        help='naive 策略的最大事实数量 (默认: 100)')
+    args = parser.parse_args()
+
+    sizes = sorted({n for exp in range(1, args.max_exp + 1) for n in (10 ** exp, 2 * 10 ** exp)
+                    if n <= 10 ** args.max_exp})
+    query = Predicate('LeftChangeLane', Token(TokenType.IDENTIFIER, 'LeftChangeLane', None, 0),
+                      var('x'))
+    print(f"{'facts':>8}{'answers':>10}{'naive [ms]':>14}{'semi-naive [ms]':>18}{'speedup':>10}")
+    for num in sizes:
+        facts = synthetic_facts(num)
+        semi, answers = time_fc(facts, query, 'semi_naive')
+        if num <= args.naive_max:
+            naive, naive_answers = time_fc(facts, query, 'naive')
+            assert naive_answers == answers
+            print(f"{num:>8}{answers:>10}{naive * 1e3:>14.1f}{semi * 1e3:>18.1f}"
+                  f"{naive / semi:>10.1f}")
+        else:
+            print(f"{num:>8}{answers:>10}{'-':>14}{semi * 1e3:>18.1f}{'-':>10}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+"""
+TSRL知识库ASK延迟基准测试:
+消息事实数量从 10^2 增加到 10^5，比较带子句索引（谓词与常量参数）的 FolKB 与逐条尝试全部子句（无索引）的ASK耗时
+用法: python benchmarks/tsrl_kb_benchmark.py [--max-exp 5] [--repeat 20]
+"""
+import argparse
+import os
+import sys
+import time
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(PROJECT_ROOT, 'TSRL_representation'))
+
+import Inference_engine
+import Stmt
+from Expr import Constant, Predicate
+from Parser import Parser
+from Scanner import Scanner
+from Tokentype import Token, TokenType
+
+
+class FlatFolKB(Inference_engine.FolKB):
+    """改进前的行为：每个目标都与知识库中的全部子句尝试合一"""
+
+    def fetch_rules_for_goal(self, goal):
+        return self.clauses
+
+
+def parse(source):
+    return Parser(Scanner(source).scan_tokens()).parse()
+
+
+def load_rules(kb):
+    rules_file = os.path.join(PROJECT_ROOT, 'TSRL_inference', 'Rules', 'Roadsys_rule.txt')
+    with open(rules_file, encoding='utf-8') as f:
+        for stmt in parse(f.read()):
+            if isinstance(stmt, Stmt.Expression):
+                kb.tell(stmt.expression)
+
+
+def const(name):
+    return Constant(name, Token(TokenType.IDENTIFIER, name, None, 0))
+
+
+def pred(name, *args):
+    return Predicate(name, Token(TokenType.IDENTIFIER, name, None, 0),
+                     *[const(a) for a in args])
+
+
+def message_facts(num):
+    """模拟消息历史中的事实：前后车关系、速度比较与变道安全信息"""
+    facts = []
+    kinds = ('VehicleInLane', 'GreaterSpeed', 'SlowerSpeed', 'LeftChangeLaneSafe')
+    for i in range(num):
+        kind = kinds[i % len(kinds)]
+        vid, other = 'V{}'.format(i), 'V{}'.format(i + 1)
+        if kind == 'VehicleInLane':
+            facts.append(pred(kind, other, vid, 'Front'))
+        elif kind == 'LeftChangeLaneSafe':
+            facts.append(pred(kind, vid))
+        else:
+            facts.append(pred(kind, vid, other))
+    return facts
+
+
+def build_kb(kb_class, facts):
+    kb = kb_class()
+    for fact in facts:
+        kb.tell(fact)
+    load_rules(kb)
+    return kb
+
+
+def time_ask(kb, query, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        kb.ask(query)
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description='FolKB子句索引的ASK延迟对比')
+    parser.add_argument('--max-exp', type=int, default=5,
+                        help='最大事实数量为 10^max-exp (默认: 5)')
+    parser.add_argument('--repeat', type=int, default=20,
+                        help='每个查询的重复次数 (默认: 20)')
+    args = parser.parse_args()
+
+    # 查询一辆车的变道决策（第一个参数为常量）以及键不存在时的快速失败
+    queries = {
+        'LeftChangeLane(V8)': lambda: pred('LeftChangeLane', 'V8'),
+        'KeepLane(V9)': lambda: pred('KeepLane', 'V9'),
+        'Congestion(J1)': lambda: pred('Congestion', 'J1'),
+    }
+    print(f"{'facts':>8}  {'query':<22}{'flat [ms]':>12}{'indexed [ms]':>14}{'speedup':>10}")
+    for exp in range(2, args.max_exp + 1):
+        facts = message_facts(10 ** exp)
+        flat_kb = build_kb(FlatFolKB, facts)
+        indexed_kb = build_kb(Inference_engine.FolKB, facts)
+        # 无索引时单次查询可能耗时数秒，相应减少重复次数
+        flat_repeat = max(1, args.repeat // 10 ** max(0, exp - 3))
+        for name, make_query in queries.items():
+            query = make_query()
+            assert (flat_kb.ask(query) is False) == (indexed_kb.ask(query) is False)
+            flat = time_ask(flat_kb, query, flat_repeat) * 1e3
+            indexed = time_ask(indexed_kb, query, args.repeat) * 1e3
+            print(f"{10 ** exp:>8}  {name:<22}{flat:>12.3f}{indexed:>14.3f}"
+                  f"{flat / indexed:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+"""
+TSRL带表反向链接基准测试:
+模拟一个决策周期：在 Roadsys_rule.txt 规则与 N 辆车的消息事实上，依次询问每辆车的
+LetStopBeforeJunction、CheckChangeLane、KeepLane、LeftChangeLane、RightChangeLane，
+比较不带表（每次询问重新证明子目标）与带表（子目标的答案在询问之间复用）的 FolKB 的总耗时。
+用法: python benchmarks/tsrl_tabling_benchmark.py [--vehicles 10 50 200] [--repeat 3]
+"""
+import argparse
+import os
+import sys
+import time
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(PROJECT_ROOT, 'TSRL_representation'))
+
+import Inference_engine
+import Stmt
+from Expr import Constant, Predicate
+from Parser import Parser
+from Scanner import Scanner
+from Tokentype import Token, TokenType
+
+ACTIONS = ('LetStopBeforeJunction', 'CheckChangeLane', 'KeepLane', 'LeftChangeLane',
+           'RightChangeLane')
+
+
+def parse(source):
+    return Parser(Scanner(source).scan_tokens()).parse()
+
+
+def load_rules(kb):
+    rules_file = os.path.join(PROJECT_ROOT, 'TSRL_inference', 'Rules', 'Roadsys_rule.txt')
+    with open(rules_file, encoding='utf-8') as f:
+        for stmt in parse(f.read()):
+            if isinstance(stmt, Stmt.Expression):
+                kb.tell(stmt.expression)
+
+
+def const(name):
+    return Constant(name, Token(TokenType.IDENTIFIER, name, None, 0))
+
+
+def pred(name, *args):
+    return Predicate(name, Token(TokenType.IDENTIFIER, name, None, 0),
+                     *[const(a) for a in args])
+
+
+def message_facts(num_vehicles):
+    """每辆车的前后车关系、速度比较、变道安全与前方交叉口，每 5 辆车有一辆停在交叉口"""
+    facts = []
+    for i in range(num_vehicles):
+        vid, front, junction = 'V{}'.format(i), 'V{}'.format(i + 1), 'J{}'.format(i // 10)
+        facts.append(pred('VehicleInLane', front, vid, 'Front'))
+        facts.append(pred('GreaterSpeed' if i % 2 else 'SlowerSpeed', vid, front))
+        facts.append(pred('LeftChangeLaneSafe', vid))
+        facts.append(pred('HasNextJunction', vid, junction))
+        if i % 5 == 0:
+            facts.append(pred('StopAt', vid, junction))
+            facts.append(pred('IsJunction', junction))
+    return facts
+
+
+def build_kb(facts, tabling):
+    kb = Inference_engine.FolKB(tabling=tabling)
+    for fact in facts:
+        kb.tell(fact)
+    load_rules(kb)
+    return kb
+
+
+def decision_cycle(kb, num_vehicles):
+    """依次询问每辆车的各个行为，返回证明成立的询问个数"""
+    proved = 0
+    for i in range(num_vehicles):
+        for action in ACTIONS:
+            proved += kb.ask(pred(action, 'V{}'.format(i))) is not False
+    return proved
+
+
+def main():
+    parser = argparse.ArgumentParser(description='FolKB带表反向链接的决策周期耗时对比')
+    parser.add_argument('--vehicles', type=int, nargs='*', default=[10, 50, 200],
+                        help='车辆数 (默认: 10 50 200)')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='每个知识库上重复的决策周期数，第一个周期之后带表的询问直接查表 (默认: 3)')
+    args = parser.parse_args()
+
+    print(f"{'vehicles':>10}{'proved':>8}{'plain [ms]':>14}{'tabled [ms]':>14}{'speedup':>10}")
+    for num_vehicles in args.vehicles:
+        facts = message_facts(num_vehicles)
+        times, results = {}, {}
+        for tabling in (False, True):
+            kb = build_kb(facts, tabling)
+            start = time.perf_counter()
+            for _ in range(args.repeat):
+                results[tabling] = decision_cycle(kb, num_vehicles)
+            times[tabling] = time.perf_counter() - start
+        assert results[False] == results[True]
+        print(f"{num_vehicles:>10}{results[True]:>8}{times[False] * 1e3:>14.1f}"
+              f"{times[True] * 1e3:>14.1f}{times[False] / times[True]:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
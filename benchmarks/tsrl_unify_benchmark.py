@@ -0,0 +1,96 @@
+"""
+TSRL推理引擎基本操作的吞吐量基准测试:
+对 Roadsys_rule.txt 中的规则与消息事实，测量 unify_mm、unify_trail、subst（有绑定 / 无绑定）与
+standardize_variables 每秒的调用次数，以及分别使用两种合一算法 ASK 一条规则头部的耗时。
+用法: python benchmarks/tsrl_unify_benchmark.py [--number 20000] [--repeat 5]
+"""
+import argparse
+import os
+import sys
+import timeit
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(PROJECT_ROOT, 'TSRL_representation'))
+
+import Inference_engine
+import Stmt
+from Expr import Constant, Predicate, Variable
+from Parser import Parser
+from Scanner import Scanner
+from Tokentype import Token, TokenType
+
+
+def parse(source):
+    return Parser(Scanner(source).scan_tokens()).parse()
+
+
+def load_rules():
+    rules_file = os.path.join(PROJECT_ROOT, 'TSRL_inference', 'Rules', 'Roadsys_rule.txt')
+    with open(rules_file, encoding='utf-8') as f:
+        return [stmt.expression for stmt in parse(f.read()) if isinstance(stmt, Stmt.Expression)]
+
+
+def token(name):
+    return Token(TokenType.IDENTIFIER, name, None, 0)
+
+
+def pred(name, *args):
+    return Predicate(name, token(name),
+                     *[Variable(a, token(a)) if a[0].islower() else Constant(a, token(a))
+                       for a in args])
+
+
+def build_kb(rules, num_vehicles, unifier='mm'):
+    kb = Inference_engine.FolKB(unifier=unifier)
+    for i in range(num_vehicles):
+        vid, front = 'V{}'.format(i), 'V{}'.format(i + 1)
+        kb.tell(pred('VehicleInLane', front, vid, 'Front'))
+        kb.tell(pred('GreaterSpeed', vid, front))
+        kb.tell(pred('LeftChangeLaneSafe', vid))
+    for rule in rules:
+        kb.tell(rule)
+    return kb
+
+
+def main():
+    parser = argparse.ArgumentParser(description='unify_mm / subst / standardize_variables 吞吐量')
+    parser.add_argument('--number', type=int, default=20000,
+                        help='每次计时的调用次数 (默认: 20000)')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='计时次数，取最短耗时 (默认: 5)')
+    args = parser.parse_args()
+
+    rules = load_rules()
+    rule = rules[-2]  # LeftChangeLane(x):-CheckChangeLane(x),LeftChangeLaneSafe(x)
+    pattern = pred('VehicleInLane', 'y', 'x', 'Front')
+    fact = pred('VehicleInLane', 'V2', 'V1', 'Front')
+    theta = Inference_engine.unify_mm(pattern, fact, {})
+    body = Inference_engine.conjuncts(rules[4].args[0])  # CheckChangeLane 规则的前提
+    unbound = {Variable('z', token('z')): Constant('V9', token('V9'))}
+    kbs = {unifier: build_kb(rules, 50, unifier) for unifier in ('mm', 'trail')}
+    query = pred('LeftChangeLane', 'V7')
+
+    cases = {
+        'unify_mm (match)': lambda: Inference_engine.unify_mm(pattern, fact, {}),
+        'unify_mm (clash)': lambda: Inference_engine.unify_mm(
+            pattern, pred('VehicleInLane', 'V2', 'V1', 'Rear'), {}),
+        'unify_trail (match)': lambda: Inference_engine.unify_trail(
+            pattern, fact, Inference_engine.Bindings()),
+        'unify_trail (clash)': lambda: Inference_engine.unify_trail(
+            pattern, pred('VehicleInLane', 'V2', 'V1', 'Rear'), Inference_engine.Bindings()),
+        'subst (bound)': lambda: Inference_engine.subst(theta, body),
+        'subst (no binding)': lambda: Inference_engine.subst(unbound, body),
+        'standardize_variables': lambda: Inference_engine.standardize_variables(rule),
+    }
+    print(f"{'operation':<24}{'calls/s':>14}{'us/call':>10}")
+    for name, fn in cases.items():
+        best = min(timeit.repeat(fn, number=args.number, repeat=args.repeat))
+        print(f"{name:<24}{args.number / best:>14.0f}{best / args.number * 1e6:>10.2f}")
+    number = max(1, args.number // 100)
+    for unifier, kb in kbs.items():
+        best = min(timeit.repeat(lambda: kb.ask(query), number=number, repeat=args.repeat))
+        print(f"{'ask (' + unifier + ')':<24}{number / best:>14.0f}{best / number * 1e6:>10.2f}")
+
+
+if __name__ == '__main__':
+    main()
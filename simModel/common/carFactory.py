@@ -14,16 +14,17 @@ from collections import deque
 from math import cos, pi, sin
 from collections import defaultdict
 
-import dearpygui.dearpygui as dpg
 from rich import print
 import numpy as np
 import traci
 from traci import TraCIException
 
 from simModel.common.networkBuild import NetworkBuild, Rebuild
+from simModel.common.traciCommand import TraciCommandQueue
 from utils.simBase import CoordTF, deduceEdge
 from utils.trajectory import Trajectory
 from utils.roadgraph import NormalLane, JunctionLane
+from utils.lazy_dpg import dpg
 
 class Vehicle:# 定义车辆类别
     def __init__(self, id: str) -> None:
@@ -266,10 +267,13 @@ class Vehicle:# 定义车辆类别
     # used for real-time simulation mode.
     # 进入控制模式并控制车辆
     # 用于实时仿真模式
+    # cmdQueue: TraciCommandQueue，传入时指令只入队，由 Model 在仿真步前统一发送
     def controlSelf(
         self, centerx: float, centery: float,
-        yaw: float, speed: float, accel: float, stop_flag: bool
+        yaw: float, speed: float, accel: float, stop_flag: bool,
+        cmdQueue: TraciCommandQueue = None
     ):
+        tv = cmdQueue if cmdQueue else traci.vehicle
         x = centerx + (self.length / 2) * cos(yaw)
         y = centery + (self.length / 2) * sin(yaw)
         angle = (pi / 2 - yaw) * 180 / pi
@@ -280,39 +284,48 @@ class Vehicle:# 定义车辆类别
             accel = 0.0
         
         if self._iscontroled:
-            traci.vehicle.moveToXY(self.id, '', -1, x, y,
-                                   angle=angle, keepRoute=2)
-            traci.vehicle.setSpeed(self.id, speed)
+            tv.moveToXY(self.id, '', -1, x, y,
+                        angle=angle, keepRoute=2)
+            tv.setSpeed(self.id, speed)
             if accel >= 0: # 如果车辆加速度大于等于0
-                traci.vehicle.setAccel(self.id, accel)
-                traci.vehicle.setDecel(self.id, self.maxDecel)
+                tv.setAccel(self.id, accel)
+                tv.setDecel(self.id, self.maxDecel)
             else:
-                traci.vehicle.setAccel(self.id, self.maxAccel)
-                traci.vehicle.setDecel(self.id, -accel)
+                tv.setAccel(self.id, self.maxAccel)
+                tv.setDecel(self.id, -accel)
         else:
-            traci.vehicle.setLaneChangeMode(self.id, 0)
-            traci.vehicle.setSpeedMode(self.id, 0)
-            traci.vehicle.moveToXY(self.id, '', -1, x, y,
-                                   angle=angle, keepRoute=2)
-            traci.vehicle.setSpeed(self.id, speed)
+            if cmdQueue:
+                # 控制状态切换，模式设置不能被去重
+                cmdQueue.forget(self.id)
+            tv.setLaneChangeMode(self.id, 0)
+            tv.setSpeedMode(self.id, 0)
+            tv.moveToXY(self.id, '', -1, x, y,
+                        angle=angle, keepRoute=2)
+            tv.setSpeed(self.id, speed)
             if accel >= 0: # 如果车辆加速度大于等于0
-                traci.vehicle.setAccel(self.id, accel)
-                traci.vehicle.setDecel(self.id, self.maxDecel)
+                tv.setAccel(self.id, accel)
+                tv.setDecel(self.id, self.maxDecel)
             else:
-                traci.vehicle.setAccel(self.id, self.maxAccel)
-                traci.vehicle.setDecel(self.id, -accel)
+                tv.setAccel(self.id, self.maxAccel)
+                tv.setDecel(self.id, -accel)
         
         self._iscontroled = 1
     # exit control mode and set self.iscontroled = 0
     # 退出控制模式并设置self.iscontroled = 0
-    def exitControlMode(self):
+    def exitControlMode(self, cmdQueue: TraciCommandQueue = None):
         if self._iscontroled:
-            try:
-                traci.vehicle.setLaneChangeMode(self.id, 0b101010101010)
-                traci.vehicle.setSpeedMode(self.id, 0b010111)
-                traci.vehicle.setSpeed(self.id, 20)
-            except TraCIException:
-                pass
+            if cmdQueue:
+                cmdQueue.forget(self.id)
+                cmdQueue.setLaneChangeMode(self.id, 0b101010101010)
+                cmdQueue.setSpeedMode(self.id, 0b010111)
+                cmdQueue.setSpeed(self.id, 20)
+            else:
+                try:
+                    traci.vehicle.setLaneChangeMode(self.id, 0b101010101010)
+                    traci.vehicle.setSpeedMode(self.id, 0b010111)
+                    traci.vehicle.setSpeed(self.id, 20)
+                except TraCIException:
+                    pass
             self._iscontroled = 0
 
     # 重放更新
@@ -320,11 +333,11 @@ class Vehicle:# 定义车辆类别
         # if plannedTrajectory and dbTrajectory are both empty, return 'Failure',
         # else, return 'Success'.
         # 如果plannedTrajectory和dbTrajectory都为空，返回'Failure'，否则返回'Success'
-        if self.plannedTrajectory and self.plannedTrajectory.xQueue:
+        if self.plannedTrajectory:
             x, y, yaw, speed, accel, laneID, lanePos, _ = \
                 self.plannedTrajectory.pop_last_state_r()
             self._iscontroled = 1
-        elif self.dbTrajectory and self.dbTrajectory.xQueue:
+        elif self.dbTrajectory:
             x, y, yaw, speed, accel, laneID, lanePos, routeIdx = \
                 self.dbTrajectory.pop_last_state_r()
         else:
@@ -406,14 +419,11 @@ class Vehicle:# 定义车辆类别
 
     # 绘制轨迹
     def plotTrajectory(self, node: dpg.node, ex: float, ey: float, ctf: CoordTF):
-        if self.plannedTrajectory and self.plannedTrajectory.xQueue:
+        if self.plannedTrajectory:
             # 生成轨迹点
             tps = [
-                ctf.dpgCoord(
-                    self.plannedTrajectory.xQueue[i],
-                    self.plannedTrajectory.yQueue[i],
-                    ex, ey
-                ) for i in range(len(self.plannedTrajectory.xQueue))
+                ctf.dpgCoord(x, y, ex, ey) for x, y in zip(
+                    self.plannedTrajectory.xQueue, self.plannedTrajectory.yQueue)
             ]
             # 绘制计划轨迹
             dpg.draw_polyline(tps, color=(205, 132, 241),
@@ -421,13 +431,10 @@ class Vehicle:# 定义车辆类别
 
     # 绘制实际轨迹
     def plotDBTrajectory(self, node: dpg.node, ex: float, ey: float, ctf: CoordTF):
-        if self.dbTrajectory and self.dbTrajectory.xQueue:
+        if self.dbTrajectory:
             tps = [
-                ctf.dpgCoord(
-                    self.dbTrajectory.xQueue[i],
-                    self.dbTrajectory.yQueue[i],
-                    ex, ey
-                ) for i in range(len(self.dbTrajectory.xQueue))
+                ctf.dpgCoord(x, y, ex, ey) for x, y in zip(
+                    self.dbTrajectory.xQueue, self.dbTrajectory.yQueue)
             ]
             dpg.draw_polyline(tps, color=(225, 112, 85),
                               parent=node, thickness=2)
@@ -449,14 +456,18 @@ class Vehicle:# 定义车辆类别
     def lanePosAppend(self, lanePos: float):
         self.lanePosQ.append(lanePos - self.length / 2)
 
-    def laneAppend(self, nb: NetworkBuild):
-        traciLaneID = traci.vehicle.getLaneID(self.id)
+    # traciLaneID/traciLanePos 可以由订阅结果直接传入，省去两次TraCI查询
+    def laneAppend(self, nb: NetworkBuild,
+                   traciLaneID: str = None, traciLanePos: float = None):
+        if traciLaneID is None:
+            traciLaneID = traci.vehicle.getLaneID(self.id)
         # 车道空值检查
         if traciLaneID == '':
             print(f"车辆{self.id}进入无效区域，准备移除")
             traci.vehicle.remove(self.id)
             return
-        traciLanePos = traci.vehicle.getLanePosition(self.id)
+        if traciLanePos is None:
+            traciLanePos = traci.vehicle.getLanePosition(self.id)
         routeIndex = self.routeIdxQ[-1]
         if routeIndex >= 1:
             currEdge = self.routes[routeIndex]
@@ -492,7 +503,7 @@ class Vehicle:# 定义车辆类别
                     self.laneIDQ.append(lid)
                     self.lanePosQ.append(s)
 
-    def routeIdxAppend(self, laneID: str):
+    def routeIdxAppend(self, laneID: str, routeIndex: int = None):
         curIndexList = self.LCRDict[laneID]
         if self.routeIdxQ:
             lastIndex = self.routeIdxQ[-1]
@@ -501,7 +512,9 @@ class Vehicle:# 定义车辆类别
                     self.routeIdxQ.append(curIndex)
                     return
         else:
-            self.routeIdxQ.append(traci.vehicle.getRouteIndex(self.id))
+            if routeIndex is None:
+                routeIndex = traci.vehicle.getRouteIndex(self.id)
+            self.routeIdxQ.append(routeIndex)
 
     def __hash__(self) -> int:
         return hash(self.id)
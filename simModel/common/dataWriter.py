@@ -0,0 +1,131 @@
+"""
+功能：仿真数据的后台持久化
+SQLiteWriter：
+    - 单一写入者 ：专用写线程持有一个长连接，数据库使用WAL模式，仿真线程只负责入队
+    - 批量写入   ：每次从队列中取出一大批记录，按表分组后用 executemany 写入并提交一次
+    - 背压统计   ：记录累计写入行数、批次数、队列积压的峰值与写入耗时
+    - 有界关闭   ：stop 最多等待 timeout 秒把队列写完，超时的剩余记录被丢弃并给出提示
+"""
+
+from __future__ import annotations
+
+import sqlite3
+import threading
+import time
+from queue import Empty, Queue
+
+from rich import print
+
+
+# 连接建立后执行的PRAGMA：WAL允许读写并发，NORMAL在WAL下只在检查点时同步
+WRITER_PRAGMAS = (
+    'PRAGMA journal_mode=WAL;',
+    'PRAGMA synchronous=NORMAL;',
+    'PRAGMA cache_size=-65536;', # 64 MiB 页缓存
+    'PRAGMA temp_store=MEMORY;',
+)
+
+
+class SQLiteWriter:
+    '''
+        Drains a queue of `(tableName, row)` records into a SQLite database
+        from a dedicated thread. Producers only call `dataQue.put`, so
+        persistence never blocks the simulation step. Rows that violate a
+        constraint are skipped, as the old per-row `IntegrityError` handler
+        did.
+    '''
+
+    def __init__(self, dbPath: str, dataQue: Queue,
+                 batchSize: int = 20000, interval: float = 0.5) -> None:
+        self.dbPath = dbPath
+        self.dataQue = dataQue
+        self.batchSize = batchSize # 每批最多写入的记录数
+        self.interval = interval # 队列为空时的等待时间，单位秒
+        self.stopEvent = threading.Event()
+        self.thread: threading.Thread = None
+        self.sqlCache: dict[tuple[str, int], str] = {}
+
+        self.rowCnt = 0 # 累计写入的记录数
+        self.batchCnt = 0 # 累计提交的批次数
+        self.maxBacklog = 0 # 写线程观察到的队列积压峰值
+        self.writeTime = 0.0 # 累计写入耗时，单位秒
+        self.droppedCnt = 0 # 关闭超时时丢弃的记录数
+
+    def start(self):
+        self.thread = threading.Thread(
+            target=self.run, name='SQLiteWriter', daemon=True)
+        self.thread.start()
+
+    def run(self):
+        conn = sqlite3.connect(self.dbPath, check_same_thread=False)
+        for pragma in WRITER_PRAGMAS:
+            conn.execute(pragma)
+        try:
+            while True:
+                stopping = self.stopEvent.is_set()
+                written = self.writeBatch(conn)
+                if stopping and not written:
+                    break
+                if not written:
+                    self.stopEvent.wait(self.interval)
+        finally:
+            conn.close()
+
+    def insertSQL(self, tableName: str, width: int) -> str:
+        key = (tableName, width)
+        if key not in self.sqlCache:
+            self.sqlCache[key] = 'INSERT OR IGNORE INTO %s VALUES (%s)' % (
+                tableName, ','.join('?' * width))
+        return self.sqlCache[key]
+
+    def writeBatch(self, conn: sqlite3.Connection) -> int:
+        backlog = self.dataQue.qsize()
+        self.maxBacklog = max(self.maxBacklog, backlog)
+        # 按表（及列数）分组，保持各表内的入队顺序
+        groups: dict[tuple[str, int], list[tuple]] = {}
+        cnt = 0
+        while cnt < self.batchSize:
+            try:
+                tableName, data = self.dataQue.get_nowait()
+            except Empty:
+                break
+            groups.setdefault((tableName, len(data)), []).append(data)
+            cnt += 1
+        if not cnt:
+            return 0
+
+        stime = time.perf_counter()
+        with conn:
+            for (tableName, width), rows in groups.items():
+                conn.executemany(self.insertSQL(tableName, width), rows)
+        self.writeTime += time.perf_counter() - stime
+        self.rowCnt += cnt
+        self.batchCnt += 1
+        return cnt
+
+    def stop(self, timeout: float = 10.0) -> bool:
+        '''
+            Waits at most `timeout` seconds for the queue to be written.
+            Returns False if records were left behind.
+        '''
+        if self.thread is None:
+            return True
+        self.stopEvent.set()
+        self.thread.join(timeout)
+        if self.thread.is_alive():
+            self.droppedCnt = self.dataQue.qsize()
+            print('[yellow]SQLiteWriter did not finish within {}s, '
+                  '{} records were not written.[/yellow]'.format(
+                      timeout, self.droppedCnt))
+            return False
+        return True
+
+    def stats(self) -> dict:
+        return {
+            'rows': self.rowCnt,
+            'batches': self.batchCnt,
+            'backlog': self.dataQue.qsize(),
+            'max_backlog': self.maxBacklog,
+            'write_time': round(self.writeTime, 3),
+            'dropped': self.droppedCnt,
+        }
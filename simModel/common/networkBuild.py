@@ -10,15 +10,22 @@ from utils.cubic_spline import Spline2D
 from utils.roadgraph import Junction, Edge, NormalLane, OVERLAP_DISTANCE, JunctionLane, TlLogic
 from simModel.common.facilitiesFactory import RSU,RSU_detector # 在networkBuild.py文件的导入部分添加RSU导入
 from queue import Queue
+import hashlib
+import os
+import pickle
 import sqlite3
 from threading import Thread
 import numpy as np
 import xml.etree.ElementTree as ET
-import dearpygui.dearpygui as dpg
+from utils.lazy_dpg import dpg
 from rich import print
 from datetime import datetime
 
 
+# 编译后路网文件的格式版本，路网解析逻辑或其中的数据结构变化时需要加一
+COMPILED_NET_VERSION = 2
+
+
 class geoHash:
     def __init__(self, id: tuple[int]) -> None:
         self.id = id
@@ -32,10 +39,12 @@ class NetworkBuild:
                  dataBase: str,
                  networkFile: str,
                  obsFile: str = None,
-                 addFile: str = None  # 9.7 添加add文件参数
+                 addFile: str = None,  # 9.7 添加add文件参数
+                 useCompiled: bool = True  # 是否使用编译后的路网缓存
                  ) -> None:
         self.dataBase = dataBase
         self.networkFile = networkFile
+        self.useCompiled = useCompiled
         self.obsFile = obsFile # 未被使用过
         self.addFile = addFile  # 9.7 添加addFile参数
         self.edges: dict[str, Edge] = {}
@@ -243,28 +252,24 @@ class NetworkBuild:
                         junctionLane.tlsIndex
                     ), 'REPLACE'
                 ))
-                center_line = []
-                for si in np.linspace(
-                    fromLane.course_spline.s[-1] - OVERLAP_DISTANCE,
-                    fromLane.course_spline.s[-1], num=20
-                ):
-                    center_line.append(
-                        fromLane.course_spline.calc_position(si))
-                for si in np.linspace(0, OVERLAP_DISTANCE, num=20):
-                    center_line.append(
-                        toLane.course_spline.calc_position(si)
-                    )
+                fromX, fromY = fromLane.course_spline.calc_position_many(
+                    np.linspace(
+                        fromLane.course_spline.s[-1] - OVERLAP_DISTANCE,
+                        fromLane.course_spline.s[-1], num=20
+                    ))
+                toX, toY = toLane.course_spline.calc_position_many(
+                    np.linspace(0, OVERLAP_DISTANCE, num=20))
                 # 添加junctionLane的course_spline初始化失败的处理逻辑
-                    try:
-                        junctionLane.course_spline = Spline2D(
-                            list(zip(*center_line))[0], list(zip(*center_line))[1]
-                        )
-                        junctionLane.getPlotElem()
-                    except Exception as e:
-                        logging.warning(f"Failed to initialize course_spline for junction lane {junctionLaneID}: {e}")
-                        junctionLane.course_spline = None
-                    junctionLane.last_lane_id = fromLaneID
-                    junctionLane.next_lane_id = toLaneID
+                try:
+                    junctionLane.course_spline = Spline2D(
+                        np.concatenate((fromX, toX)), np.concatenate((fromY, toY))
+                    )
+                    junctionLane.getPlotElem()
+                except Exception as e:
+                    logging.warning(f"Failed to initialize course_spline for junction lane {junctionLaneID}: {e}")
+                    junctionLane.course_spline = None
+                junctionLane.last_lane_id = fromLaneID
+                junctionLane.next_lane_id = toLaneID
                 fromLane.next_lanes[toLaneID] = (junctionLaneID, direction)
                 fromEdge.next_edge_info[toEdgeID].add(fromLaneID)
                 # add this junctionLane to it's parent Junction's JunctionLanes
@@ -276,7 +281,76 @@ class NetworkBuild:
                 junction.affGridIDs = junction.affGridIDs | jlAffGridIDs
                 junction.JunctionLanes.add(junctionLaneID)
 
+    # 编译后的路网与 .net.xml 放在同一目录下
+    @property
+    def compiledFile(self) -> str:
+        return self.networkFile + '.compiled.pkl'
+
+    def netFileHash(self) -> str:
+        sha = hashlib.sha1()
+        with open(self.networkFile, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                sha.update(chunk)
+        return sha.hexdigest()
+
+    # 读取编译后的路网，版本或 .net.xml 的哈希值不一致时返回 False
+    def loadCompiled(self, netHash: str) -> bool:
+        try:
+            with open(self.compiledFile, 'rb') as f:
+                compiled = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError,
+                ImportError):
+            return False
+        if compiled.get('version') != COMPILED_NET_VERSION or \
+                compiled.get('netHash') != netHash:
+            return False
+        self.edges = compiled['edges']
+        self.lanes = compiled['lanes']
+        self.junctions = compiled['junctions']
+        self.junctionLanes = compiled['junctionLanes']
+        self.tlLogics = compiled['tlLogics']
+        self.geoHashes = compiled['geoHashes']
+        # 数据库每次仿真都是新建的，路网信息仍需写入
+        for record in compiled['records']:
+            self.dataQue.put(record)
+        print('[green bold]Compiled network loaded from {}.[/green bold]'.format(
+            self.compiledFile))
+        return True
+
+    def dumpCompiled(self, netHash: str):
+        compiled = {
+            'version': COMPILED_NET_VERSION,
+            'netHash': netHash,
+            'edges': self.edges,
+            'lanes': self.lanes,
+            'junctions': self.junctions,
+            'junctionLanes': self.junctionLanes,
+            'tlLogics': self.tlLogics,
+            'geoHashes': self.geoHashes,
+            'records': list(self.dataQue.queue),
+        }
+        # 先写临时文件再替换，避免并行仿真读到写了一半的文件
+        tmpFile = '{}.{}.tmp'.format(self.compiledFile, os.getpid())
+        try:
+            with open(tmpFile, 'wb') as f:
+                pickle.dump(compiled, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmpFile, self.compiledFile)
+        except OSError as e:
+            print('[yellow]Failed to write compiled network: {}[/yellow]'.format(e))
+            if os.path.exists(tmpFile):
+                os.remove(tmpFile)
+
     def getData(self):
+        if self.useCompiled:
+            netHash = self.netFileHash()
+            if not self.loadCompiled(netHash):
+                self.parseNetwork()
+                self.dumpCompiled(netHash)
+        else:
+            self.parseNetwork()
+        self.parseAddFile()
+
+    def parseNetwork(self):
         elementTree = ET.parse(self.networkFile)
         root = elementTree.getroot()
         for child in root:
@@ -338,8 +412,9 @@ class NetworkBuild:
                 'geohashINFO',
                 (ghx, ghy, ghEdges, ghJunctions), 'INSERT'
             ))
-        
-        # 9.6新增：解析add.xml文件中的RSU信息
+
+    # 9.6新增：解析add.xml文件中的RSU信息
+    def parseAddFile(self):
         if self.addFile:
             try:
                 addTree = ET.parse(self.addFile)
@@ -822,22 +897,19 @@ class Rebuild(NetworkBuild):
                 else:
                     junctionLane = self.getJunctionLane(junctionLaneID)
                     fromEdgeID = deduceEdge(fromLaneID)
-                    center_line = []
-                    for si in np.linspace(
-                        fromLane.course_spline.s[-1] - OVERLAP_DISTANCE,
-                        fromLane.course_spline.s[-1], num=20
-                    ):
-                        center_line.append(
-                            fromLane.course_spline.calc_position(si))
-                    for si in np.linspace(0, OVERLAP_DISTANCE, num=20):
-                        center_line.append(
-                            self.getLane(
-                                toLaneID).course_spline.calc_position(si)
-                        )
+                    fromX, fromY = fromLane.course_spline.calc_position_many(
+                        np.linspace(
+                            fromLane.course_spline.s[-1] - OVERLAP_DISTANCE,
+                            fromLane.course_spline.s[-1], num=20
+                        ))
+                    toX, toY = self.getLane(
+                        toLaneID).course_spline.calc_position_many(
+                            np.linspace(0, OVERLAP_DISTANCE, num=20))
                     # 添加junctionLane的course_spline初始化失败的处理逻辑
                     try:
                         junctionLane.course_spline = Spline2D(
-                            list(zip(*center_line))[0], list(zip(*center_line))[1]
+                            np.concatenate((fromX, toX)),
+                            np.concatenate((fromY, toY))
                         )
                         junctionLane.getPlotElem()
                     except Exception as e:
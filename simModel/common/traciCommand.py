@@ -0,0 +1,158 @@
+"""
+功能：TraCI控制指令的批量发送
+TraciCommandQueue：
+    - 指令收集 ：与 traci.vehicle 同名的 set 方法，只入队不发送
+    - 指令去重 ：速度/加减速度/速度模式/换道模式与上一步相同时不再发送
+    - 批量发送 ：在 traci.simulationStep 之前调用 flush，所有指令打包到一条TraCI消息中
+    - 逐条回退 ：批量发送失败，或 traci 的 Connection 没有批量发送所需的内部接口时，逐条调用公开的 set 方法
+    - libsumo  ：以 LIBSUMO_AS_TRACI=1 运行时 traci 即为 libsumo，flush 直接进程内调用
+"""
+
+from __future__ import annotations
+
+import struct
+
+import traci
+import traci.constants as tc
+from rich import print
+from traci import TraCIException
+
+
+# method name: (variable id, traci pack format)
+SET_SPECS = {
+    'moveToXY': (tc.MOVE_TO_XY, 'tsidddbd'),
+    'setSpeed': (tc.VAR_SPEED, 'd'),
+    'setAccel': (tc.VAR_ACCEL, 'd'),
+    'setDecel': (tc.VAR_DECEL, 'd'),
+    'setSpeedMode': (tc.VAR_SPEEDSETMODE, 'i'),
+    'setLaneChangeMode': (tc.VAR_LANECHANGE_MODE, 'i'),
+}
+
+# 这些指令设置的是持久状态，取值不变时无需重复发送
+DEDUP_METHODS = {
+    'setSpeed', 'setAccel', 'setDecel', 'setSpeedMode', 'setLaneChangeMode'
+}
+
+# _sendBatch 使用的 traci.connection.Connection 内部接口，缺少任何一个时逐条发送
+CONNECTION_INTERNALS = ('_pack', '_string', '_queue', '_sendExact')
+
+
+class TraciCommandQueue:
+    '''
+        Collects the per-step vehicle control commands and sends them in one
+        burst. It exposes the subset of `traci.vehicle` set-methods used by
+        `Vehicle.controlSelf` / `Vehicle.exitControlMode`, so it can be passed
+        wherever `traci.vehicle` was used for control.
+    '''
+
+    def __init__(self) -> None:
+        # (vehID, method) -> args, 保持入队顺序
+        self.pending: dict[tuple[str, str], tuple] = {}
+        # vehID -> {method: 上一次已发送的args}
+        self.lastSent: dict[str, dict[str, tuple]] = {}
+        self.sentCnt = 0 # 累计发送的指令数
+        self.skippedCnt = 0 # 累计因取值未变化而省去的指令数
+
+    def _put(self, method: str, vehID: str, *args):
+        key = (vehID, method)
+        if method in DEDUP_METHODS and \
+                self.lastSent.get(vehID, {}).get(method) == args:
+            # 本步之前入队过不同的值时，需要撤销它
+            self.pending.pop(key, None)
+            self.skippedCnt += 1
+            return
+        self.pending[key] = args
+
+    def moveToXY(self, vehID: str, edgeID: str, lane: int, x: float, y: float,
+                 angle: float = tc.INVALID_DOUBLE_VALUE, keepRoute: int = 1):
+        self._put('moveToXY', vehID, edgeID, lane, x, y, angle, keepRoute)
+
+    def setSpeed(self, vehID: str, speed: float):
+        self._put('setSpeed', vehID, speed)
+
+    def setAccel(self, vehID: str, accel: float):
+        self._put('setAccel', vehID, accel)
+
+    def setDecel(self, vehID: str, decel: float):
+        self._put('setDecel', vehID, decel)
+
+    def setSpeedMode(self, vehID: str, sm: int):
+        self._put('setSpeedMode', vehID, sm)
+
+    def setLaneChangeMode(self, vehID: str, lcm: int):
+        self._put('setLaneChangeMode', vehID, lcm)
+
+    # 车辆控制状态发生切换时调用，保证下一次的模式设置一定会被发送
+    def forget(self, vehID: str):
+        self.lastSent.pop(vehID, None)
+
+    # 每步仿真后调用，丢弃已到达或被移除的车辆的去重缓存与未发送的指令
+    def prune(self, aliveIDs):
+        for vehID in self.lastSent.keys() - aliveIDs:
+            del self.lastSent[vehID]
+        for key in [key for key in self.pending if key[0] not in aliveIDs]:
+            del self.pending[key]
+
+    def flush(self):
+        if not self.pending:
+            return
+        commands = self.pending
+        self.pending = {}
+        connection = None if traci.isLibsumo() else \
+            getattr(traci.vehicle, '_connection', None)
+        if connection is not None and \
+                all(hasattr(connection, attr) for attr in CONNECTION_INTERNALS):
+            try:
+                self._sendBatch(connection, commands)
+                failed = set()
+            except TraCIException as e:
+                # 无法确定出错的是哪一条指令，逐条重发（set指令重复执行结果不变）
+                print('[yellow]Batched TraCI commands failed: {}, '
+                      'resending one by one[/yellow]'.format(e))
+                failed = self._sendEach(commands)
+        else:
+            # libsumo：没有socket往返，直接调用
+            failed = self._sendEach(commands)
+        for key, args in commands.items():
+            if key not in failed:
+                vehID, method = key
+                self.lastSent.setdefault(vehID, {})[method] = args
+        self.sentCnt += len(commands) - len(failed)
+
+    # 逐条调用公开的 set 方法，返回失败的指令，只使这些指令的去重缓存失效
+    def _sendEach(self, commands: dict[tuple[str, str], tuple]) -> set[tuple[str, str]]:
+        failed = set()
+        for (vehID, method), args in commands.items():
+            try:
+                getattr(traci.vehicle, method)(vehID, *args)
+            except TraCIException:
+                failed.add((vehID, method))
+                self.lastSent.get(vehID, {}).pop(method, None)
+        return failed
+
+    # 将所有set指令写入同一条TraCI消息，只产生一次socket往返
+    def _sendBatch(self, connection, commands: dict[tuple[str, str], tuple]):
+        cmdID = tc.CMD_SET_VEHICLE_VARIABLE
+        # 全部指令打包成功后才写入 connection，打包出错时不会留下半条消息
+        message = b''
+        queue = []
+        for (vehID, method), args in commands.items():
+            varID, format = SET_SPECS[method]
+            if method == 'moveToXY':
+                # compound: 7 components, matchThreshold 100 is the traci default
+                values = (7, ) + args + (100, )
+            else:
+                values = args
+            packed = connection._pack(format, *values)
+            length = len(packed) + 1 + 1 + 1 + 4 + len(vehID)
+            if length <= 255:
+                message += struct.pack('!BB', length, cmdID)
+            else:
+                message += struct.pack('!BiB', 0, length + 4, cmdID)
+            message += struct.pack('!B', varID)
+            message += struct.pack('!i', len(vehID)) + vehID.encode('latin1')
+            message += packed
+            queue.append(cmdID)
+        connection._string += message
+        connection._queue.extend(queue)
+        connection._sendExact()
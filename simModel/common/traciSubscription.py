@@ -0,0 +1,85 @@
+"""
+功能：基于TraCI变量订阅的车辆状态采集
+VehStateSubscriber：
+    - 订阅管理 ：车辆出发时一次性订阅位置、航向角、速度、加速度、车道、车道位置、路径索引
+    - 状态读取 ：每个仿真步只通过一次 getAllSubscriptionResults 读取全部车辆状态
+    - 进出管理 ：根据 simulation 订阅中的出发/到达列表自动增删订阅
+    - 碰撞统计 ：累计 simulation 订阅中每步发生碰撞的车辆数
+"""
+
+from __future__ import annotations
+
+import traci
+import traci.constants as tc
+from traci import TraCIException
+
+
+# 每辆车订阅的变量
+VEH_SUB_VARS = (
+    tc.VAR_TYPE,
+    tc.VAR_POSITION,
+    tc.VAR_ANGLE,
+    tc.VAR_SPEED,
+    tc.VAR_ACCEL,
+    tc.VAR_DECEL,
+    tc.VAR_LANE_ID,
+    tc.VAR_LANEPOSITION,
+    tc.VAR_ROUTE_INDEX,
+)
+
+# simulation 域订阅：每步出发/到达的车辆，以及发生碰撞的车辆数
+SIM_SUB_VARS = (
+    tc.VAR_DEPARTED_VEHICLES_IDS,
+    tc.VAR_ARRIVED_VEHICLES_IDS,
+    tc.VAR_COLLIDING_VEHICLES_NUMBER,
+)
+
+
+class VehStateSubscriber:
+    '''
+        Keeps one TraCI variable subscription per vehicle in the network.
+        Call `start()` once after `traci.start`, and `update()` right after
+        every `traci.simulationStep()`. The subscription results are shipped
+        back by SUMO together with the step response, so reading them does
+        not cost any extra round trip.
+    '''
+
+    def __init__(self) -> None:
+        self.subscribed: set[str] = set()
+        self.collidingCnt = 0 # 累计发生碰撞的车辆数（一次两车碰撞计为2）
+
+    def start(self):
+        traci.simulation.subscribe(SIM_SUB_VARS)
+        # 启动时已经在路网中的车辆
+        for vid in traci.vehicle.getIDList():
+            self.subscribe(vid)
+
+    def subscribe(self, vid: str):
+        if vid in self.subscribed:
+            return
+        try:
+            traci.vehicle.subscribe(vid, VEH_SUB_VARS)
+        except TraCIException:
+            return
+        self.subscribed.add(vid)
+
+    def update(self):
+        simResults = traci.simulation.getSubscriptionResults()
+        for vid in simResults.get(tc.VAR_ARRIVED_VEHICLES_IDS, ()):
+            self.subscribed.discard(vid)
+        for vid in simResults.get(tc.VAR_DEPARTED_VEHICLES_IDS, ()):
+            self.subscribe(vid)
+        self.collidingCnt += simResults.get(tc.VAR_COLLIDING_VEHICLES_NUMBER, 0)
+        # 被 traci.vehicle.remove 移除的车辆，SUMO 会自动丢弃其订阅
+        self.subscribed.intersection_update(self.results.keys())
+
+    @property
+    def results(self) -> dict[str, dict[int, object]]:
+        # traci 在每次 simulationStep 时刷新该字典
+        return traci.vehicle.getAllSubscriptionResults()
+
+    def isAlive(self, vid: str) -> bool:
+        return vid in self.results
+
+    def getState(self, vid: str) -> dict[int, object]:
+        return self.results.get(vid)
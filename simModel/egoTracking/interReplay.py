@@ -329,7 +329,7 @@ class InterReplayModel:
     def isInvolved(self, veh: Vehicle, currVehs: dict[str, Vehicle]) -> bool:
         # if the vehicle's dbTrajectory is too short, ATSISP will take over it
         # until the vehicle drive out of the AoI, avoiding the vhicles's suddenly fading.
-        if len(veh.dbTrajectory.states) <= 10:
+        if len(veh.dbTrajectory) <= 10:
             return True
         else:
             if self.VTCollisionCheck(veh, self.ego):
@@ -405,22 +405,22 @@ class InterReplayModel:
             dpg.set_value('a_series_tag', [ax, ay])
 
         if self.ego.plannedTrajectory:
-            if self.ego.plannedTrajectory.velQueue:
+            if len(self.ego.plannedTrajectory.velQueue):
                 vfy = list(self.ego.plannedTrajectory.velQueue)
                 vfy = list(self.ego.plannedTrajectory.velQueue)
                 vfx = list(range(1, len(vfy)+1))
                 dpg.set_value('v_series_tag_future', [vfx, vfy])
-            if self.ego.plannedTrajectory.accQueue:
+            if len(self.ego.plannedTrajectory.accQueue):
                 afy = list(self.ego.plannedTrajectory.accQueue)
                 afx = list(range(1, len(afy)+1))
                 dpg.set_value('a_series_tag_future', [afx, afy])
         else:
             if self.ego.dbTrajectory:
-                if self.ego.dbTrajectory.velQueue:
+                if len(self.ego.dbTrajectory.velQueue):
                     vfy = list(self.ego.dbTrajectory.velQueue)
                     vfx = list(range(1, len(vfy)+1))
                     dpg.set_value('v_series_tag_future', [vfx, vfy])
-                if self.ego.dbTrajectory.accQueue:
+                if len(self.ego.dbTrajectory.accQueue):
                     afy = list(self.ego.dbTrajectory.accQueue)
                     afx = list(range(1, len(afy)+1))
                     dpg.set_value('a_series_tag_future', [afx, afy])
@@ -508,10 +508,11 @@ class InterReplayModel:
             # when veh2 doesn't have planned trajectory, it will drive according
             # to the database, so veh1 and veh2 won't collide.
             return False
-        duration = min(len(tjA.states), len(tjB.states))
+        statesA, statesB = tjA.states, tjB.states
+        duration = min(len(statesA), len(statesB))
         for i in range(0, duration, 3):
-            stateA = tjA.states[i]
-            stateB = tjB.states[i]
+            stateA = statesA[i]
+            stateB = statesB[i]
             recA = Rectangle([stateA.x, stateA.y],
                              veh1.length, veh1.width, stateA.yaw)
             recB = Rectangle([stateB.x, stateB.y],
@@ -1,16 +1,14 @@
 import os
 import sqlite3
-import threading
-import time
 from typing import List
 import xml.etree.ElementTree as ET
 from datetime import datetime
 from queue import Queue
 from math import sin, cos, pi
 
-import dearpygui.dearpygui as dpg
 import numpy as np
 import traci
+import traci.constants as tc
 from rich import print
 from traci import TraCIException
 from traci import vehicle
@@ -19,11 +17,15 @@ from utils.roadgraph import RoadGraph
 
 from read_stop_info import validate_and_apply_stops
 from simModel.common.carFactory import Vehicle, egoCar
-from simModel.common.gui import GUI
 from simModel.egoTracking.movingScene import MovingScene
 from simModel.common.networkBuild import NetworkBuild
-from utils.trajectory import State, Trajectory
+from simModel.common.traciSubscription import VehStateSubscriber
+from simModel.common.traciCommand import TraciCommandQueue
+from simModel.common.dataWriter import SQLiteWriter
+from TSRL_interaction.message_journal import MessageJournal
+from utils.trajectory import ArrayTrajectory, State, Trajectory
 from utils.simBase import MapCoordTF, vehType
+from utils.lazy_dpg import dpg
 
 from evaluation.evaluation import RealTimeEvaluation
 import read_stop_info # 7.20 添加停车解析内容
@@ -44,6 +46,13 @@ class Model:
         simNote: the simulation note information, which can be any information you 
                 wish to record. For example, the version of your trajectory 
                 planning algorithm, or the user name of this simulation.
+        headless: if True, no GUI is created, nothing is drawn and dearpygui
+                is never imported. The simulation data is still stored in
+                the database.
+        port: TraCI port, 8813 by default. Pass None to let traci pick a free
+                port, so that several simulations can run at the same time.
+        seed: random seed passed to SUMO (`--seed`); SUMO's default if None.
+        sumoLog: file that SUMO writes its errors into.
     '''
 
     def __init__(self,
@@ -60,6 +69,10 @@ class Model:
                  communication: bool = False, # 25.8.16 新增参数，全局通信管理器
                  Scenario_Name: str = None, # 25.10.20 场景名称
                  config: dict = None, # 新增参数，用于传递配置信息
+                 headless: bool = False, # 无界面模式，不创建GUI
+                 port: int = 8813, # TraCI端口，None时自动分配空闲端口
+                 seed: int = None, # SUMO随机种子
+                 sumoLog: str = 'sumo_errors.log', # SUMO错误日志文件
                  ) -> None:
 
         print('[green bold]Model initialized at {}.[/green bold]'.format(
@@ -83,6 +96,10 @@ class Model:
         self.communication=communication # 25.8.16 新增参数，是否添加全局通信管理器
         self.Scenario_Name = Scenario_Name # 25.10.20 场景名称
         self.config = config  # 保存配置信息
+        self.headless = headless # 无界面模式
+        self.port = port
+        self.seed = seed
+        self.sumoLog = sumoLog
         
         # 从配置中获取DEAREA值，如果不存在则使用默认值50.0
         dearea = config.get("DEAREA", 50.0) if config else 50.0
@@ -101,24 +118,43 @@ class Model:
         self.createDatabase() # 创建数据库
         self.simDescriptionCommit(simNote)
         self.dataQue = Queue()
-        self.createTimer()
+        # 专用写线程将 dataQue 中的记录批量写入数据库
+        self.dataWriter = SQLiteWriter(
+            os.path.join("Database", self.dataBase), self.dataQue)
+        self.dataWriter.start()
         # 使用完整的数据库路径（包含Database/前缀）传递给NetworkBuild类
         db_path = os.path.join("Database", self.dataBase)
         self.nb = NetworkBuild(db_path, self.netFile, self.obsFile, self.addFile)
         self.nb.getData()
         self.nb.buildTopology()
 
-        self.ms = MovingScene(self.nb, self.ego, self.vehicles_with_stops)# 7.27 更新 Model 类初始化 MovingScene
+        # 是否通过ego车辆的上下文订阅获取周边车辆
+        contextSub = config.get("CONTEXT_SUBSCRIPTION", False) if config else False
+        # 控制指令批量发送：每步只在仿真步前产生一次TraCI往返
+        if config and config.get("BATCH_COMMANDS", False):
+            self.cmdQueue = TraciCommandQueue()
+        else:
+            self.cmdQueue = None
+        self.ms = MovingScene(self.nb, self.ego, self.vehicles_with_stops,
+                              contextSub=contextSub,
+                              cmdQueue=self.cmdQueue)# 7.27 更新 Model 类初始化 MovingScene
+        # 车辆状态订阅：每步一次性读取所有车辆状态
+        self.vehSub = VehStateSubscriber()
 
         self.allvTypes = None
 
-        try:
-            self.gui = GUI('real-time-ego',self)
-        except Exception as e:
-            # 记录GUI初始化错误
-            import logging
-            logging.error(f"GUI初始化失败: {str(e)}", exc_info=True)
-            raise  # 重新抛出异常以便上层处理
+        if self.headless:
+            self.gui = None
+        else:
+            # 只有需要界面时才导入GUI（及dearpygui）
+            from simModel.common.gui import GUI
+            try:
+                self.gui = GUI('real-time-ego',self)
+            except Exception as e:
+                # 记录GUI初始化错误
+                import logging
+                logging.error(f"GUI初始化失败: {str(e)}", exc_info=True)
+                raise  # 重新抛出异常以便上层处理
 
         self.evaluation = RealTimeEvaluation(dt=0.1)
 
@@ -297,35 +333,6 @@ class Model:
         cur.close()
         conn.close()
 
-    # 创建定时器
-    def createTimer(self):
-        if not self.tpEnd or not self.dataQue.empty():
-            t = threading.Timer(1, self.dataStore)
-            t.daemon = True
-            t.start()
-
-    # 将数据存储到数据库
-    def dataStore(self):
-        # stime = time.time()
-        cnt = 0
-        conn = sqlite3.connect("Database/" + self.dataBase, check_same_thread=False)
-        cur = conn.cursor()
-        while cnt < 1000 and not self.dataQue.empty():
-            tableName, data = self.dataQue.get()
-            sql = 'INSERT INTO %s VALUES ' % tableName + \
-                '(' + '?,'*(len(data)-1) + '?' + ')'
-            try:
-                cur.execute(sql, data)
-            except sqlite3.IntegrityError:
-                pass
-            cnt += 1
-
-        conn.commit()
-        cur.close()
-        conn.close()
-
-        self.createTimer()
-
     # DEFAULT_VEHTYPE
     # 获取所有车辆类型
     def getAllvTypeID(self) -> list:
@@ -355,13 +362,13 @@ class Model:
         else:
             num_clients = "1" # 设置客户端数量为1
         print("SUMO starting...\n正在启动sumo仿真...")
-        traci.start([
+        sumoCmd = [
             'sumo' if not self.SUMOGUI else 'sumo-gui', # 启动SUMO或SUMO-GUI
             '-n', self.netFile, # 加载网络文件
             '-r', self.rouFile, # 加载路由文件
             '--step-length', '0.1', # 设置步长为0.1秒
             '--xml-validation', 'never', # 设置XML验证为从不
-            '--error-log', 'sumo_errors.log', # 设置错误日志文件
+            '--error-log', self.sumoLog, # 设置错误日志文件
             '--lateral-resolution', '10', # 设置侧向分辨率为10
             '--start', # 设置启动参数
             '--quit-on-end', # 设置结束时退出
@@ -370,8 +377,13 @@ class Model:
             'remove', # 设置碰撞行为为移除
             "--num-clients",
             num_clients,
-        ], port = 8813)
-        traci.setOrder(1)
+        ]
+        if self.seed is not None:
+            sumoCmd += ['--seed', str(self.seed)] # 设置随机种子
+        traci.start(sumoCmd, port=self.port)
+        if not traci.isLibsumo(): # libsumo 为进程内仿真，没有多客户端顺序
+            traci.setOrder(1)
+        self.vehSub.start() # 订阅路网中车辆的状态
         print("route info analysing...\n正在解析rou.xml文件...")
 
         allvTypeID = self.getAllvTypeID() # 获取所有车辆类型ID
@@ -447,11 +459,11 @@ class Model:
             dpg.set_value('a_series_tag', [ax, ay])
 
         if self.ego.plannedTrajectory:
-            if self.ego.plannedTrajectory.velQueue:
+            if len(self.ego.plannedTrajectory.velQueue):
                 vfy = list(self.ego.plannedTrajectory.velQueue)
                 vfx = list(range(1, len(vfy) + 1))
                 dpg.set_value('v_series_tag_future', [vfx, vfy])
-            if self.ego.plannedTrajectory.accQueue:
+            if len(self.ego.plannedTrajectory.accQueue):
                 afy = list(self.ego.plannedTrajectory.accQueue)
                 afx = list(range(1, len(afy) + 1))
                 dpg.set_value('a_series_tag_future', [afx, afy])
@@ -470,8 +482,19 @@ class Model:
     def putEvaluationInfo(self, points: np.ndarray):
         self.dataQue.put(
             ('evaluationINFO', tuple([self.timeStep] + points.tolist())))
+    # 将当前帧的车辆信息和评估信息插入数据库，返回评估指标
+    def putSceneInfo(self) -> List[float]:
+        self.putFrameInfo(self.ego.id, 'ego', self.ego) # 将自车信息插入数据库
+        for v1 in self.ms.vehINAoI.values():
+            self.putFrameInfo(v1.id, 'AoI', v1)
+        for v2 in self.ms.outOfAoI.values():
+            self.putFrameInfo(v2.id, 'outOfAoI', v2)
+        points = self.evaluation.output_result() # 获取评估指标（偏移量、舒适度等）
+        self.putEvaluationInfo(self.evaluation.result) # 将评估信息插入数据库
+        return points
+
     # 绘制场景
-    def drawScene(self):
+    def drawScene(self, points: List[float]):
         ex, ey = self.ego.x, self.ego.y
         # 确保父节点存在且有效
         if dpg.does_item_exist("Canvas"):
@@ -483,17 +506,14 @@ class Model:
         self.ego.plotSelf('ego', node, ex, ey, self.gui.ctf) # 绘制自车模型（矩形+方向箭头）
         self.ego.plotdeArea(node, ex, ey, self.gui.ctf) # 绘制自车检测区域（蓝色半透明圆形）
         self.ego.plotTrajectory(node, ex, ey, self.gui.ctf) # 绘制自车轨迹（黄色线条）
-        self.putFrameInfo(self.ego.id, 'ego', self.ego) # 将自车信息插入数据库
         if self.ms.vehINAoI: # 绘制在自车检测区域内的车辆
             for v1 in self.ms.vehINAoI.values():
                 v1.plotSelf('AoI', node, ex, ey, self.gui.ctf)
                 v1.plotTrajectory(node, ex, ey, self.gui.ctf)
-                self.putFrameInfo(v1.id, 'AoI', v1)
         if self.ms.outOfAoI: # 绘制不在自车检测区域内的车辆
             for v2 in self.ms.outOfAoI.values():
                 v2.plotSelf('outOfAoI', node, ex, ey, self.gui.ctf)
                 v2.plotTrajectory(node, ex, ey, self.gui.ctf)
-                self.putFrameInfo(v2.id, 'outOfAoI', v2)
         # 绘制宏观地图动态元素（movingScene节点）中的AOI-ego橙色半透明圆形
         if dpg.does_item_exist('movingScene'):
             mvNode = dpg.add_draw_node(parent='movingScene') 
@@ -528,8 +548,6 @@ class Model:
                           size=20,
                           parent=infoNode)
         # 评估窗口雷达图（sEvaluation窗口）
-        points = self.evaluation.output_result() # 获取评估指标（偏移量、舒适度等）
-        self.putEvaluationInfo(self.evaluation.result) # 将评估信息插入数据库
         transformed_points = self._evaluation_transform_coordinate(points,
                                                                    scale=30) # 转换坐标，将评估指标转换为绘图坐标
         transformed_points.append(transformed_points[0]) # 雷达图绘制需要闭合，添加第一个点以闭合图形
@@ -572,14 +590,15 @@ class Model:
     # 获取车辆信息
     def getVehInfo(self, veh: Vehicle):
         vid = veh.id
-        # 车辆存在性检查
-        if vid not in traci.vehicle.getIDList():
+        # 车辆存在性检查，状态直接取自本步的订阅结果
+        state = self.vehSub.getState(vid)
+        if not state:
             return
         if veh.vTypeID:
             max_decel = veh.maxDecel
         # 车辆确认存在
         else:
-            vtypeid = traci.vehicle.getTypeID(vid) # 获取车辆类型ID
+            vtypeid = state[tc.VAR_TYPE] # 获取车辆类型ID
             if '@' in vtypeid:
                 vtypeid = vtypeid.split('@')[0]
             vtins = self.getvTypeIns(vtypeid) # 获取veh对应的车辆类型及其包含的信息
@@ -597,21 +616,21 @@ class Model:
             routes = ' '.join(veh.routes)
             self.putVehicleInfo(vid, vtins, routes)
             max_decel = veh.maxDecel
-        veh.yawAppend(traci.vehicle.getAngle(vid)) # 添加veh车辆偏航角
-        x, y = traci.vehicle.getPosition(vid) # 获取veh车辆位置
+        veh.yawAppend(state[tc.VAR_ANGLE]) # 添加veh车辆偏航角
+        x, y = state[tc.VAR_POSITION] # 获取veh车辆位置
         veh.xAppend(x) # 添加veh车辆x坐标
         veh.yAppend(y) # 添加veh车辆y坐标
 
         # veh.getStopInfo(veh.id)
-        veh.speedQ.append(traci.vehicle.getSpeed(vid)) # 添加veh车辆速度
-        if max_decel == traci.vehicle.getDecel(vid): # 如果车辆最大减速度等于当前减速度
-            accel = traci.vehicle.getAccel(vid)
+        veh.speedQ.append(state[tc.VAR_SPEED]) # 添加veh车辆速度
+        if max_decel == state[tc.VAR_DECEL]: # 如果车辆最大减速度等于当前减速度
+            accel = state[tc.VAR_ACCEL]
         else:
-            accel = -traci.vehicle.getDecel(vid)
+            accel = -state[tc.VAR_DECEL]
         veh.accelQ.append(accel)
-        laneID = traci.vehicle.getLaneID(vid)
-        veh.routeIdxAppend(laneID)
-        veh.laneAppend(self.nb)
+        laneID = state[tc.VAR_LANE_ID]
+        veh.routeIdxAppend(laneID, state[tc.VAR_ROUTE_INDEX])
+        veh.laneAppend(self.nb, laneID, state[tc.VAR_LANEPOSITION])
 
     def clear_message_files(self, traffic_manager, if_clear_message_file=False):
         """清理消息文件或清空消息内容
@@ -642,6 +661,7 @@ class Model:
                     traffic_manager.communication_manager.clear_display_text_content(loc=message_history_path)
             else:
                 # 通信功能未启用，只清理本地文件
+                MessageJournal.for_scenario(self.Scenario_Name).clear() # 清空消息历史日志
                 if if_clear_message_file:
                     # 删除本地消息文件
                     import glob
@@ -690,15 +710,16 @@ class Model:
         # 控制车辆在更新数据后移动
         # control vehicles after update its data
         # control happens next timestep
-        if veh.plannedTrajectory and veh.plannedTrajectory.xQueue:
+        if veh.plannedTrajectory:
             centerx, centery, yaw, speed, accel, stop_flag = veh.plannedTrajectory.pop_last_state(
             ) 
             try:
-                veh.controlSelf(centerx, centery, yaw, speed, accel, stop_flag) # 控制车辆移动 6.16:添加stop_flag
+                veh.controlSelf(centerx, centery, yaw, speed, accel, stop_flag,
+                                self.cmdQueue) # 控制车辆移动 6.16:添加stop_flag
             except:
                 return
         else:
-            veh.exitControlMode()
+            veh.exitControlMode(self.cmdQueue)
 
     def updateVeh(self): # 更新车辆状态
         self.vehMoveStep(self.ego) #首先更新ego主车状态
@@ -706,7 +727,7 @@ class Model:
             for v in self.ms.currVehicles.values(): # 遍历当前车辆列表
                 self.vehMoveStep(v) # 控制车辆移动
 
-    def setTrajectories(self, trajectories: Dict[str, Trajectory]):
+    def setTrajectories(self, trajectories: Dict[str, ArrayTrajectory]):
         for k, v in trajectories.items():
             if k == self.ego.id:
                 self.ego.plannedTrajectory = v
@@ -722,12 +743,13 @@ class Model:
         self.evaluation.update_data(self.ego, current_lane, agents)
 
     def getSce(self):
-        if self.ego.id in traci.vehicle.getIDList():
+        if self.vehSub.isAlive(self.ego.id):
             self.tpStart = 1
-            dpg.delete_item("Canvas", children_only=True)
-            dpg.delete_item("movingScene", children_only=True)
-            dpg.delete_item("simInfo", children_only=True)
-            dpg.delete_item("radarPlot", children_only=True)
+            if not self.headless:
+                dpg.delete_item("Canvas", children_only=True)
+                dpg.delete_item("movingScene", children_only=True)
+                dpg.delete_item("simInfo", children_only=True)
+                dpg.delete_item("radarPlot", children_only=True)
             self.ms.updateScene(self.dataQue, self.timeStep) # 更新获取的场景信息
             self.getVehInfo(self.ego) # 获取ego主车的信息
             self.updateVeh() # 更新车辆状态，确保laneIDQ等队列有值
@@ -737,8 +759,10 @@ class Model:
                     self.getVehInfo(v) # 获取场景内周边车辆的信息
 
             self.update_evluation_data()
-            self.drawScene() # 绘制ATPSIP场景
-            self.plotVState() # 绘制车辆状态曲线
+            points = self.putSceneInfo() # 存储当前帧信息
+            if not self.headless:
+                self.drawScene(points) # 绘制ATPSIP场景
+                self.plotVState() # 绘制车辆状态曲线
         else:
             if self.tpStart:
                 print('[cyan]The ego car has reached the destination.[/cyan]')
@@ -807,7 +831,8 @@ class Model:
                           size=20,
                           parent=bgNode)
 
-    def drawMapBG(self):
+    # 将路网边界写入数据库
+    def commitNetBoundary(self):
         # left-bottom: x1, y1
         # top-right: x2, y2
         ((x1, y1), (x2, y2)) = traci.simulation.getNetBoundary()
@@ -817,6 +842,10 @@ class Model:
         cur.execute(f"""UPDATE simINFO SET netBoundary = '{netBoundary}';""")
         conn.commit()
         conn.close()
+        return (x1, y1), (x2, y2)
+
+    def drawMapBG(self):
+        (x1, y1), (x2, y2) = self.commitNetBoundary()
         self.mapCoordTF = MapCoordTF((x1, y1), (x2, y2), 'macroMap')
         mNode = dpg.add_draw_node(parent='mapBackground')
         for jid in self.nb.junctions.keys():
@@ -830,8 +859,15 @@ class Model:
         dpg.render_dearpygui_frame() # 渲染dearpygui框架
 
     def moveStep(self):
-        if self.gui.is_running and self.timeStep < self.max_steps:
+        isRunning = self.headless or self.gui.is_running
+        if isRunning and self.timeStep < self.max_steps:
+            if self.cmdQueue:
+                self.cmdQueue.flush() # 本步所有控制指令一次性发送
             traci.simulationStep() 
+            self.vehSub.update() # 处理出发/到达车辆的订阅
+            if self.cmdQueue:
+                # 丢弃已到达或被移除车辆的指令缓存
+                self.cmdQueue.prune(self.vehSub.results.keys())
             # 7.15：[target]display函数的更新迭代：展示AOI内所有车辆此时刻的信息发出和接受信息
             self.timeStep += 1
             # 7.20：获取所有车辆ID，实例化车辆列表
@@ -840,18 +876,25 @@ class Model:
                 self.vehicles=self.getVehicleList()
         elif self.timeStep >= self.max_steps: # 如果模拟步长达到最大步长
             self.tpEnd = 1 # 设置模拟结束标志
-        if not dpg.is_dearpygui_running(): # 如果dearpygui未运行
+        if not self.headless and not dpg.is_dearpygui_running(): # 如果dearpygui未运行
             self.tpEnd = 1 # 设置模拟结束标志
-        if self.ego.id in traci.vehicle.getIDList(): # 如果自车在场景中
+        if self.vehSub.isAlive(self.ego.id): # 如果自车在场景中
             if not self.tpStart: # 如果模拟未开始
-                self.gui.start() # 启动dearpygui
-                self.drawRadarBG() # 绘制雷达背景   
-                self.drawMapBG() # 绘制地图背景
+                if self.headless:
+                    self.commitNetBoundary()
+                else:
+                    self.gui.start() # 启动dearpygui
+                    self.drawRadarBG() # 绘制雷达背景   
+                    self.drawMapBG() # 绘制地图背景
                 self.tpStart = 1 # 设置模拟开始标志
-            self.render() # 渲染仿真界面场景
+            if self.headless:
+                self.getSce() # 只更新场景，不渲染
+            else:
+                self.render() # 渲染仿真界面场景
 
     def destroy(self):
-        # stop the saveThread.
-        time.sleep(1.1)
+        # stop the writer thread after the remaining data is written.
+        self.dataWriter.stop()
         traci.close()
-        self.gui.destroy()
+        if self.gui:
+            self.gui.destroy()
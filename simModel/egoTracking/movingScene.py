@@ -1,21 +1,32 @@
+from __future__ import annotations
 import traci
+import traci.constants as tc
 from traci import TraCIException
 from math import sqrt, pow
 from queue import Queue
-import dearpygui.dearpygui as dpg
 import sqlite3
 
 
 from simModel.common.networkBuild import NetworkBuild, Rebuild
 from simModel.common.carFactory import Vehicle, egoCar, DummyVehicle
+from simModel.common.traciCommand import TraciCommandQueue
 from simModel.common.facilitiesFactory import RSU
 from utils.roadgraph import RoadGraph
 from utils.simBase import CoordTF
+from utils.lazy_dpg import dpg
 
 from read_stop_info import assign_stops_to_vehicles
 
 class MovingScene:
-    def __init__(self, netInfo: NetworkBuild, ego: egoCar,vehicles_with_stops=None) -> None:
+    '''
+        contextSub: if True, the surrounding vehicles are obtained from a SUMO
+                context subscription attached to the ego car (radius: 2 *
+                deArea) instead of polling every edge and junction lane in
+                the geohash neighbourhood.
+    '''
+    def __init__(self, netInfo: NetworkBuild, ego: egoCar,vehicles_with_stops=None,
+                 contextSub: bool = False,
+                 cmdQueue: TraciCommandQueue = None) -> None:
         self.netInfo = netInfo
         self.ego = ego
         self.edges: set = None
@@ -26,6 +37,9 @@ class MovingScene:
         self.vehINAoI: dict[str, Vehicle] = {}
         self.outOfAoI: dict[str, Vehicle] = {}
         self.vehicles_with_stops = vehicles_with_stops  # 7.27添加停车信息
+        self.contextSub = contextSub # 是否使用上下文订阅获取周边车辆
+        self.ctxSubscribed = False # ego车辆是否已挂载上下文订阅
+        self.cmdQueue = cmdQueue # 控制指令队列，为None时直接发送TraCI指令
 
     # if lane-lenght <= the self.ego's deArea, return current edge, current
     # edge's upstream intersection and current edge's downstream intersection.
@@ -102,6 +116,9 @@ class MovingScene:
     # getSurroundVeh will update all vehicle's attributes
     # so don't update again in other steps
     def updateSurroudVeh(self):
+        if self.contextSub:
+            self.updateSurroudVehByContext()
+            return
         nextStepVehicles = set() # 下一个时间步的车辆集合
         for ed in self.edges: # 遍历所有的边
             nextStepVehicles = nextStepVehicles | set(
@@ -126,13 +143,7 @@ class MovingScene:
         outOfRange = set() # 当前帧超出监控范围的车辆集合
         
         # 检测AOI内的RSU
-        rsuInAoI = {}  # 9.12 AOI内的RSU集合
-        for rsu_id, rsu in self.RSUs.items():
-            if rsu and self.ego.laneID:
-               if rsu.isInAoI(self.ego.laneID,self.ego.lanePos,self.ego.deArea):
-                rsuInAoI[rsu_id] = rsu
-            else:
-                continue
+        rsuInAoI = self.getRSUInAoI()  # 9.12 AOI内的RSU集合
         
         for vk, vv in self.currVehicles.items(): #vk: 车辆id, vv: 车辆实例
             if vk == self.ego.id:
@@ -164,9 +175,82 @@ class MovingScene:
                 else:
                     outOfAoI[vk] = vv
             else:
-                vv.exitControlMode()
+                vv.exitControlMode(self.cmdQueue)
+                outOfRange.add((vk, 0))
+
+        self.commitSurroundVeh(vehInAoI, outOfAoI, rsuInAoI, outOfRange)
+
+    # 基于ego车辆的上下文订阅更新周边车辆：
+    # 一次订阅结果即给出 2*deArea 范围内所有车辆的位置，不再逐条边、逐条路口车道查询
+    def updateSurroudVehByContext(self):
+        deArea = self.ego.deArea
+        if not self.ctxSubscribed:
+            traci.vehicle.subscribeContext(
+                self.ego.id, tc.CMD_GET_VEHICLE_VARIABLE,
+                2 * deArea, [tc.VAR_POSITION]
+            )
+            self.ctxSubscribed = True
+        ctxResults = traci.vehicle.getContextSubscriptionResults(self.ego.id)
+
+        try:
+            ex, ey = ctxResults[self.ego.id][tc.VAR_POSITION]
+        except KeyError:
+            ex, ey = traci.vehicle.getPosition(self.ego.id) # 获取ego主车的位置
+
+        for nv in ctxResults.keys() - self.currVehicles.keys():
+            self.addVeh(self.currVehicles, nv)
+
+        vehInAoI = {}
+        outOfAoI = {}
+        outOfRange = set()
+        rsuInAoI = self.getRSUInAoI()
+        sqDeArea = deArea * deArea
+        aliveVehicles = None # 路网中的车辆，只在有车辆离开订阅范围时查询一次
+
+        for vk, vv in self.currVehicles.items():
+            if vk == self.ego.id:
+                continue
+            try:
+                x, y = ctxResults[vk][tc.VAR_POSITION]
+            except KeyError:
+                # 不在订阅范围内：已离开路网或超出 2*deArea
+                if aliveVehicles is None:
+                    aliveVehicles = set(traci.vehicle.getIDList())
+                if vk in aliveVehicles:
+                    # 仍在路网中，交还给SUMO控制
+                    vv.exitControlMode(self.cmdQueue)
+                elif self.cmdQueue:
+                    # 已离开路网，不能再向其发送指令
+                    self.cmdQueue.forget(vk)
                 outOfRange.add((vk, 0))
+                continue
+            sqDis = (ex - x) * (ex - x) + (ey - y) * (ey - y)
+            try:
+                vehArrive = vv.arriveDestination(self.netInfo)
+            except:
+                vehArrive = False
+            if vehArrive:
+                outOfRange.add((vk, 1))
+            elif sqDis <= sqDeArea:
+                vehInAoI[vk] = vv
+            else:
+                outOfAoI[vk] = vv
+
+        self.commitSurroundVeh(vehInAoI, outOfAoI, rsuInAoI, outOfRange)
+
+    # 检测AOI内的RSU
+    def getRSUInAoI(self) -> dict[str, RSU]:
+        rsuInAoI = {}
+        for rsu_id, rsu in self.RSUs.items():
+            if rsu and self.ego.laneID:
+               if rsu.isInAoI(self.ego.laneID,self.ego.lanePos,self.ego.deArea):
+                rsuInAoI[rsu_id] = rsu
+            else:
+                continue
+        return rsuInAoI
 
+    def commitSurroundVeh(self, vehInAoI: dict, outOfAoI: dict,
+                          rsuInAoI: dict, outOfRange: set):
         for vid, atag in outOfRange:
             del(self.currVehicles[vid])
             # if the vehicle arrived the destination, remove it from the simulation
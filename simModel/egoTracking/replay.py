@@ -12,7 +12,7 @@ from simModel.common.networkBuild import Rebuild
 from simModel.common.carFactory import Vehicle, egoCar
 from simModel.common.gui import GUI
 from simModel.egoTracking.movingScene import SceneReplay
-from utils.trajectory import Trajectory, State
+from utils.trajectory import Trajectory, ArrayTrajectory
 from utils.simBase import MapCoordTF
 from evaluation.evaluation import RealTimeEvaluation
 
@@ -156,7 +156,7 @@ class ReplayModel:
 
         self.gui.drawMainWindowWhiteBG((x1, y1), (x2, y2))
 
-    def dbTrajectory(self, vehid: str, currFrame: int) -> Trajectory:
+    def dbTrajectory(self, vehid: str, currFrame: int) -> ArrayTrajectory:
         conn = sqlite3.connect(self.dataBase)
         cur = conn.cursor()
         cur.execute(
@@ -174,20 +174,11 @@ class ReplayModel:
                 if frameData[i + 1][0] - frameData[i][0] == 1:
                     validSeq.append(frameData[i + 1])
 
-            tState = []
-            for vs in validSeq:
-                state = State(
-                    x=vs[1],
-                    y=vs[2],
-                    yaw=vs[3],
-                    vel=vs[4],
-                    acc=vs[5],
-                    laneID=vs[6],
-                    s=vs[7],
-                    routeIdx=vs[8],
-                )
-                tState.append(state)
-            dbTrajectory = Trajectory(states=tState)
+            # 按列直接构造轨迹，不逐帧创建State对象
+            _, x, y, yaw, vel, acc, laneID, lanePos, routeIdx = zip(*validSeq)
+            dbTrajectory = ArrayTrajectory.from_columns(
+                x=x, y=y, yaw=yaw, vel=vel, acc=acc, s=lanePos,
+                laneID=laneID, routeIdx=routeIdx)
         else:
             self.sr.outOfRange.add(vehid)
             return
@@ -241,7 +232,7 @@ class ReplayModel:
 
     def updateVeh(self, veh: Vehicle | egoCar):
         self.setDBTrajectory(veh)
-        if veh.dbTrajectory and veh.dbTrajectory.xQueue:
+        if veh.dbTrajectory:
             (x, y, yaw, speed, accel, laneID, lanePos,
              routeIdx) = veh.dbTrajectory.pop_last_state_r()
             veh.xQ.append(x)
@@ -281,11 +272,11 @@ class ReplayModel:
             dpg.set_value('a_series_tag', [ax, ay])
 
         if self.ego.dbTrajectory:
-            if self.ego.dbTrajectory.velQueue:
+            if len(self.ego.dbTrajectory.velQueue):
                 vfy = list(self.ego.dbTrajectory.velQueue)
                 vfx = list(range(1, len(vfy) + 1))
                 dpg.set_value('v_series_tag_future', [vfx, vfy])
-            if self.ego.dbTrajectory.accQueue:
+            if len(self.ego.dbTrajectory.accQueue):
                 afy = list(self.ego.dbTrajectory.accQueue)
                 afx = list(range(1, len(afy) + 1))
                 dpg.set_value('a_series_tag_future', [afx, afy])
@@ -291,7 +291,7 @@ class InterReplayModel:
     def isInvolved(self, veh: Vehicle, currVehs: dict[str, Vehicle]) -> bool:
         # if the vehicle's dbTrajectory is too short, ATSISP will take over it 
         # until the vehicle drive out of the AoI, avoiding the vhicles's suddenly fading.
-        if len(veh.dbTrajectory.states) <= 10:
+        if len(veh.dbTrajectory) <= 10:
             return True
         else:
             for cv in currVehs.values():
@@ -391,10 +391,11 @@ class InterReplayModel:
             # when veh2 doesn't have planned trajectory, it will drive according
             # to the database, so veh1 and veh2 won't collide.
             return False
-        duration = min(len(tjA.states), len(tjB.states))
+        statesA, statesB = tjA.states, tjB.states
+        duration = min(len(statesA), len(statesB))
         for i in range(0, duration, 3):
-            stateA = tjA.states[i]
-            stateB = tjB.states[i]
+            stateA = statesA[i]
+            stateB = statesB[i]
             recA = Rectangle([stateA.x, stateB.x],
                              veh1.length, veh1.width, stateA.yaw)
             recB = Rectangle([stateB.x, stateB.y],
@@ -390,7 +390,7 @@ class Model:
     def vehMoveStep(self, veh: Vehicle):
         # control vehicles after update its data
         # control happens next timestep
-        if veh.plannedTrajectory and veh.plannedTrajectory.xQueue:
+        if veh.plannedTrajectory:
             centerx, centery, yaw, speed, accel = veh.plannedTrajectory.pop_last_state()
             try:
                 veh.controlSelf(centerx,  centery, yaw, speed, accel)
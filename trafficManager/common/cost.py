@@ -4,6 +4,7 @@ These costs include smoothness, velocity difference, time, obstacle, guidance, a
 stop, and lane change costs. The module also provides a main function to run the calculations.
 """
 import logging
+import math
 from typing import Union
 import numpy as np
 import obstacle_cost
@@ -90,6 +91,13 @@ def obs(vehicle: control_Vehicle, trajectory: Trajectory,
         float: The obstacle cost.
     """
     cost_obs = 0
+    # 先对全部障碍物做一次批量碰撞检测，碰撞时与逐个计算的结果相同，均为 inf
+    states = trajectory.states[::2]
+    if obs_list and states and obstacle_cost.collision_many(
+            vehicle, [[state.x for state in states]], [[state.y for state in states]],
+            [[state.yaw for state in states]], [[state.vel for state in states]],
+            obs_list, config, offset_frame)[0]:
+        return math.inf
     for obstacle in obs_list:
         if obstacle.type == ObsType.OTHER:
             cost_obs += obstacle_cost.calculate_static(
@@ -173,6 +181,77 @@ def jerk(trajectory: Trajectory, weight_config: dict) -> float:
     return weight_config["W_JERK"] * cost_jerk
 
 
+def smoothness_many(s: np.ndarray, yaw: np.ndarray, cur: np.ndarray,
+                    lane_idx: np.ndarray, mask: np.ndarray,
+                    ref_line: Spline2D, weight_config: dict) -> np.ndarray:
+    """
+    Array version of smoothness for paths stacked as (n_paths, n_points).
+
+    Args:
+        s, yaw, cur (np.ndarray): The states of the paths.
+        lane_idx (np.ndarray): The lane index of every state.
+        mask (np.ndarray): True for the states that belong to the path.
+        ref_line (Spline2D): The reference line for the paths.
+        weight_config (dict): The weight configuration for the cost calculation.
+
+    Returns:
+        np.ndarray: The smoothness cost of every path.
+    """
+    # 与逐点版本一致：到达参考线终点或离开第一个状态所在车道后不再累加
+    inside = mask & (s < ref_line.s[-1]) & (lane_idx == lane_idx[:, :1])
+    inside = np.logical_and.accumulate(inside, axis=1)
+    ref_yaw = ref_line.calc_yaw_many(np.where(inside, s, ref_line.s[0]))
+    cost_yaw_diff = np.sum(np.where(inside, yaw - ref_yaw, 0.0)**2, axis=1)
+    cost_cur = np.sum(np.where(inside, cur, 0.0)**2, axis=1)
+    return weight_config["W_YAW"] * cost_yaw_diff + weight_config["W_CUR"] * cost_cur
+
+
+def vel_diff_many(vel: np.ndarray, ref_vel_list: Union[float, np.ndarray],
+                  mask: np.ndarray, weight_config: dict) -> np.ndarray:
+    """
+    Array version of vel_diff for paths stacked as (n_paths, n_points).
+
+    Returns:
+        np.ndarray: The velocity difference cost of every path.
+    """
+    cost_vel_diff = np.sum(np.where(mask, vel - ref_vel_list, 0.0)**2, axis=1)
+    return weight_config["W_VEL_DIFF"] * cost_vel_diff
+
+
+def guidance_many(d: np.ndarray, mask: np.ndarray, weight_config: dict) -> np.ndarray:
+    """
+    Array version of guidance for paths stacked as (n_paths, n_points).
+
+    Returns:
+        np.ndarray: The guidance cost of every path.
+    """
+    cost_guidance = np.sum(np.where(mask, d, 0.0)**2, axis=1)
+    return weight_config["W_GUIDE"] * cost_guidance
+
+
+def acc_many(acc: np.ndarray, mask: np.ndarray, weight_config: dict) -> np.ndarray:
+    """
+    Array version of acc for paths stacked as (n_paths, n_points).
+
+    Returns:
+        np.ndarray: The acceleration cost of every path.
+    """
+    cost_acc = np.sum(np.where(mask, acc, 0.0)**2, axis=1)
+    return weight_config["W_ACC"] * cost_acc
+
+
+def jerk_many(s_ddd: np.ndarray, d_ddd: np.ndarray, mask: np.ndarray,
+              weight_config: dict) -> np.ndarray:
+    """
+    Array version of jerk for paths stacked as (n_paths, n_points).
+
+    Returns:
+        np.ndarray: The jerk cost of every path.
+    """
+    cost_jerk = np.sum(np.where(mask, s_ddd**2 + d_ddd**2, 0.0), axis=1)
+    return weight_config["W_JERK"] * cost_jerk
+
+
 def stop(weight_config):
     return weight_config["W_STOP"]
 
@@ -12,9 +12,13 @@ import math
 import numpy as np
 from typing import Tuple, Optional
 from trafficManager.common.vehicle import control_Vehicle
+from trafficManager.common.collision import box_collision_many, earliest_collision
 
+from utils.obstacles import ObsType
 from utils.trajectory import Trajectory
 
+PEDESTRIAN_REACTION_TIME = 2.0  # important param for avoid pedestrian
+
 
 def rotate_yaw(yaw: float) -> np.ndarray:
     """
@@ -123,42 +127,43 @@ def calculate_static(vehicle: control_Vehicle, obs: dict,
     dist_thershold = math.hypot(
         car_length + obs["length"], car_width + obs["width"])
 
+    states = trajectory.states[::2]
+    if not states:
+        return cost
+    x = np.array([state.x for state in states])
+    y = np.array([state.y for state in states])
+    yaw = np.array([state.yaw for state in states])
+    # todo: can change to AABB filt
+    dist = np.hypot(x - obs["pos"]["x"], y - obs["pos"]["y"])
+    near = ~(dist > dist_thershold)
+    if not near.any():
+        return cost
     # rotate and translate the obstacle
-    for i in range(0, len(trajectory.states), 2):
-        state = trajectory.states[i]
-        # todo: can change to AABB filt
-        dist = math.hypot(state.x - obs["pos"]
-                          ["x"], state.y - obs["pos"]["y"],)
-        if dist > dist_thershold:
-            continue
-        result, nearest_corner = check_collsion_new(
-            np.array([state.x, state.y]),
-            car_length,
-            car_width,
-            state.yaw,
-            np.array([obs["pos"]["x"], obs["pos"]["y"]]),
-            obs["length"],
-            obs["width"],
-            obs["pos"]["yaw"],
-        )
-        if result:
-            cost += math.inf
-            return cost
-        elif abs(nearest_corner[0]) > car_length or abs(nearest_corner[1]) > car_width:
-            continue
-        else:
-            if abs(nearest_corner[0]) > car_length / 2:
-                cost += (
-                    1 - (abs(nearest_corner[0]) -
-                         car_length / 2) / (car_length / 2)
-                ) * config["weights"]["W_COLLISION"]
-            if abs(nearest_corner[1]) > car_width / 2:
-                cost += (
-                    1 - (abs(nearest_corner[1]) -
-                         car_width / 2) / (car_width / 2)
-                ) * config["weights"]["W_COLLISION"]
-
-    return cost
+    result, nearest_corner = box_collision_many(
+        np.stack([x[near], y[near]], axis=-1),
+        car_length,
+        car_width,
+        yaw[near],
+        np.array([obs["pos"]["x"], obs["pos"]["y"]]),
+        obs["length"],
+        obs["width"],
+        obs["pos"]["yaw"],
+    )
+    if result.any():
+        return math.inf
+    corner_x = np.abs(nearest_corner[:, 0])
+    corner_y = np.abs(nearest_corner[:, 1])
+    inside = (corner_x <= car_length) & (corner_y <= car_width)
+    cost += np.sum(np.where(
+        inside & (corner_x > car_length / 2),
+        (1 - (corner_x - car_length / 2) / (car_length / 2))
+        * config["weights"]["W_COLLISION"], 0.0))
+    cost += np.sum(np.where(
+        inside & (corner_y > car_width / 2),
+        (1 - (corner_y - car_width / 2) / (car_width / 2))
+        * config["weights"]["W_COLLISION"], 0.0))
+
+    return float(cost)
 
 
 def calculate_pedestrian(vehicle: control_Vehicle,
@@ -178,7 +183,7 @@ def calculate_pedestrian(vehicle: control_Vehicle,
     Returns:
         float: The pedestrian cost value.
     """
-    reaction_time = 2.0  # important param for avoid pedestrian
+    reaction_time = PEDESTRIAN_REACTION_TIME
     cost = 0
 
     car_width = vehicle.width
@@ -188,53 +193,52 @@ def calculate_pedestrian(vehicle: control_Vehicle,
         reaction_time * trajectory.states[0].vel
         + 1 * car_length  # Reaction dist + Hard Collision
     )
-    for i in range(0, min(len(trajectory.states), int(reaction_time / config["DT"])), 2):
-        dist = math.hypot(
-            trajectory.states[i].x -
-            obs["pos"]["x"], trajectory.states[i].y - obs["pos"]["y"],
-        )
-        if dist > dist_to_collide:
-            continue
-
-        result, nearest_corner = check_collsion_new(
-            np.array([trajectory.states[i].x, trajectory.states[i].y]),
-            car_length,
-            car_width,
-            trajectory.states[i].yaw,
-            np.array([obs["pos"]["x"], obs["pos"]["y"]]),
-            obs["length"],
-            obs["width"] + car_width * 1.0,
-            0,
-        )
-        if result:
-            cost += math.inf
-            return cost
-        elif (
-            nearest_corner[0] > dist_to_collide
-            or nearest_corner[0] < -car_length
-            or abs(nearest_corner[1]) > 1.0 * car_width
-        ):
-            continue
-        else:
-            if nearest_corner[0] < -0.5 * car_length:
-                cost += (
-                    1 - (nearest_corner[0] + car_length *
-                         0.5) / (-car_length * 0.5)
-                ) * config["weights"]["W_COLLISION"]
-            if nearest_corner[0] > 0.5 * car_length:
-                cost += (
-                    1
-                    - (nearest_corner[0] - car_length * 0.5)
-                    / (dist_to_collide - car_length * 0.5)
-                ) * config["weights"]["W_COLLISION"]
-                # cost += config["weights"]["W_COLLISION"] * 10
-            if abs(nearest_corner[1]) > car_width / 2:
-                cost += (
-                    1 - (abs(nearest_corner[1]) -
-                         car_width / 2) / (0.5 * car_width)
-                ) * config["weights"]["W_COLLISION"]
-
-    return cost
+    states = trajectory.states[:int(reaction_time / config["DT"])][::2]
+    if not states:
+        return cost
+    x = np.array([state.x for state in states])
+    y = np.array([state.y for state in states])
+    yaw = np.array([state.yaw for state in states])
+    dist = np.hypot(x - obs["pos"]["x"], y - obs["pos"]["y"])
+    near = ~(dist > dist_to_collide)
+    if not near.any():
+        return cost
+
+    result, nearest_corner = box_collision_many(
+        np.stack([x[near], y[near]], axis=-1),
+        car_length,
+        car_width,
+        yaw[near],
+        np.array([obs["pos"]["x"], obs["pos"]["y"]]),
+        obs["length"],
+        obs["width"] + car_width * 1.0,
+        0,
+    )
+    if result.any():
+        return math.inf
+    corner_x = nearest_corner[:, 0]
+    corner_y = np.abs(nearest_corner[:, 1])
+    inside = ~(
+        (corner_x > dist_to_collide)
+        | (corner_x < -car_length)
+        | (corner_y > 1.0 * car_width)
+    )
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cost += np.sum(np.where(
+            inside & (corner_x < -0.5 * car_length),
+            (1 - (corner_x + car_length * 0.5) / (-car_length * 0.5))
+            * config["weights"]["W_COLLISION"], 0.0))
+        cost += np.sum(np.where(
+            inside & (corner_x > 0.5 * car_length),
+            (1 - (corner_x - car_length * 0.5) / (dist_to_collide - car_length * 0.5))
+            * config["weights"]["W_COLLISION"], 0.0))
+        # cost += config["weights"]["W_COLLISION"] * 10
+    cost += np.sum(np.where(
+        inside & (corner_y > car_width / 2),
+        (1 - (corner_y - car_width / 2) / (0.5 * car_width))
+        * config["weights"]["W_COLLISION"], 0.0))
+
+    return float(cost)
 
 
 def calculate_car(vehicle: control_Vehicle, obs: dict, 
@@ -258,56 +262,144 @@ def calculate_car(vehicle: control_Vehicle, obs: dict,
     if vehicle.lane_id == obs.lane_id and vehicle.current_state.s > obs.current_state.s: # obs car is behind ego car on the same lane
             return cost
     # ATTENSION: for speed up, we only check every 2 points
-    for i in range(0, min(len(trajectory.states), len(obs.future_trajectory.states) - offset_frame), 2):
-        ego_state = trajectory.states[i]
-        obs_state = obs.future_trajectory.states[i + offset_frame]
-        dist = math.hypot(
-            ego_state.x - obs_state.x,
-            ego_state.y - obs_state.y,
-        )
-        dist_to_collide = (
-            3 * (max(0, ego_state.vel - obs_state.vel))  # TTC
-            + 0.5* ego_state.vel  # Reaction dist
-            + 1 * car_length  # Hard Collision
-        )
-        if dist > dist_to_collide:
-            # if obs far away at beginning, we don't care
-            return cost
-        result, nearest_corner = check_collsion_new(
-            np.array([ego_state.x, ego_state.y]),
-            car_length*1.5,
-            car_width*1.1,
-            ego_state.yaw,
-            np.array([obs_state.x, obs_state.y]),
-            obs.shape.length,
-            obs.shape.width,
-            obs_state.yaw,
-        )
-        if result:
-            cost += math.inf
-            return cost
-        elif (
-            nearest_corner[0] > dist_to_collide
-            or nearest_corner[0] < -1.5 * car_length
-            or abs(nearest_corner[1]) > 0.9 * car_width
-        ):
-            continue
-        else:
-            if abs(nearest_corner[1]) > 0.5 * car_width:
-                cost += (
-                    1 - (abs(nearest_corner[1]) -
-                         car_width * 0.5) / (car_width * 0.2)
-                ) * config["weights"]["W_COLLISION"]
-            if nearest_corner[0] > 0.5 * car_length:
-                cost += (
-                    1
-                    - (nearest_corner[0] - car_length * 0.5)
-                    / (dist_to_collide - car_length * 0.5)
-                ) * config["weights"]["W_COLLISION"] * 10
-            if nearest_corner[0] < -0.5 * car_length:
-                cost += (
-                    1 - (nearest_corner[0] + car_length *
-                         0.5) / (-car_length * 1.0)
-                ) * config["weights"]["W_COLLISION"]
-
-    return cost
+    num = min(len(trajectory.states), len(obs.future_trajectory.states) - offset_frame)
+    ego_states = trajectory.states[:max(num, 0):2]
+    if not ego_states:
+        return cost
+    obs_states = obs.future_trajectory.states[offset_frame:offset_frame + num:2]
+    ego_x = np.array([state.x for state in ego_states])
+    ego_y = np.array([state.y for state in ego_states])
+    ego_yaw = np.array([state.yaw for state in ego_states])
+    ego_vel = np.array([state.vel for state in ego_states])
+    obs_x = np.array([state.x for state in obs_states])
+    obs_y = np.array([state.y for state in obs_states])
+    obs_yaw = np.array([state.yaw for state in obs_states])
+    obs_vel = np.array([state.vel for state in obs_states])
+    dist = np.hypot(ego_x - obs_x, ego_y - obs_y)
+    dist_to_collide = (
+        3 * np.maximum(0, ego_vel - obs_vel)  # TTC
+        + 0.5 * ego_vel  # Reaction dist
+        + 1 * car_length  # Hard Collision
+    )
+    # if obs far away at beginning, we don't care: 只检查第一个远离点之前的状态
+    far = np.flatnonzero(dist > dist_to_collide)
+    end = far[0] if far.size else len(ego_states)
+    if end == 0:
+        return cost
+    result, nearest_corner = box_collision_many(
+        np.stack([ego_x[:end], ego_y[:end]], axis=-1),
+        car_length*1.5,
+        car_width*1.1,
+        ego_yaw[:end],
+        np.stack([obs_x[:end], obs_y[:end]], axis=-1),
+        obs.shape.length,
+        obs.shape.width,
+        obs_yaw[:end],
+    )
+    if result.any():
+        return math.inf
+    dist_to_collide = dist_to_collide[:end]
+    corner_x = nearest_corner[:, 0]
+    corner_y = np.abs(nearest_corner[:, 1])
+    inside = ~(
+        (corner_x > dist_to_collide)
+        | (corner_x < -1.5 * car_length)
+        | (corner_y > 0.9 * car_width)
+    )
+    cost += np.sum(np.where(
+        inside & (corner_y > 0.5 * car_width),
+        (1 - (corner_y - car_width * 0.5) / (car_width * 0.2))
+        * config["weights"]["W_COLLISION"], 0.0))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cost += np.sum(np.where(
+            inside & (corner_x > 0.5 * car_length),
+            (1 - (corner_x - car_length * 0.5) / (dist_to_collide - car_length * 0.5))
+            * config["weights"]["W_COLLISION"] * 10, 0.0))
+    cost += np.sum(np.where(
+        inside & (corner_x < -0.5 * car_length),
+        (1 - (corner_x + car_length * 0.5) / (-car_length * 1.0))
+        * config["weights"]["W_COLLISION"], 0.0))
+
+    return float(cost)
+
+
+def collision_many(vehicle: control_Vehicle, ego_x: np.ndarray, ego_y: np.ndarray,
+                   ego_yaw: np.ndarray, ego_vel: np.ndarray, obs_list: list,
+                   config: dict, offset_frame: int = 0) -> np.ndarray:
+    """
+    Check which candidate trajectories collide with any obstacle.
+    A candidate collides exactly when calculate_static, calculate_pedestrian or
+    calculate_car returns inf for it, but all obstacles are checked in one
+    earliest_collision call.
+
+    Args:
+        vehicle (Vehicle): The ego vehicle object.
+        ego_x, ego_y, ego_yaw, ego_vel (np.ndarray): Every second state of the candidate
+            trajectories, shape (n_candidates, n_steps), nan after the end of a candidate.
+        obs_list (list): A list of Obstacle objects.
+        config (dict): The configuration dictionary.
+        offset_frame (int>0): The offset frame for start frame of vehicle trajectory.
+
+    Returns:
+        np.ndarray: A bool array indicating the colliding candidates.
+    """
+    ego_x, ego_y, ego_yaw, ego_vel = (np.atleast_2d(np.asarray(v, dtype=float))
+                                      for v in (ego_x, ego_y, ego_yaw, ego_vel))
+    n_candidates, n_steps = ego_x.shape
+    car_length = vehicle.length
+    car_width = vehicle.width
+    step = np.arange(n_steps)
+    exists = ~np.isnan(ego_x)
+    # 每个障碍物一行：位置、朝向、尺寸、自车包围盒尺寸，以及 calculate_* 会检测的 (候选, t)
+    rows = []
+    with np.errstate(invalid="ignore"):
+        for obs in obs_list:
+            if obs.type == ObsType.OTHER:
+                dist_thershold = math.hypot(
+                    car_length + obs["length"], car_width + obs["width"])
+                dist = np.hypot(ego_x - obs["pos"]["x"], ego_y - obs["pos"]["y"])
+                rows.append((np.full(n_steps, obs["pos"]["x"]), np.full(n_steps, obs["pos"]["y"]),
+                             np.full(n_steps, obs["pos"]["yaw"]), obs["length"], obs["width"],
+                             car_length, car_width, exists & ~(dist > dist_thershold)))
+            elif obs.type == ObsType.CAR:
+                if vehicle.lane_id == obs.lane_id and vehicle.current_state.s > obs.current_state.s:
+                    continue
+                obs_states = obs.future_trajectory.states[offset_frame::2][:n_steps]
+                if not obs_states:
+                    continue
+                obs_x, obs_y, obs_yaw, obs_vel = (np.full(n_steps, np.nan) for _ in range(4))
+                obs_x[:len(obs_states)] = [state.x for state in obs_states]
+                obs_y[:len(obs_states)] = [state.y for state in obs_states]
+                obs_yaw[:len(obs_states)] = [state.yaw for state in obs_states]
+                obs_vel[:len(obs_states)] = [state.vel for state in obs_states]
+                dist = np.hypot(ego_x - obs_x, ego_y - obs_y)
+                dist_to_collide = (
+                    3 * np.maximum(0, ego_vel - obs_vel)  # TTC
+                    + 0.5 * ego_vel  # Reaction dist
+                    + 1 * car_length  # Hard Collision
+                )
+                # 与 calculate_car 一样只检测第一个远离点之前的状态
+                far = dist > dist_to_collide
+                end = np.where(far.any(axis=1), far.argmax(axis=1), n_steps)
+                rows.append((obs_x, obs_y, obs_yaw, obs.shape.length, obs.shape.width,
+                             car_length*1.5, car_width*1.1,
+                             exists & (step < len(obs_states)) & (step < end[:, None])))
+            elif obs.type == ObsType.PEDESTRIAN:
+                dist_to_collide = (
+                    PEDESTRIAN_REACTION_TIME * ego_vel[:, :1]
+                    + 1 * car_length  # Reaction dist + Hard Collision
+                )
+                horizon = 2 * step < int(PEDESTRIAN_REACTION_TIME / config["DT"])
+                dist = np.hypot(ego_x - obs["pos"]["x"], ego_y - obs["pos"]["y"])
+                rows.append((np.full(n_steps, obs["pos"]["x"]), np.full(n_steps, obs["pos"]["y"]),
+                             np.zeros(n_steps), obs["length"], obs["width"] + car_width * 1.0,
+                             car_length, car_width,
+                             exists & horizon & ~(dist > dist_to_collide)))
+    if not rows:
+        return np.zeros(n_candidates, dtype=bool)
+    obs_x, obs_y, obs_yaw, obs_length, obs_width, ego_length, ego_width, valid = zip(*rows)
+    earliest = earliest_collision(
+        ego_x, ego_y, ego_yaw, np.array(ego_length), np.array(ego_width),
+        np.stack(obs_x), np.stack(obs_y), np.stack(obs_yaw),
+        np.array(obs_length), np.array(obs_width), np.stack(valid, axis=1))
+    return earliest >= 0
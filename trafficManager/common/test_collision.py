@@ -0,0 +1,154 @@
+"""
+测试批量碰撞检测与逐个障碍物计算的结果一致
+功能：
+1. earliest_collision 给出的最早碰撞时刻与逐时刻、逐障碍物的 check_collsion_new 一致
+2. collision_many 判定的碰撞候选路径与 calculate_static/calculate_pedestrian/calculate_car 返回 inf 的一致
+3. cost.obs 的结果与逐个障碍物累加 calculate_* 的结果一致
+用法: python -m pytest trafficManager/common/test_collision.py 或 python trafficManager/common/test_collision.py
+"""
+import math
+import os
+import sys
+import types
+
+import numpy as np
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+sys.path.insert(0, PROJECT_ROOT)
+
+import trafficManager.common  # 将 common 目录加入 sys.path
+from trafficManager.common import cost, obstacle_cost
+from trafficManager.common.collision import earliest_collision
+from utils.obstacles import ObsType
+from utils.trajectory import State, Trajectory
+
+CONFIG = {"DT": 0.1, "weights": {"W_COLLISION": 4.0}}
+
+
+class PointObstacle(dict):
+    """calculate_static/calculate_pedestrian 按字典读取的障碍物"""
+
+    def __init__(self, obstacle_type, **kwargs):
+        super().__init__(**kwargs)
+        self.type = obstacle_type
+
+
+def make_vehicle():
+    return types.SimpleNamespace(length=5.0, width=2.0, lane_id="ego_lane",
+                                 current_state=State(s=0.0))
+
+
+def make_trajectory(rng, n_states, x0=0.0, y0=0.0, min_vel=3.0):
+    vx, vy = rng.uniform(min_vel, 12), rng.uniform(-1, 1)
+    return Trajectory([State(t=i * CONFIG["DT"], x=x0 + vx * i * CONFIG["DT"],
+                             y=y0 + vy * i * CONFIG["DT"],
+                             yaw=math.atan2(vy, vx) + rng.uniform(-0.1, 0.1),
+                             vel=math.hypot(vx, vy)) for i in range(n_states)])
+
+
+def make_obstacles(rng):
+    obs_list = []
+    for _ in range(rng.integers(1, 5)):
+        obs_list.append(types.SimpleNamespace(
+            type=ObsType.CAR, lane_id=rng.choice(["ego_lane", "other_lane"]),
+            current_state=State(s=rng.uniform(-5, 5)),
+            shape=types.SimpleNamespace(length=4.5, width=1.9),
+            # 包括对向驶来、先远离后碰撞的车辆
+            future_trajectory=make_trajectory(rng, int(rng.integers(10, 60)),
+                                              rng.uniform(-5, 60), rng.uniform(-4, 4),
+                                              min_vel=-12.0)))
+    for obstacle_type in (ObsType.OTHER, ObsType.PEDESTRIAN):
+        for _ in range(rng.integers(0, 3)):
+            obs_list.append(PointObstacle(
+                obstacle_type, length=rng.uniform(0.5, 5), width=rng.uniform(0.5, 3),
+                pos={"x": rng.uniform(0, 40), "y": rng.uniform(-4, 4),
+                     "yaw": rng.uniform(-3, 3)}))
+    return obs_list
+
+
+def per_obstacle_costs(vehicle, trajectory, obs_list, offset_frame):
+    costs = []
+    for obstacle in obs_list:
+        if obstacle.type == ObsType.OTHER:
+            costs.append(obstacle_cost.calculate_static(vehicle, obstacle, trajectory, CONFIG))
+        elif obstacle.type == ObsType.CAR:
+            costs.append(obstacle_cost.calculate_car(vehicle, obstacle, trajectory,
+                                                     CONFIG, offset_frame))
+        elif obstacle.type == ObsType.PEDESTRIAN:
+            costs.append(obstacle_cost.calculate_pedestrian(vehicle, obstacle,
+                                                            trajectory, CONFIG))
+    return costs
+
+
+def test_earliest_collision_matches_pairwise_check():
+    rng = np.random.default_rng(0)
+    n_candidates, n_steps, n_obstacles = 30, 25, 6
+    ego_x = np.cumsum(rng.random((n_candidates, n_steps)), axis=1) + rng.random((n_candidates, 1)) * 40
+    ego_y = rng.normal(0, 1, (n_candidates, n_steps))
+    ego_yaw = rng.normal(0, 0.2, (n_candidates, n_steps))
+    obs_x = rng.random((n_obstacles, n_steps)) * 60
+    obs_y = rng.normal(0, 3, (n_obstacles, n_steps))
+    obs_yaw = rng.normal(0, 1, (n_obstacles, n_steps))
+    obs_length = rng.random(n_obstacles) * 4 + 1
+    obs_width = rng.random(n_obstacles) * 2 + 1
+    obs_x[0, 10:] = np.nan  # 障碍物中途消失
+
+    earliest = earliest_collision(ego_x, ego_y, ego_yaw, 5.0, 2.0, obs_x, obs_y, obs_yaw,
+                                  obs_length, obs_width)
+    expected = np.full(n_candidates, -1)
+    for c in range(n_candidates):
+        for t in range(n_steps):
+            if any(not np.isnan(obs_x[o, t]) and obstacle_cost.check_collsion_new(
+                    np.array([ego_x[c, t], ego_y[c, t]]), 5.0, 2.0, ego_yaw[c, t],
+                    np.array([obs_x[o, t], obs_y[o, t]]), obs_length[o], obs_width[o],
+                    obs_yaw[o, t])[0] for o in range(n_obstacles)):
+                expected[c] = t
+                break
+    assert (expected >= 0).any()
+    assert np.array_equal(earliest, expected)
+
+
+def test_collision_many_matches_calculate_functions():
+    rng = np.random.default_rng(1)
+    vehicle = make_vehicle()
+    hits = 0
+    for _ in range(100):
+        obs_list = make_obstacles(rng)
+        offset_frame = int(rng.integers(0, 5))
+        # 不同长度的候选路径，较短的用 nan 补齐
+        trajectories = [make_trajectory(rng, int(rng.integers(5, 50))) for _ in range(8)]
+        n_steps = max(len(trajectory.states[::2]) for trajectory in trajectories)
+        arrays = np.full((4, len(trajectories), n_steps), np.nan)
+        for i, trajectory in enumerate(trajectories):
+            states = trajectory.states[::2]
+            arrays[:, i, :len(states)] = [[state.x for state in states],
+                                          [state.y for state in states],
+                                          [state.yaw for state in states],
+                                          [state.vel for state in states]]
+        collide = obstacle_cost.collision_many(vehicle, *arrays, obs_list, CONFIG, offset_frame)
+        expected = [math.inf in per_obstacle_costs(vehicle, trajectory, obs_list, offset_frame)
+                    for trajectory in trajectories]
+        assert collide.tolist() == expected
+        hits += sum(expected)
+    assert hits
+
+
+def test_obs_cost_unchanged():
+    rng = np.random.default_rng(2)
+    vehicle = make_vehicle()
+    results = set()
+    for _ in range(300):
+        obs_list = make_obstacles(rng)
+        offset_frame = int(rng.integers(0, 5))
+        trajectory = make_trajectory(rng, int(rng.integers(1, 50)))
+        expected = sum(per_obstacle_costs(vehicle, trajectory, obs_list, offset_frame))
+        assert cost.obs(vehicle, trajectory, obs_list, CONFIG, offset_frame) == expected
+        results.add("inf" if expected == math.inf else "zero" if expected == 0 else "finite")
+    assert results == {"inf", "zero", "finite"}
+
+
+if __name__ == "__main__":
+    test_earliest_collision_matches_pairwise_check()
+    test_collision_many_matches_calculate_functions()
+    test_obs_cost_unchanged()
+    print("ok")
@@ -178,6 +178,21 @@ class control_Vehicle():
                      vel=self.current_state.vel,
                      acc=self.current_state.acc)
     
+    # 快速复制车辆
+    def clone(self) -> 'control_Vehicle':
+        """
+        Structural copy of the vehicle, replacing the pickle round trip of utils.data_copy.deepcopy.
+        中文翻译：
+        快速复制车辆。current_state 与 trajectory 会被原地修改，因此各复制一份；
+        车道、停车信息等属性只会被整体替换，与通信器一起在副本间共享。
+        """
+        vehicle = copy(self)
+        vehicle._current_state = self._current_state.clone()
+        trajectory = getattr(self, 'trajectory', None)
+        if trajectory is not None:
+            vehicle.trajectory = trajectory.clone()
+        return vehicle
+
     # 车道变换
     def change_to_lane(self, lane: AbstractLane) -> None:
         """
@@ -8,7 +8,7 @@ Copyright (c) 2023 by PJLab, All Rights Reserved.
 from __future__ import annotations
 
 import os
-import subprocess
+import json
 import re
 import sys
 import tkinter as tk
@@ -29,7 +29,10 @@ from predictor.abstract_predictor import Prediction
 from utils.roadgraph import RoadGraph
 from utils.trajectory import State
 from add.display import NonBlockingInferenceWindow
-from TSRL_representation.TSRL import TSRL
+from TSRL_representation.Interpreter import AskResult
+from TSRL_representation.Inference_engine import OverlayKB
+from TSRL_representation.Rule_base import CompiledRule, RuleBase, message_predicates
+from TSRL_interaction.message_journal import MessageJournal
 
 
 import logger
@@ -101,170 +104,34 @@ class EgoDecisionMaker(AbstractEgoDecisionMaker):
         # 获取项目根目录
         self.project_root = os.path.join(os.path.dirname(__file__), '..', '..')
         self.Scenario_Name = Scenario_Name
-        self.message_history_dir = os.path.join(self.project_root, f'message_history\\{self.Scenario_Name}') # 消息历史文件目录
+        self.journal = MessageJournal.for_scenario(self.Scenario_Name) # 消息历史日志
         self.rules_file = os.path.join(self.project_root, 'TSRL_inference', 'Rules', 'Roadsys_rule.txt') # 规则文件路径
-        self.inference_input_dir = os.path.join(self.project_root, 'TSRL_inference', 'Inference_Input') # 推理输入文件目录
-        self.inference_output_dir = os.path.join(self.project_root, 'TSRL_inference', 'Inference_Output') # 推理输出文件目录
-        self.tsrl_script = os.path.join(self.project_root, 'TSRL_representation', 'TSRL.py') # TSRL脚本路径
-        
-        # 确保目录存在
-        os.makedirs(self.inference_input_dir, exist_ok=True)
-        os.makedirs(self.inference_output_dir, exist_ok=True)
 
     def _read_message_history(self, vehicle_id: str, max_messages: Optional[int] = None) -> List[str]:
-        """读取指定车辆的消息历史"""
-        message_file = os.path.join(self.message_history_dir, f'message_{vehicle_id}_history.txt')
-        if not os.path.exists(message_file):
-            logging.warning(f"Message history file for vehicle {vehicle_id} not found")
-            return []
-        
+        """读取指定车辆最新的max_messages条消息历史（从内存中的消息日志尾部索引读取）"""
+        messages = self.journal.last(vehicle_id, max_messages)
+        if not messages:
+            logging.warning(f"Message history for vehicle {vehicle_id} not found")
+        return messages
+
+    def _load_rule_base(self) -> Optional[RuleBase]:
+        """读取编译后的规则库，规则文件修改后自动重新编译"""
         try:
-            with open(message_file, 'r', encoding='utf-8') as f:
-                lines = f.readlines()
-                # 过滤空行
-                messages = [line.strip() for line in lines if line.strip()]
-                # 如果指定了最大消息数量，则只返回最新的max_messages条消息
-                if max_messages is not None and max_messages > 0:
-                    return messages[-max_messages:] if len(messages) > max_messages else messages
-                return messages
-        except Exception as e:
-            logging.error(f"Error reading message history for vehicle {vehicle_id}: {e}")
-            return []
-
-    def _read_rules(self) -> List[str]:
-        """读取所有规则"""
-        if not os.path.exists(self.rules_file):
-            logging.error(f"Rules file not found: {self.rules_file}")
-            return []
-        
-        try:
-            with open(self.rules_file, 'r', encoding='utf-8') as f:
-                lines = f.readlines()
-                # 过滤空行和注释行
-                return [line.strip() for line in lines if line.strip() and not line.startswith('#')]
-        except Exception as e:
-            logging.error(f"Error reading rules file: {e}")
-            return []
-
-    def _parse_rule(self, rule: str) -> tuple:
-        """解析规则，返回左侧和右侧部分"""
-        if ":-" not in rule:
-            return None, None
-        head, body = rule.split(":-", 1)
-        head = head.strip()
-        body = body.strip().rstrip(';')  # 移除结尾的分号
-        conditions = [cond.strip() for cond in body.split('),')] # 进行条件切割
-        return head, conditions
-
-    def _check_conditions(self, conditions: List[str], message_history: List[str]) -> bool:
-        """检查所有条件是否都在消息历史中"""
-        for condition in conditions:
-            # 检查条件是否在消息历史中
-            found = False
-            for msg in message_history:
-                # 去除消息末尾的分号
-                clean_msg = msg.rstrip(';')
-                # 检查如果condition和msg都包含"("，则比较括号前的部分
-                if "(" in condition and "(" in clean_msg:
-                    condition_prefix = condition.split("(")[0]
-                    msg_prefix = clean_msg.split("(")[0]
-                    if condition_prefix == msg_prefix:
-                        found = True
-                        break
-                else:
-                    # 如果没有括号，则直接比较
-                    if condition == clean_msg:
-                        found = True
-                        break
-            
-            if not found:
-                return False
-        return True
+            return RuleBase.for_file(self.rules_file)
+        except OSError as e:
+            logging.error(f"Error reading rules file {self.rules_file}: {e}")
+            return None
 
-    def _generate_inference_input(self, vehicle_id: str, message_history: List[str], rule: str, head: str) -> str:
-        """生成推理输入文件"""
-        input_filename = f'Inference_{vehicle_id}_input.txt'
-        input_filepath = os.path.join(self.inference_input_dir, input_filename)
-        
-        try:
-            with open(input_filepath, 'w', encoding='utf-8') as f:
-                # 写入消息历史
-                for msg in message_history:
-                    f.write(f"{msg}\n")
-                f.write("\n")
-                # 写入规则
-                f.write(f"{rule}\n")
-                f.write("\n")
-                # 写入ASK语句
-                f.write(f"ASK {head};\n")
-            
-            return input_filepath
-        except Exception as e:
-            logging.error(f"Error generating inference input for vehicle {vehicle_id}: {e}")
-            return ""
+    def _build_inference_source(self, message_history: List[str], rule: str, head: str) -> str:
+        """拼接推理输入：消息历史、规则与ASK语句"""
+        return '\n'.join(message_history) + '\n\n' + f"{rule}\n\n" + f"ASK {head};\n"
 
-    def _run_tsrl_inference(self, input_filepath: str, vehicle_id: str) -> str:
-        """运行TSRL推理引擎"""
-        output_filename = f'Inference_{vehicle_id}_output.txt'
-        output_filepath = os.path.join(self.inference_output_dir, output_filename)
+    def _ask_rule(self, rule: CompiledRule, facts: OverlayKB, vehicle_id: str) -> Optional[AskResult]:
+        """在车辆的消息事实上询问一条编译后的规则"""
         try:
-            TSRL.main(input_filepath, output_filepath)
-            return output_filepath
+            return RuleBase.ask(rule, facts)
         except Exception as e:
             logging.error(f"Error running TSRL inference for vehicle {vehicle_id}: {e}")
-            return ""
-
-    def _parse_inference_output(self, output_filepath: str, head: str) -> Optional[str]:
-        """解析推理输出，提取变量替换后的决策"""
-        if not os.path.exists(output_filepath):
-            return None
-        try:
-            with open(output_filepath, 'r', encoding='utf-8') as f:
-                lines = f.readlines()
-            
-            # 查找包含head的行
-            for line in lines:
-                line = line.strip()
-                # 检查line是否包含冒号格式的映射关系
-                if ':' in line and line.startswith('{') and line.endswith('}'):
-                    # 解析line中的映射关系，例如 "{'y': '1'}"
-                    try:
-                        # 移除大括号
-                        content = line[1:-1]  # 移除开头和结尾的大括号
-                        # 解析键值对，注意处理逗号在引号内的情况
-                        mapping = {}
-                        # 简单处理，按逗号分割（假设格式简单）
-                        pairs = content.split(',')
-                        # 解析每个键值对
-                        for pair in pairs:
-                            # 分割键和值
-                            if ':' in pair:
-                                kv = pair.split(':', 1)  # 只分割第一个冒号
-                                if len(kv) == 2:
-                                    # 移除键值两端的空格和引号
-                                    key = kv[0].strip().strip("'\"")
-                                    value = kv[1].strip().strip("'\"")
-                                    mapping[key] = value
-                        
-                        # 获取head中的变量名（括号内的内容）
-                        if '(' in head and ')' in head:
-                            head_prefix = head.split('(')[0]
-                            head_var = head[head.find('(')+1:head.find(')')]
-                            
-                            # 检查head_var是否在映射中
-                            if head_var in mapping:
-                                # 替换head中的变量为映射值
-                                replaced_head = f"{head_prefix}({mapping[head_var]})"
-                                return replaced_head
-                    except Exception as e:
-                        logging.warning(f"Failed to parse mapping line: {line}, error: {e}")
-                        continue
-                elif line.startswith(head.split('(')[0]):  # 匹配谓词名称
-                    return line
-            
-            return None
-        except Exception as e:
-            logging.error(f"Error parsing inference output: {e}")
             return None
 
     def _extract_action_from_head(self, head: str) -> str:
@@ -298,7 +165,7 @@ class EgoDecisionMaker(AbstractEgoDecisionMaker):
         return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
     def _generate_detailed_inference_display_file(self, vehicle_id: str, message_history: List[str], rule: str,
-                                                 input_filepath: str, output_filepath: str, decision_result: str):
+                                                 inference_source: str, answer: AskResult, decision_result: str):
         """生成详细的推理展示文件，包含输入、输出和决策结果，并在弹窗中展示"""
         try:
             # 创建推理展示目录
@@ -321,23 +188,18 @@ class EgoDecisionMaker(AbstractEgoDecisionMaker):
                 content += f"{i}. {msg}\n"
             content += "\n"
             
-            # 读取推理输入文件内容
-            content += f"=== 推理输入文件内容 ({os.path.basename(input_filepath)}) ===\n"
-            if os.path.exists(input_filepath):
-                with open(input_filepath, 'r', encoding='utf-8') as f:
-                    content += f.read()
-            else:
-                content += "输入文件不存在\n"
+            # 推理输入内容
+            content += f"=== 推理输入内容 ===\n"
+            content += inference_source
             content += "\n"
             
-            # 读取TSRL推理输出文件内容
-            content += f"=== TSRL推理输出内容 ({os.path.basename(output_filepath)}) ===\n"
-            if os.path.exists(output_filepath):
-                with open(output_filepath, 'r', encoding='utf-8') as f:
-                    content += f.read()
+            # TSRL推理输出内容
+            content += f"=== TSRL推理输出内容 ===\n"
+            if answer.proved:
+                content += json.dumps(answer.substitution, ensure_ascii=False)
             else:
-                content += "输出文件不存在\n"
-            content += "\n"
+                content += "False"
+            content += "\n\n"
             
             # 添加解析后的决策结果
             content += f"=== 解析后的决策结果 ===\n"
@@ -370,11 +232,10 @@ class EgoDecisionMaker(AbstractEgoDecisionMaker):
         基于TSRL的自车决策器实现
         步骤：
         1. 读取自车消息历史文件
-        2. 遍历规则文件中的每条规则
-        3. 检查规则条件是否满足
-        4. 生成推理输入文件
-        5. 运行TSRL推理引擎
-        6. 解析输出并生成决策
+        2. 遍历编译后规则库中的每条规则
+        3. 检查规则前提中的谓词是否都在消息历史中
+        4. 在消息事实上询问该规则
+        5. 根据推理结果生成决策
         """
         # 获取自车信息
         ego_vehicle = None
@@ -394,41 +255,36 @@ class EgoDecisionMaker(AbstractEgoDecisionMaker):
         if not message_history:
             logging.warning(f"No message history for ego vehicle {vehicle_id}")
             return EgoDecision(ego_veh=ego_vehicle, result=decision_result)
-        # 读取规则
-        rules = self._read_rules()
-        if not rules:
+        # 读取编译后的规则库
+        rule_base = self._load_rule_base()
+        if rule_base is None or not rule_base.rules:
             logging.warning("No rules found, skipping TSRL decision making")
             return EgoDecision(ego_veh=ego_vehicle, result=decision_result)
+        # 消息事实只解析一次，所有规则共用
+        facts = RuleBase.facts(message_history)
+        predicates = message_predicates(message_history)
         # 遍历所有规则
-        for rule in rules:
-            if ":-" not in rule:
-                continue
-            head, conditions = self._parse_rule(rule)
-            if not head or not conditions:
-                continue
-            # 检查规则条件是否满足
-            if self._check_conditions(conditions, message_history):
-                logging.debug(f"Rule conditions satisfied for ego vehicle {vehicle_id}: {rule}")
-                # 生成推理输入文件
-                input_filepath = self._generate_inference_input(vehicle_id, message_history, rule, head)
-                if not input_filepath:
-                    continue
+        for rule in rule_base.rules:
+            # 检查规则前提中的谓词是否都在消息历史中
+            if rule.body_predicates <= predicates:
+                logging.debug(f"Rule conditions satisfied for ego vehicle {vehicle_id}: {rule.source}")
                 # 运行TSRL推理
-                output_filepath = self._run_tsrl_inference(input_filepath, vehicle_id)
-                if not output_filepath:
+                answer = self._ask_rule(rule, facts, vehicle_id)
+                if answer is None:
                     continue
                 
-                # 解析推理输出
-                decision_output = self._parse_inference_output(output_filepath, head)
+                # 推理结果：代入置换后的规则头部
+                decision_output = answer.action
                 if decision_output:
                     # 生成详细的推理展示文件并弹窗展示
-                    self._generate_detailed_inference_display_file(vehicle_id, message_history, rule, input_filepath, output_filepath, decision_output)
+                    inference_source = self._build_inference_source(message_history, rule.source, rule.head_text)
+                    self._generate_detailed_inference_display_file(vehicle_id, message_history, rule.source, inference_source, answer, decision_output)
                     # 创建决策
                     decision_at_t = SingleStepDecision()
                     decision_at_t.action = decision_output
                     decision_at_t.expected_time = T
                     # 根据规则头部确定行为类型
-                    action_name = self._extract_action_from_head(head)
+                    action_name = self._extract_action_from_head(rule.head_text)
                     # 使用action_name_to_behaviour_mapper映射action_name到Behaviour
                     decision_at_t.behaviour = action_name_to_behaviour_mapper.get_behaviour(action_name)
                     if decision_at_t.behaviour is Behaviour.OTHER:
@@ -448,15 +304,8 @@ class MultiDecisionMaker(AbstractMultiDecisionMaker):
         # 获取项目根目录
         self.project_root = os.path.join(os.path.dirname(__file__), '..', '..')
         self.Scenario_Name = Scenario_Name
-        self.message_history_dir = os.path.join(self.project_root, f'message_history\\{self.Scenario_Name}') # 消息历史文件目录
+        self.journal = MessageJournal.for_scenario(self.Scenario_Name) # 消息历史日志
         self.rules_file = os.path.join(self.project_root, 'TSRL_inference', 'Rules', 'Roadsys_rule.txt') # 规则文件路径
-        self.inference_input_dir = os.path.join(self.project_root, 'TSRL_inference', 'Inference_Input') # 推理输入文件目录
-        self.inference_output_dir = os.path.join(self.project_root, 'TSRL_inference', 'Inference_Output') # 推理输出文件目录
-        self.tsrl_script = os.path.join(self.project_root, 'TSRL_representation', 'TSRL.py') # TSRL脚本路径
-        
-        # 确保目录存在
-        os.makedirs(self.inference_input_dir, exist_ok=True)
-        os.makedirs(self.inference_output_dir, exist_ok=True)
     
     def stop_vehicle(self, vehicle: control_Vehicle, complete_decisions: MultiDecision, T: float, config: dict):
         """为rou文件中有停车需要的车辆生成主动停车决策"""
@@ -471,175 +320,31 @@ class MultiDecisionMaker(AbstractMultiDecisionMaker):
         
         
     def _read_message_history(self, vehicle_id: str, max_messages: Optional[int] = None) -> List[str]:
-        """读取指定车辆的消息历史"""
-        message_file = os.path.join(self.message_history_dir, f'message_{vehicle_id}_history.txt')
-        if not os.path.exists(message_file):
-            logging.warning(f"Message history file for vehicle {vehicle_id} not found")
-            return []
-        
-        try:
-            with open(message_file, 'r', encoding='utf-8') as f:
-                lines = f.readlines()
-                # 过滤空行
-                messages = [line.strip() for line in lines if line.strip()]
-                # 如果指定了最大消息数量，则只返回最新的max_messages条消息
-                if max_messages is not None and max_messages > 0:
-                    return messages[-max_messages:] if len(messages) > max_messages else messages
-                return messages
-        except Exception as e:
-            logging.error(f"Error reading message history for vehicle {vehicle_id}: {e}")
-            return []
-
-    def _read_rules(self) -> List[str]:
-        """读取所有规则"""
-        if not os.path.exists(self.rules_file):
-            logging.error(f"Rules file not found: {self.rules_file}")
-            return []
-        
-        try:
-            with open(self.rules_file, 'r', encoding='utf-8') as f:
-                lines = f.readlines()
-                # 过滤空行和注释行
-                return [line.strip() for line in lines if line.strip() and not line.startswith('#')]
-        except Exception as e:
-            logging.error(f"Error reading rules file: {e}")
-            return []
-
-    def _parse_rule(self, rule: str) -> tuple:
-        """解析规则，返回左侧和右侧部分"""
-        if ":-" not in rule:
-            return None, None
-        head, body = rule.split(":-", 1)
-        head = head.strip()
-        body = body.strip().rstrip(';')  # 移除结尾的分号
-        conditions = [cond.strip() for cond in body.split(',')]
-        return head, conditions
-
-    def _check_conditions(self, conditions: List[str], message_history: List[str]) -> bool:
-        """检查所有条件是否都在消息历史中"""
-        for condition in conditions:
-            # 简单检查条件是否在消息历史中
-            found = False  # 初始化found变量
-            for msg in message_history:
-                # 去除消息末尾的分号
-                clean_msg = msg.rstrip(';')
-                # 检查如果condition和msg都包含"("，则比较括号前的部分
-                if "(" in condition and "(" in clean_msg:
-                    condition_prefix = condition.split("(")[0]
-                    msg_prefix = clean_msg.split("(")[0]
-                    if condition_prefix == msg_prefix:
-                        found = True
-                        break
-                else:
-                    # 如果没有括号，则直接比较
-                    if condition == clean_msg:
-                        found = True
-                        break
-            
-            if not found:
-                return False
-        return True
-
-    def _generate_inference_input(self, vehicle_id: str, message_history: List[str], rule: str, head: str) -> str:
-        """生成推理输入文件"""
-        input_filename = f'Inference_{vehicle_id}_input.txt'
-        input_filepath = os.path.join(self.inference_input_dir, input_filename)
-        
+        """读取指定车辆最新的max_messages条消息历史（从内存中的消息日志尾部索引读取）"""
+        messages = self.journal.last(vehicle_id, max_messages)
+        if not messages:
+            logging.warning(f"Message history for vehicle {vehicle_id} not found")
+        return messages
+
+    def _load_rule_base(self) -> Optional[RuleBase]:
+        """读取编译后的规则库，规则文件修改后自动重新编译"""
         try:
-            with open(input_filepath, 'w', encoding='utf-8') as f:
-                # 写入消息历史
-                for msg in message_history:
-                    f.write(f"{msg}\n")
-                f.write("\n")
-                # 写入规则
-                f.write(f"{rule}\n")
-                f.write("\n")
-                # 写入ASK语句
-                f.write(f"ASK {head}\n")
-            
-            return input_filepath
-        except Exception as e:
-            logging.error(f"Error generating inference input for vehicle {vehicle_id}: {e}")
-            return ""
+            return RuleBase.for_file(self.rules_file)
+        except OSError as e:
+            logging.error(f"Error reading rules file {self.rules_file}: {e}")
+            return None
 
-    def _run_tsrl_inference(self, input_filepath: str, vehicle_id: str) -> str:
-        """运行TSRL推理引擎"""
-        output_filename = f'Inference_{vehicle_id}_output.txt'
-        output_filepath = os.path.join(self.inference_output_dir, output_filename)
-        
-        try:
-            # 构建命令
-            cmd = f'python "{self.tsrl_script}" "{input_filepath}"'
-            
-            # 运行推理
-            result = subprocess.run(cmd, shell=True, capture_output=True, text=True, cwd=os.path.dirname(self.tsrl_script))
-            
-            if result.returncode != 0:
-                logging.error(f"TSRL inference failed for vehicle {vehicle_id}: {result.stderr}")
-                return ""
-            
-            # 将输出保存到文件
-            with open(output_filepath, 'w', encoding='utf-8') as f:
-                f.write(result.stdout)
-            
-            return output_filepath
-        except Exception as e:
-            logging.error(f"Error running TSRL inference for vehicle {vehicle_id}: {e}")
-            return ""
+    def _build_inference_source(self, message_history: List[str], rule: str, head: str) -> str:
+        """拼接推理输入：消息历史、规则与ASK语句"""
+        return '\n'.join(message_history) + '\n\n' + f"{rule}\n\n" + f"ASK {head};\n"
 
-    def _parse_inference_output(self, output_filepath: str, head: str) -> Optional[str]:
-        """解析推理输出，提取变量替换后的决策"""
-        if not os.path.exists(output_filepath):
-            return None
-            
+    def _ask_batch(self, rule_base: RuleBase, histories: Dict[str, List[str]]) -> Dict[str, List[Optional[AskResult]]]:
+        """在一次批量推理中询问全部车辆的全部规则，返回 车辆ID -> 按规则顺序的推理结果，出错时结果为 None"""
         try:
-            with open(output_filepath, 'r', encoding='utf-8') as f:
-                lines = f.readlines()
-            
-            # 查找包含head的行
-            for line in lines:
-                line = line.strip()
-                # 检查line是否包含冒号格式的映射关系
-                if ':' in line and line.startswith('{') and line.endswith('}'):
-                    # 解析line中的映射关系，例如 "{'y': '1'}"
-                    try:
-                        # 移除大括号
-                        content = line[1:-1]  # 移除开头和结尾的大括号
-                        # 解析键值对，注意处理逗号在引号内的情况
-                        mapping = {}
-                        # 简单处理，按逗号分割（假设格式简单）
-                        pairs = content.split(',')
-                        # 解析每个键值对
-                        for pair in pairs:
-                            # 分割键和值
-                            if ':' in pair:
-                                kv = pair.split(':', 1)  # 只分割第一个冒号
-                                if len(kv) == 2:
-                                    # 移除键值两端的空格和引号
-                                    key = kv[0].strip().strip("'\"")
-                                    value = kv[1].strip().strip("'\"")
-                                    mapping[key] = value
-                        
-                        # 获取head中的变量名（括号内的内容）
-                        if '(' in head and ')' in head:
-                            head_prefix = head.split('(')[0]
-                            head_var = head[head.find('(')+1:head.find(')')]
-                            
-                            # 检查head_var是否在映射中
-                            if head_var in mapping:
-                                # 替换head中的变量为映射值
-                                replaced_head = f"{head_prefix}({mapping[head_var]})"
-                                return replaced_head
-                    except Exception as e:
-                        logging.warning(f"Failed to parse mapping line: {line}, error: {e}")
-                        continue
-                elif line.startswith(head.split('(')[0]):  # 匹配谓词名称
-                    return line
-            
-            return None
+            return rule_base.ask_batch(histories)
         except Exception as e:
-            logging.error(f"Error parsing inference output: {e}")
-            return None
+            logging.error(f"Error running batched TSRL inference for vehicles {list(histories)}: {e}")
+            return {vehicle_id: [None] * len(rule_base.rules) for vehicle_id in histories}
 
     def _extract_action_from_head(self, head: str) -> str:
         """从规则头部提取行为名称"""
@@ -653,7 +358,7 @@ class MultiDecisionMaker(AbstractMultiDecisionMaker):
         return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
     def _generate_detailed_inference_display_file(self, vehicle_id: str, message_history: List[str], rule: str,
-                                                 input_filepath: str, output_filepath: str, decision_result: str):
+                                                 inference_source: str, answer: AskResult, decision_result: str):
         """生成详细的推理展示文件，包含输入、输出和决策结果，并在弹窗中展示"""
         try:
             # 创建推理展示目录
@@ -676,23 +381,18 @@ class MultiDecisionMaker(AbstractMultiDecisionMaker):
                 content += f"{i}. {msg}\n"
             content += "\n"
             
-            # 读取推理输入文件内容
-            content += f"=== 推理输入文件内容 ({os.path.basename(input_filepath)}) ===\n"
-            if os.path.exists(input_filepath):
-                with open(input_filepath, 'r', encoding='utf-8') as f:
-                    content += f.read()
-            else:
-                content += "输入文件不存在\n"
+            # 推理输入内容
+            content += f"=== 推理输入内容 ===\n"
+            content += inference_source
             content += "\n"
             
-            # 读取TSRL推理输出文件内容
-            content += f"=== TSRL推理输出内容 ({os.path.basename(output_filepath)}) ===\n"
-            if os.path.exists(output_filepath):
-                with open(output_filepath, 'r', encoding='utf-8') as f:
-                    content += f.read()
+            # TSRL推理输出内容
+            content += f"=== TSRL推理输出内容 ===\n"
+            if answer.proved:
+                content += json.dumps(answer.substitution, ensure_ascii=False)
             else:
-                content += "输出文件不存在\n"
-            content += "\n"
+                content += "False"
+            content += "\n\n"
             
             # 添加解析后的决策结果
             content += f"=== 解析后的决策结果 ===\n"
@@ -743,22 +443,31 @@ class MultiDecisionMaker(AbstractMultiDecisionMaker):
         """
         基于TSRL的多车决策器实现
         步骤：
-        1. 读取消息历史文件
-        2. 遍历规则文件中的每条规则
-        3. 检查规则条件是否满足
-        4. 生成推理输入文件
-        5. 运行TSRL推理引擎
-        6. 解析输出并生成决策
+        1. 读取全部车辆的消息历史
+        2. 在一次批量推理中询问全部车辆的全部规则：相同的消息事实只加入一次，各车的结果按车辆拆分
+        3. 遍历编译后规则库中的每条规则，检查规则前提中的谓词是否都在消息历史中
+        4. 根据该车辆对该规则的推理结果生成决策
         """
         complete_decisions = MultiDecision()
         # 获取所有需要决策的车辆,跳过AOI区域外的车和Ego车
         decision_vehicles = [veh for veh in observation.vehicles if veh.vtype != 'OUT_OF_AOI' and veh.vtype != "Ego_Car"]
-        # 读取规则
-        rules = self._read_rules()
-        if not rules:
+        # 读取编译后的规则库
+        rule_base = self._load_rule_base()
+        if rule_base is None or not rule_base.rules:
             logging.warning("No rules found, skipping TSRL decision making")
             return complete_decisions
         
+        # 读取需要TSRL决策的车辆的消息历史，默认读取最新的num_readmessages条消息
+        histories = {}
+        for vehicle in decision_vehicles:
+            if vehicle.stop_lane is not None and vehicle.lane_id in vehicle.stop_lane:
+                continue
+            vehicle_id = str(vehicle.id)
+            histories[vehicle_id] = self._read_message_history(vehicle_id, max_messages=config["NUM_READMESSAGES"])
+        # 全部车辆的询问在一次批量推理中完成
+        answers = self._ask_batch(rule_base, {vehicle_id: message_history
+                                              for vehicle_id, message_history in histories.items() if message_history})
+
         # 为每辆车做决策
         for vehicle in decision_vehicles:
             # 11.4 对stop_lane!=None的Vehicle进行主动停车
@@ -767,47 +476,34 @@ class MultiDecisionMaker(AbstractMultiDecisionMaker):
                 continue # 主动停车决策优先级大于TSRL决策
             # TSRL决策
             vehicle_id = str(vehicle.id)
-            # 读取该车辆的消息历史，默认读取最新的num_readmessages条消息
-            message_history = self._read_message_history(vehicle_id, max_messages=config["NUM_READMESSAGES"])
+            message_history = histories[vehicle_id]
             if not message_history:
                 logging.warning(f"No message history for vehicle {vehicle_id}")
                 continue
             
-            # 遍历所有规则
-            for rule in rules:
-                if ":-" not in rule:
-                    continue
-                    
-                head, conditions = self._parse_rule(rule)
-                if not head or not conditions:
-                    continue
-                
+            predicates = message_predicates(message_history)
+            # 遍历所有规则，推理结果与规则一一对应
+            for rule, answer in zip(rule_base.rules, answers[vehicle_id]):
                 decision_result = None
-                # 检查规则条件是否满足
-                if self._check_conditions(conditions, message_history):
-                    logging.debug(f"Rule conditions satisfied for vehicle {vehicle_id}: {rule}")
-                    # 生成推理输入文件
-                    input_filepath = self._generate_inference_input(vehicle_id, message_history, rule, head)
-                    if not input_filepath:
-                        continue
-                    
-                    # 运行TSRL推理
-                    output_filepath = self._run_tsrl_inference(input_filepath, vehicle_id)  
-                    if not output_filepath:
+                # 检查规则前提中的谓词是否都在消息历史中
+                if rule.body_predicates <= predicates:
+                    logging.debug(f"Rule conditions satisfied for vehicle {vehicle_id}: {rule.source}")
+                    if answer is None:
                         continue
-                    # 解析推理输出
-                    decision_result = self._parse_inference_output(output_filepath, head)
+                    # 推理结果：代入置换后的规则头部
+                    decision_result = answer.action
                     # 如果规则条件满足，生成推理展示文件并弹窗展示
                     if decision_result:
                         # 生成详细的推理展示文件并弹窗展示
-                        self._generate_detailed_inference_display_file(vehicle_id, message_history, rule, input_filepath, output_filepath, decision_result)
+                        inference_source = self._build_inference_source(message_history, rule.source, rule.head_text)
+                        self._generate_detailed_inference_display_file(vehicle_id, message_history, rule.source, inference_source, answer, decision_result)
                     if decision_result:
                         # 创建决策
                         decision_at_t = SingleStepDecision()
                         decision_at_t.action = decision_result
                         decision_at_t.expected_time = T  
                         # 根据规则头部确定行为类型
-                        action_name = self._extract_action_from_head(head)
+                        action_name = self._extract_action_from_head(rule.head_text)
                         # 使用action_name_to_behaviour_mapper映射action_name到Behaviour
                         decision_at_t.behaviour = action_name_to_behaviour_mapper.get_behaviour(action_name)
                         if decision_at_t.behaviour is None:
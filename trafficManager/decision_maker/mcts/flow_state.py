@@ -12,7 +12,7 @@ import random
 
 import numpy as np
 from common.vehicle import State, control_Vehicle, Behaviour, VehicleType
-from common.obstacle_cost import check_collsion_new
+from common.collision import box_collision_many
 from utils.roadgraph import RoadGraph, NormalLane, JunctionLane
 from utils import data_copy
 from abstract_decision_maker import MultiDecision
@@ -61,38 +61,21 @@ class FlowState:
         current_vehs = self.states_list[-1]
         for i, decision_veh in enumerate(current_vehs):
             current_state = decision_veh.current_state
+            others = []
             for other_veh, decisions in self.complete_decisions.results.items():
                 if decision_idx < len(decisions):
-                    is_collide = self._check_collision(
-                        decision_veh,
-                        current_state,
-                        other_veh,
-                        decisions[decision_idx].expected_state,
-                    )
-                    if is_collide:
-                        self.num_moves = 0
-                        return
+                    others.append((other_veh, decisions[decision_idx].expected_state))
             for other_veh, states in self.prediction.results.items():
                 if other_veh.vtype != VehicleType.OUT_OF_AOI:
                     continue
                 if prediction_idx < len(states):
-                    is_collide = self._check_collision(
-                        decision_veh, current_state, other_veh, states[prediction_idx]
-                    )
-                    if is_collide:
-                        self.num_moves = 0
-                        return
+                    others.append((other_veh, states[prediction_idx]))
             for idx in range(i):
                 other_decision_veh = current_vehs[idx]
-                is_collide = self._check_collision(
-                    decision_veh,
-                    current_state,
-                    other_decision_veh,
-                    other_decision_veh.current_state,
-                )
-                if is_collide:
-                    self.num_moves = 0
-                    return
+                others.append((other_decision_veh, other_decision_veh.current_state))
+            if self._check_collision(decision_veh, current_state, others):
+                self.num_moves = 0
+                return
 
         # available actions for vehicles
         actions_list = []
@@ -149,13 +132,13 @@ class FlowState:
             self.next_actions.remove(next_action)
         next_time = self.time + self.config["DECISION_RESOLUTION"]
         # actions_next_step = copy.deepcopy(self.actions)
-        actions_next_step = data_copy.deepcopy(self.actions)
+        actions_next_step = {veh_id: list(actions) for veh_id, actions in self.actions.items()}
         vehs_next_step = []
 
         current_vehs = self.states_list[-1]
         for idx, veh in enumerate(current_vehs):
             # veh_next_step = copy.deepcopy(veh)
-            veh_next_step = data_copy.deepcopy(veh)
+            veh_next_step = data_copy.clone(veh)
             veh_next_state = veh_next_step.current_state
             action = next_action[idx]
             lane = self.road_graph.get_lane_by_id(veh.lane_id)
@@ -337,26 +320,35 @@ class FlowState:
         return max(0.0, min(1.0, total_reward))
 
     def _check_collision(
-        self, veh1: control_Vehicle, state1: State, veh2: control_Vehicle, state2: State
+        self, veh1: control_Vehicle, state1: State, others: List
     ) -> bool:
-        if veh1 == veh2:
+        """check veh1 at state1 against all (vehicle, state) pairs in others at once"""
+        if any(veh1 == veh2 for veh2, _ in others):
             print("Decision vehicle has already decision?!")
             exit(1)
+        if not others:
+            return False
 
-        dist = math.hypot(state1.x - state2.x, state1.y - state2.y)
-        dist_thershold = math.hypot(veh1.length + veh2.length, veh1.width + veh2.width)
-        if dist > dist_thershold:
+        x2 = np.array([state2.x for _, state2 in others])
+        y2 = np.array([state2.y for _, state2 in others])
+        yaw2 = np.array([state2.yaw for _, state2 in others])
+        length2 = np.array([veh2.length for veh2, _ in others])
+        width2 = np.array([veh2.width for veh2, _ in others])
+        dist = np.hypot(state1.x - x2, state1.y - y2)
+        dist_thershold = np.hypot(veh1.length + length2, veh1.width + width2)
+        near = ~(dist > dist_thershold)
+        if not near.any():
             return False
 
-        is_collide, _ = check_collsion_new(
+        is_collide, _ = box_collision_many(
             np.array([state1.x, state1.y]),
             veh1.length * 2,
             veh1.width * 1.5,
             state1.yaw,
-            np.array([state2.x, state2.y]),
-            veh2.length,
-            veh2.width,
-            state2.yaw,
+            np.stack([x2[near], y2[near]], axis=-1),
+            length2[near],
+            width2[near],
+            yaw2[near],
         )
 
-        return is_collide
+        return bool(is_collide.any())
@@ -10,6 +10,7 @@ from decision_maker.abstract_decision_maker import (
     SingleStepDecision,
 )
 from planner.abstract_planner import AbstractMultiPlanner
+from planner.parallel_planner import PLAN_OK, PlannerPool
 from predictor.abstract_predictor import Prediction
 
 import logger
@@ -22,6 +23,12 @@ logging = logger.get_logger(__name__)
 
 
 class MultiVehiclePlanner(AbstractMultiPlanner):
+    def __init__(self) -> None:
+        self.pool: PlannerPool = None
+        self.pool_unavailable = False
+        # 车辆ID -> (规划时刻, 轨迹)，并行规划超时时沿用
+        self.last_paths: Dict[str, tuple] = {}
+
     def plan(self,
              controlled_observation: Observation,
              roadgraph: RoadGraph,
@@ -41,6 +48,9 @@ class MultiVehiclePlanner(AbstractMultiPlanner):
         Returns:
             Dict[control_Vehicle, Trajectory]: 多车规划结果
         """
+        if config.get("PARALLEL_PLANNING", False) and self.get_pool(config) is not None:
+            return self.plan_parallel(controlled_observation, roadgraph,
+                                      uncontrolled_prediction, T, config, multi_decision)
         plan_result: Dict[int, Trajectory] = {}
         for vehicle in controlled_observation.vehicles:
             # 遍历所有车辆
@@ -71,6 +81,86 @@ class MultiVehiclePlanner(AbstractMultiPlanner):
 
         return plan_result
 
+    def get_pool(self, config) -> PlannerPool:
+        """返回常驻的规划进程池，进程池不可用时返回 None"""
+        if self.pool is not None and not self.pool.is_alive():
+            logging.error("A planning worker exited unexpectedly, restarting the planning pool")
+            self.pool.close()
+            self.pool = None
+        if self.pool is None and not self.pool_unavailable:
+            self.pool = PlannerPool.create(config)
+            self.pool_unavailable = self.pool is None
+        return self.pool
+
+    def plan_parallel(self,
+                      controlled_observation: Observation,
+                      roadgraph: RoadGraph,
+                      uncontrolled_prediction: Prediction,
+                      T,
+                      config,
+                      multi_decision: MultiDecision = None) -> Dict[control_Vehicle, Trajectory]:
+        """
+        并行版本的 plan：行驶轨迹（KL、LCL、LCR）由进程池生成，停车轨迹仍由主进程按车辆顺序生成。
+        结果按车辆在观测中的顺序排列；超过 PLANNING_DEADLINE 仍未返回的车辆沿用上一步的轨迹，
+        没有可沿用的轨迹或进程出错时在主进程中规划。
+        """
+        start = time.time()
+        deadline = start + config.get("PLANNING_DEADLINE", 0.2)
+        self.pool.start_step(roadgraph, T, config, controlled_observation.obstacles,
+                             uncontrolled_prediction)
+        vehicles = []
+        decisions = {}
+        for vehicle in controlled_observation.vehicles:
+            if vehicle.vtype == VehicleType.OUT_OF_AOI:
+                continue
+            if config["EGO_PLANNER"] and vehicle.vtype == VehicleType.EGO:
+                continue
+            decision_list = self.find_decision(vehicle, multi_decision, T, config)
+            if decision_list is not None and len(decision_list) > 0 and decision_list[-1].behaviour is not None:
+                vehicle.behaviour = decision_list[-1].behaviour
+            vehicles.append(vehicle)
+            decisions[vehicle.id] = decision_list
+            if vehicle.behaviour in PlannerPool.MOVING_BEHAVIOURS:
+                self.pool.submit(vehicle, decision_list)
+        results = self.pool.collect(deadline)
+
+        plan_result: Dict[int, Trajectory] = {}
+        for vehicle in vehicles:
+            status, path = results.get(vehicle.id, (None, None))
+            if status is None and vehicle.behaviour in PlannerPool.MOVING_BEHAVIOURS:
+                path = self.previous_path(vehicle.id, T, config)
+                if path is not None:
+                    status = PLAN_OK
+                    logging.warning(f"Vehicle {vehicle.id} missed the planning deadline, keeping its previous trajectory")
+            elif status not in (None, PLAN_OK):
+                logging.debug(f"Vehicle {vehicle.id} is planned on the main process: {status} {path or ''}")
+            if status != PLAN_OK:
+                current_lane = roadgraph.get_lane_by_id(vehicle.lane_id)
+                obs_list = self.extract_obstacles(controlled_observation,
+                                                  uncontrolled_prediction,
+                                                  vehicle, roadgraph)
+                path = self.generate_trajectory(
+                    roadgraph, T, config, vehicle, current_lane, obs_list, decisions[vehicle.id]
+                )
+            plan_result[vehicle.id] = path
+            self.last_paths[vehicle.id] = (T, path)
+        for vehicle_id in self.last_paths.keys() - plan_result.keys():
+            del self.last_paths[vehicle_id]
+        logging.debug(f"Parallel planning of {len(vehicles)} vehicles: {time.time() - start}")
+        return plan_result
+
+    def previous_path(self, vehicle_id, T, config) -> Trajectory:
+        """上一步的轨迹去掉已经走过的状态，剩余状态不足时返回 None"""
+        if vehicle_id not in self.last_paths:
+            return None
+        last_T, last_path = self.last_paths[vehicle_id]
+        if last_path is None:
+            return None
+        elapsed = int(round((T - last_T) / config["DT"]))
+        if elapsed < 0 or len(last_path.states) <= elapsed + 1:
+            return None
+        return Trajectory(states=last_path.states[elapsed:], cost=last_path.cost)
+
     def generate_trajectory(
         self, roadgraph:RoadGraph, T, config, vehicle: control_Vehicle, current_lane : AbstractLane, obs_list, decision_list
     ):
@@ -81,66 +171,67 @@ class MultiVehiclePlanner(AbstractMultiPlanner):
         # 实施车辆决策
         if decision_list is not None and len(decision_list) > 0 and decision_list[-1].behaviour is not None:
             vehicle.behaviour = decision_list[-1].behaviour
+        if self.need_stop_path(vehicle, current_lane, next_lane, obs_list):
+            # 停止轨迹生成
+            # STOP行为的LetStop消息的发送已移至Vehicle类的update_behaviour方法中，仅在行为状态变化时发送
+            return traj_generator.stop_trajectory_generator(
+                vehicle, lanes, obs_list, roadgraph, config, T
+            )
+        return self.moving_trajectory(
+            roadgraph, T, config, vehicle, current_lane, lanes, obs_list, decision_list
+        )
+
+    def need_stop_path(
+        self, vehicle: control_Vehicle, current_lane: AbstractLane, next_lane: AbstractLane, obs_list
+    ) -> bool:
+        """检查车辆是否使用停车轨迹：STOP与IN_JUNCTION行为，以及等待绿灯、前方有停止车辆或低速的KL行为"""
+        if vehicle.behaviour in (Behaviour.STOP, Behaviour.IN_JUNCTION):
+            # in Junction. for now just stop trajectory
+            return True
+        if vehicle.behaviour != Behaviour.KL:
+            return False
+        # 检查是否在等待绿灯
+        if self.is_waiting_for_green_light(current_lane, next_lane):
+            logging.debug(f"Vehicle {vehicle.id} is waiting for green light, will stop")
+            return True
+        # 检查前方是否有停止的车辆
+        for obs in obs_list:
+            if obs.type == ObsType.CAR:
+                # 检查是否在同一车道且在前方
+                if hasattr(obs, 'current_state') and hasattr(obs.current_state, 'vel'):
+                    if obs.current_state.vel < 0.1:  # 前方车辆速度小于0.1m/s认为已停止
+                        # 检查是否在同一车道或相邻车道
+                        obs_s, obs_d = current_lane.course_spline.cartesian_to_frenet1D(
+                            obs.current_state.x,
+                            obs.current_state.y
+                        )
+                        if (obs_s > vehicle.current_state.s and 
+                            abs(obs_d) < current_lane.width * 1.5):  # 考虑相邻车道的情况
+                            logging.info(f"Vehicle {vehicle.id} detected stopped vehicle {obs._obstacle_id} ahead at distance {obs_s - vehicle.current_state.s:.2f}m, will stop")
+                            return True
+        # 低速时也生成停止轨迹
+        return vehicle.current_state.s_d < 10 / 3.6
+
+    def moving_trajectory(
+        self, roadgraph: RoadGraph, T, config, vehicle: control_Vehicle, current_lane: AbstractLane,
+        lanes, obs_list, decision_list
+    ) -> Trajectory:
+        """生成行驶轨迹，不修改共享状态，可以在规划进程中调用"""
         # 初始化path变量
         path = Trajectory()
         # 如果车辆行为是保持车道
         if vehicle.behaviour ==Behaviour.KL:
-            # 检查是否需要停止
-            need_stop = False
-            # 检查是否在等待绿灯
-            if self.is_waiting_for_green_light(current_lane, next_lane):
-                need_stop = True
-                logging.debug(f"Vehicle {vehicle.id} is waiting for green light, will stop")
-            else:
-                # 检查前方是否有停止的车辆
-                has_stopped_vehicle_ahead = False
-                for obs in obs_list:
-                    if obs.type == ObsType.CAR:
-                        # 检查是否在同一车道且在前方
-                        if hasattr(obs, 'current_state') and hasattr(obs.current_state, 'vel'):
-                            if obs.current_state.vel < 0.1:  # 前方车辆速度小于0.1m/s认为已停止
-                                # 检查是否在同一车道或相邻车道
-                                obs_s, obs_d = current_lane.course_spline.cartesian_to_frenet1D(
-                                    obs.current_state.x,
-                                    obs.current_state.y
-                                )
-                                if (obs_s > vehicle.current_state.s and 
-                                    abs(obs_d) < current_lane.width * 1.5):  # 考虑相邻车道的情况
-                                    has_stopped_vehicle_ahead = True
-                                    logging.info(f"Vehicle {vehicle.id} detected stopped vehicle {obs._obstacle_id} ahead at distance {obs_s - vehicle.current_state.s:.2f}m, will stop")
-                                    break
-                
-                need_stop = has_stopped_vehicle_ahead
-            
-            if need_stop:
-                # 停止轨迹生成
-                path = traj_generator.stop_trajectory_generator(
-                    vehicle, lanes, obs_list, roadgraph, config, T
+            # Keep Lane
+            if config["USE_DECISION_MAKER"] and decision_list is not None:
+                path = traj_generator.decision_trajectory_generator(
+                    vehicle, lanes, obs_list, config, T, decision_list,
+                )
+                if path is None:
+                    logging.info("Fail to plan DECISION KL path for vehicle %s back to normal planner", vehicle.id)
+            if path is None:
+                path = traj_generator.lanekeeping_trajectory_generator(
+                    vehicle, lanes, obs_list, config, T
                 )
-            else:
-                # Keep Lane
-                if vehicle.current_state.s_d >= 10 / 3.6:
-                    if config["USE_DECISION_MAKER"] and decision_list is not None:
-                        path = traj_generator.decision_trajectory_generator(
-                            vehicle, lanes, obs_list, config, T, decision_list,
-                        )
-                        if path is None:
-                            logging.info("Fail to plan DECISION KL path for vehicle %s back to normal planner", vehicle.id)
-                    if path is None:
-                        path = traj_generator.lanekeeping_trajectory_generator(
-                            vehicle, lanes, obs_list, config, T
-                        )
-                else:
-                    # 低速时也生成停止轨迹
-                    path = traj_generator.stop_trajectory_generator(
-                        vehicle, lanes, obs_list, roadgraph, config, T,
-                    )
-        elif vehicle.behaviour == Behaviour.STOP: 
-            # Stopping
-            # LetStop消息的发送已移至Vehicle类的update_behaviour方法中，仅在行为状态变化时发送
-            path = traj_generator.stop_trajectory_generator(
-                vehicle, lanes, obs_list, roadgraph, config, T,
-            )
         elif vehicle.behaviour == Behaviour.LCL:
             # Turn Left
             logging.debug(f"vehicle {vehicle.id} is planning to change to left lane")
@@ -192,11 +283,6 @@ class MultiVehiclePlanner(AbstractMultiPlanner):
                         vehicle, right_lane, obs_list, config, T,
                     )
 
-        elif vehicle.behaviour == Behaviour.IN_JUNCTION:
-            # in Junction. for now just stop trajectory
-            path = traj_generator.stop_trajectory_generator(
-                vehicle, lanes, obs_list, roadgraph, config, T,
-            )
         else:
             logging.error(f"Vehicle {vehicle.id} has unknown behaviour {vehicle.behaviour}")
             # 为未知行为提供默认轨迹
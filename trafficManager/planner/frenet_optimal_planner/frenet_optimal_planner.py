@@ -170,18 +170,12 @@ def calc_global_paths(fplist, csp):
 
 
 def check_collision(fp, ob, config):
-    for i in range(len(ob[:, 0])):
-        d = []
-        for fpi in range(len(fp.states)):
-            d.append((fp.states[fpi].x - ob[i, 0])**2 +
-                     (fp.states[fpi].y - ob[i, 1])**2)
+    x = np.array([state.x for state in fp.states])
+    y = np.array([state.y for state in fp.states])
+    # 所有障碍物与所有轨迹点的距离平方，形状为 (障碍物数, 轨迹点数)
+    d = (x - ob[:, 0:1])**2 + (y - ob[:, 1:2])**2
 
-        collision = any([di <= config["CAR_RADIUS"]**2 for di in d])
-
-        if collision:
-            return False
-
-    return True
+    return not np.any(d <= config["CAR_RADIUS"]**2)
 
 
 def cal_cost(fplist, ob, course_spline, config):
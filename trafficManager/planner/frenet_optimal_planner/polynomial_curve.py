@@ -115,3 +115,69 @@ class QuinticPolynomial:
         xt = 6 * self.a3 + 24 * self.a4 * t + 60 * self.a5 * t**2
 
         return xt
+
+
+class QuinticPolynomialBatch:
+    """QuinticPolynomial for many boundary conditions at once.
+
+    Every argument may be a scalar or an array; they are broadcast against
+    each other and the coefficients of all curves are solved in one batched
+    linear solve. The calc_* methods evaluate all curves on a shared time
+    grid t and return arrays of shape (n_curves, len(t)).
+    """
+
+    def __init__(self, xs, vxs, axs, xe, vxe, axe, T):
+        xs, vxs, axs, xe, vxe, axe, T = np.broadcast_arrays(
+            *(np.asarray(v, dtype=float) for v in (xs, vxs, axs, xe, vxe, axe, T)))
+        self.a0 = xs
+        self.a1 = vxs
+        self.a2 = axs / 2.0
+
+        A = np.stack(
+            [
+                np.stack([T**3, T**4, T**5], axis=-1),
+                np.stack([3 * T**2, 4 * T**3, 5 * T**4], axis=-1),
+                np.stack([6 * T, 12 * T**2, 20 * T**3], axis=-1),
+            ],
+            axis=-2,
+        )
+        b = np.stack(
+            [
+                xe - self.a0 - self.a1 * T - self.a2 * T**2,
+                vxe - self.a1 - 2 * self.a2 * T,
+                axe - 2 * self.a2,
+            ],
+            axis=-1,
+        )
+        x = np.linalg.solve(A, b[..., None])[..., 0]
+
+        self.a3 = x[..., 0]
+        self.a4 = x[..., 1]
+        self.a5 = x[..., 2]
+
+    def _coef(self, name):
+        return getattr(self, name)[..., None]
+
+    def calc_point(self, t):
+        a0, a1, a2, a3, a4, a5 = (self._coef(f"a{i}") for i in range(6))
+        xt = a0 + a1 * t + a2 * t**2 + a3 * t**3 + a4 * t**4 + a5 * t**5
+
+        return xt
+
+    def calc_first_derivative(self, t):
+        a1, a2, a3, a4, a5 = (self._coef(f"a{i}") for i in range(1, 6))
+        xt = a1 + 2 * a2 * t + 3 * a3 * t**2 + 4 * a4 * t**3 + 5 * a5 * t**4
+
+        return xt
+
+    def calc_second_derivative(self, t):
+        a2, a3, a4, a5 = (self._coef(f"a{i}") for i in range(2, 6))
+        xt = 2 * a2 + 6 * a3 * t + 12 * a4 * t**2 + 20 * a5 * t**3
+
+        return xt
+
+    def calc_third_derivative(self, t):
+        a3, a4, a5 = (self._coef(f"a{i}") for i in range(3, 6))
+        xt = 6 * a3 + 24 * a4 * t + 60 * a5 * t**2
+
+        return xt
@@ -0,0 +1,230 @@
+"""
+This module provides a persistent process pool for planning the AOI vehicles in parallel.
+翻译：这个模块提供一个常驻进程池，用于并行规划AOI内的车辆。
+Classes:
+    - PlannerPool:
+        常驻的规划进程池。每个进程持有一份只读的车道（含参考线样条）副本，
+        新出现的车道只发送一次；每步只发送交通灯状态、障碍物数组与各车的紧凑输入。
+Functions:
+    - pack_prediction(prediction):
+        将预测结果压缩为 (车辆ID, 长, 宽, 车道ID, [x, y, s, d, yaw, vel] 数组) 列表。
+    - unpack_obstacles(static_obstacles, packed):
+        由压缩的预测结果重建 DynamicObstacle，顺序与 extract_obstacles 一致。
+
+Notes:
+    进程只生成没有副作用的行驶轨迹（KL、LCL、LCR）。停车轨迹会修改全局的停车车辆栈并发送通信消息，
+    由主进程按车辆顺序生成。
+"""
+
+import atexit
+import multiprocessing
+import os
+import queue
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+import logger
+from common.vehicle import Behaviour, control_Vehicle
+from utils.obstacles import DynamicObstacle, ObsType, Rectangle
+from utils.roadgraph import JunctionLane, RoadGraph
+from utils.trajectory import State
+
+logging = logger.get_logger(__name__)
+
+# 进程返回的状态
+PLAN_OK = "ok"
+PLAN_STOP = "stop" # 需要停车轨迹，交回主进程生成
+PLAN_ERROR = "error"
+
+
+def pack_prediction(prediction) -> List[Tuple]:
+    packed = []
+    for vehicle, states in prediction.results.items():
+        if not states:
+            continue
+        arr = np.array([[state.x, state.y, state.s, state.d, state.yaw, state.vel]
+                        for state in states], dtype=float)
+        packed.append((vehicle.id, vehicle.length, vehicle.width, vehicle.lane_id, arr))
+    return packed
+
+
+def unpack_obstacles(static_obstacles: list, packed: List[Tuple]) -> List[Tuple[str, object]]:
+    """返回 (车辆ID, 障碍物) 列表，静态障碍物的车辆ID为 None"""
+    obs_list = [(None, obs) for obs in static_obstacles]
+    for vehicle_id, length, width, lane_id, arr in packed:
+        states = [State(x=x, y=y, s=s, d=d, yaw=yaw, vel=vel)
+                  for x, y, s, d, yaw, vel in arr.tolist()]
+        dynamic_obs = DynamicObstacle(obstacle_id=vehicle_id,
+                                      shape=Rectangle(length, width),
+                                      obstacle_type=ObsType.CAR,
+                                      current_state=states[0],
+                                      lane_id=lane_id)
+        dynamic_obs.future_trajectory.states.extend(states[1:])
+        obs_list.append((vehicle_id, dynamic_obs))
+    return obs_list
+
+
+def pack_vehicle(vehicle: control_Vehicle, decision_list) -> dict:
+    return {
+        "vehicle_id": vehicle.id,
+        "init_state": vehicle.current_state,
+        "lane_id": vehicle.lane_id,
+        "target_speed": vehicle.target_speed,
+        "behaviour": vehicle.behaviour,
+        "vtype": vehicle.vtype,
+        "length": vehicle.length,
+        "width": vehicle.width,
+        "max_accel": vehicle.max_accel,
+        "max_decel": vehicle.max_decel,
+        "max_speed": vehicle.max_speed,
+        "available_lanes": vehicle.available_lanes,
+        "decision_list": decision_list,
+    }
+
+
+def _worker_main(inbox, results, current_step) -> None:
+    # 在进程内导入，避免与 TSRL_multi_vehicle_planner 循环导入
+    from planner.TSRL_multi_vehicle_planner import MultiVehiclePlanner
+
+    planner = MultiVehiclePlanner()
+    roadgraph = RoadGraph()
+    step_id, T, config, obstacles = -1, 0.0, None, []
+    while True:
+        msg = inbox.get()
+        if msg is None:
+            break
+        kind = msg[0]
+        if kind == "lanes":
+            for lane_id, lane in msg[1].items():
+                if isinstance(lane, JunctionLane):
+                    roadgraph.junction_lanes[lane_id] = lane
+                else:
+                    roadgraph.lanes[lane_id] = lane
+        elif kind == "step":
+            _, step_id, T, config, tl_states, static_obstacles, packed = msg
+            for lane_id, tl_state in tl_states.items():
+                lane = roadgraph.junction_lanes.get(lane_id)
+                if lane is not None:
+                    lane.currTlState = tl_state
+            obstacles = unpack_obstacles(static_obstacles, packed)
+        elif kind == "plan":
+            _, task_step, task = msg
+            # 主进程已进入下一步时跳过过期的任务
+            if task_step != step_id or task_step < current_step.value:
+                continue
+            vehicle_id = task["vehicle_id"]
+            try:
+                status, payload = _plan_vehicle(planner, roadgraph, T, config, obstacles, task)
+            except Exception as e:
+                status, payload = PLAN_ERROR, repr(e)
+            results.put((task_step, vehicle_id, status, payload))
+
+
+def _plan_vehicle(planner, roadgraph: RoadGraph, T, config, obstacles, task: dict):
+    task = dict(task)
+    decision_list = task.pop("decision_list")
+    vehicle = control_Vehicle(**task)
+    obs_list = [obs for owner, obs in obstacles if owner != vehicle.id]
+    current_lane = roadgraph.get_lane_by_id(vehicle.lane_id)
+    next_lane = roadgraph.get_available_next_lane(current_lane.id, vehicle.available_lanes)
+    lanes = [current_lane, next_lane] if next_lane != None else [current_lane]
+    if planner.need_stop_path(vehicle, current_lane, next_lane, obs_list):
+        return PLAN_STOP, None
+    return PLAN_OK, planner.moving_trajectory(
+        roadgraph, T, config, vehicle, current_lane, lanes, obs_list, decision_list)
+
+
+class PlannerPool:
+    """
+    常驻的规划进程池，按车辆在观测中的顺序返回结果。
+
+    Attributes:
+        num_workers (int): 进程数
+        sent_lanes (set): 已发送给进程的车道ID
+    """
+    # 由进程生成轨迹的行为，其余行为使用停车轨迹
+    MOVING_BEHAVIOURS = (Behaviour.KL, Behaviour.LCL, Behaviour.LCR)
+
+    def __init__(self, num_workers: int) -> None:
+        ctx = multiprocessing.get_context('spawn')
+        self.num_workers = num_workers
+        self.results = ctx.Queue()
+        self.current_step = ctx.Value('q', -1, lock=False)
+        self.inboxes = [ctx.Queue() for _ in range(num_workers)]
+        self.workers = [
+            ctx.Process(target=_worker_main, args=(inbox, self.results, self.current_step),
+                        daemon=True, name=f"planner-{i}")
+            for i, inbox in enumerate(self.inboxes)
+        ]
+        for worker in self.workers:
+            worker.start()
+        self.sent_lanes = set()
+        self.step_id = -1
+        self.pending = 0
+        atexit.register(self.close)
+
+    @classmethod
+    def create(cls, config) -> Optional["PlannerPool"]:
+        """按配置创建进程池，在守护进程中（例如批量运行的子进程）无法创建子进程，返回 None"""
+        if multiprocessing.current_process().daemon:
+            logging.warning("Parallel planning is unavailable in a daemon process, planning sequentially")
+            return None
+        num_workers = config.get("PLANNING_WORKERS") or max((os.cpu_count() or 2) - 1, 1)
+        logging.info(f"Starting {num_workers} planning workers")
+        return cls(num_workers)
+
+    def is_alive(self) -> bool:
+        return all(worker.is_alive() for worker in self.workers)
+
+    def start_step(self, roadgraph: RoadGraph, T, config, static_obstacles, prediction) -> None:
+        """发送新出现的车道与本步的公共输入"""
+        self.step_id += 1
+        self.current_step.value = self.step_id
+        self.pending = 0
+        new_lanes = {}
+        for lanes in (roadgraph.lanes, roadgraph.junction_lanes):
+            for lane_id, lane in lanes.items():
+                if lane_id not in self.sent_lanes and lane.course_spline is not None:
+                    new_lanes[lane_id] = lane
+        self.sent_lanes.update(new_lanes)
+        tl_states = {lane_id: lane.currTlState
+                     for lane_id, lane in roadgraph.junction_lanes.items()}
+        step_msg = ("step", self.step_id, T, config, tl_states,
+                    list(static_obstacles), pack_prediction(prediction))
+        for inbox in self.inboxes:
+            if new_lanes:
+                inbox.put(("lanes", new_lanes))
+            inbox.put(step_msg)
+
+    def submit(self, vehicle: control_Vehicle, decision_list) -> None:
+        inbox = self.inboxes[self.pending % self.num_workers]
+        inbox.put(("plan", self.step_id, pack_vehicle(vehicle, decision_list)))
+        self.pending += 1
+
+    def collect(self, deadline: float) -> Dict[str, Tuple[str, object]]:
+        """等待本步的结果直到 deadline（time.time() 时刻），返回 车辆ID -> (状态, 轨迹或错误信息)"""
+        results = {}
+        while len(results) < self.pending:
+            timeout = deadline - time.time()
+            if timeout <= 0:
+                break
+            try:
+                step_id, vehicle_id, status, payload = self.results.get(timeout=timeout)
+            except queue.Empty:
+                break
+            if step_id == self.step_id:
+                results[vehicle_id] = (status, payload)
+        return results
+
+    def close(self) -> None:
+        if not self.workers:
+            return
+        for inbox in self.inboxes:
+            inbox.put(None)
+        for worker in self.workers:
+            worker.join(timeout=1.0)
+            if worker.is_alive():
+                worker.terminate()
+        self.workers = []
@@ -12,14 +12,15 @@ from typing import List
 import numpy as np
 
 from common.vehicle import control_Vehicle, Behaviour
-from common import cost
+from common import cost, obstacle_cost
 from TSRL_interaction.vehicle_communication import Performative
 
 from utils.roadgraph import AbstractLane, JunctionLane, RoadGraph,NormalLane
 from utils.obstacles import ObsType, Obstacle
-from utils.trajectory import State, Trajectory
+from utils.trajectory import State, Trajectory, lanes_frenet_to_cartesian
 
 from trafficManager.planner.frenet_optimal_planner import frenet_optimal_planner
+from trafficManager.planner.frenet_optimal_planner.polynomial_curve import QuinticPolynomialBatch
 from trafficManager.decision_maker.abstract_decision_maker import SingleStepDecision
 
 import logger
@@ -52,6 +53,92 @@ def check_path(vehicle, path):
     else:
         return True
 
+# 批量生成并评估变道候选路径
+def batch_lanechange_path(vehicle: control_Vehicle, target_lane: AbstractLane,
+                          state_in_target_lane: State, sample_t, sample_s,
+                          sample_vel, target_vel, obs_list, config):
+    """
+    与 lanechange_trajectory_generator 的逐条循环等价的批量版本：
+        - 同一采样时间下全部 (s, s_d) 目标状态的五次多项式系数一次求解
+        - 全部候选路径在共享时间网格上求值，得到 (路径数, 时间步数) 的矩阵
+        - 平滑度、速度差、引导、加速度、加加速度与变道成本按矩阵规约计算
+        - 障碍物碰撞对全部候选路径批量检测，其余障碍物成本逐条计算，
+          配置 LC_OBS_TOP_K 时只对其余成本最低的K条计算
+    返回最优路径与其成本，未找到时返回 (None, inf)
+    """
+    dt = config["DT"]
+    weights = config["weights"]
+    top_k = config.get("LC_OBS_TOP_K")
+    csp = target_lane.course_spline
+    best_path = None
+    best_cost = math.inf
+    for T_sample in sample_t:
+        t = np.arange(0.0, T_sample * 1.01, dt)
+        # 与循环版本相同的顺序：纵向位置在外层、速度在内层
+        target_s, target_s_d = (a.ravel() for a in np.meshgrid(
+            sample_s, sample_vel, indexing="ij"))
+        lon_qp = QuinticPolynomialBatch(
+            state_in_target_lane.s, state_in_target_lane.s_d,
+            state_in_target_lane.s_dd, target_s, target_s_d, 0.0, T_sample)
+        # 目标横向位置均为0，所有候选路径共用同一条横向曲线
+        lat_qp = QuinticPolynomialBatch(
+            state_in_target_lane.d, state_in_target_lane.d_d,
+            state_in_target_lane.d_dd, 0.0, 0.0, 0.0, T_sample)
+        s = lon_qp.calc_point(t)
+        shape = s.shape
+        s_d = lon_qp.calc_first_derivative(t)
+        s_dd = lon_qp.calc_second_derivative(t)
+        s_ddd = lon_qp.calc_third_derivative(t)
+        d, d_d, d_dd, d_ddd = (np.broadcast_to(v, shape) for v in (
+            lat_qp.calc_point(t), lat_qp.calc_first_derivative(t),
+            lat_qp.calc_second_derivative(t), lat_qp.calc_third_derivative(t)))
+        tt = np.broadcast_to(t, shape)
+
+        columns, keep, valid, laneIDs = lanes_frenet_to_cartesian(
+            target_lane, tt, s, s_d, d, d_d, vehicle.current_state)
+        if laneIDs is None:
+            break
+        mask = np.arange(shape[1]) < keep[:, None]
+        costs = (
+            cost.smoothness_many(s, columns["yaw"], columns["cur"],
+                                 columns["laneIdx"], mask, csp, weights) * dt +
+            cost.vel_diff_many(columns["vel"], target_vel, mask, weights) * dt +
+            cost.guidance_many(d, mask, weights) * dt +
+            cost.acc_many(columns["acc"], mask, weights) * dt +
+            cost.jerk_many(s_ddd, d_ddd, mask, weights) * dt)
+
+        # 可行性过滤与 top-k 选择
+        candidates = np.flatnonzero(valid & np.isfinite(costs))
+        if top_k and candidates.size > top_k:
+            candidates = candidates[np.argpartition(costs[candidates], top_k - 1)[:top_k]]
+            candidates.sort()
+        if not obs_list and candidates.size:
+            candidates = candidates[[np.argmin(costs[candidates])]]
+        elif candidates.size:
+            # 与障碍物碰撞的候选路径障碍物成本为 inf，不会被选中，批量检测后直接剔除
+            sampled = [np.where(mask, columns[key], np.nan)[candidates, ::2]
+                       for key in ("x", "y", "yaw", "vel")]
+            candidates = candidates[~obstacle_cost.collision_many(
+                vehicle, *sampled, obs_list, config)]
+
+        fields = {"t": tt, "s": s, "s_d": columns["s_d"], "s_dd": s_dd,
+                  "s_ddd": s_ddd, "d": d, "d_d": d_d, "d_dd": d_dd, "d_ddd": d_ddd,
+                  "x": columns["x"], "y": columns["y"], "yaw": columns["yaw"],
+                  "cur": columns["cur"], "vel": columns["vel"], "acc": columns["acc"]}
+        for i in candidates:
+            m = keep[i]
+            values = {key: array[i, :m].tolist() for key, array in fields.items()}
+            lane_ids = [laneIDs[k] for k in columns["laneIdx"][i, :m].tolist()]
+            path = Trajectory([
+                State(laneID=lane_ids[j], **{key: value[j] for key, value in values.items()})
+                for j in range(m)])
+            path.cost = (costs[i] + cost.obs(vehicle, path, obs_list, config) +
+                         cost.changelane(weights))
+            if path.cost < best_cost:
+                best_cost = path.cost
+                best_path = path
+    return best_path, best_cost
+
 # 车道变换轨迹生成器
 def lanechange_trajectory_generator(
     vehicle: control_Vehicle,
@@ -118,43 +205,55 @@ def lanechange_trajectory_generator(
     best_path = None
     best_cost = math.inf
     
-    # 遍历所有采样组合（时间、纵向位置、速度）来寻找最优路径
-    for t in sample_t:  # 遍历采样时间
-        for s in sample_s:  # 遍历纵向位置采样点
-            for s_d in sample_vel:  # 遍历速度采样点
-                # 定义目标状态（时间、纵向位置、横向位置为0、纵向速度）
-                target_state = State(t=t, s=s, d=0, s_d=s_d)
-                
-                # 使用Frenet最优规划器计算特定路径
-                path = frenet_optimal_planner.calc_spec_path(
-                    state_in_target_lane, target_state, target_state.t, dt)
-                
-                # 如果路径为空，跳过
-                if not path.states:
-                    continue
-                
-                # 将路径从Frenet坐标系转换为笛卡尔坐标系
-                path.frenet_to_cartesian(target_lane, vehicle.current_state)
-                
-                # 计算路径的综合成本（多维度评估）
-                path.cost = (
-                    cost.smoothness(path, target_lane.course_spline,  # 平滑度成本
-                                    config["weights"]) * dt +
-                    cost.vel_diff(path, target_vel, config["weights"]) * dt +  # 速度差异成本
-                    cost.guidance(path, config["weights"]) * dt +  # 引导成本
-                    cost.acc(path, config["weights"]) * dt +  # 加速度成本
-                    cost.jerk(path, config["weights"]) * dt +  # 加加速度成本
-                    cost.obs(vehicle, path, obs_list, config) +  # 障碍物避让成本
-                    cost.changelane(config["weights"]))  # 变道成本
-                
-                # 检查路径是否满足非完整约束（车辆运动学约束）
-                if not path.is_nonholonomic():
-                    continue
-                
-                # 如果当前路径成本更低，更新最优路径
-                if path.cost < best_cost:
-                    best_cost = path.cost
-                    best_path = path
+    if config.get("BATCH_LANE_CHANGE", False):
+        # 批量模式：全部候选路径以矩阵形式求解、转换与评估
+        best_path, best_cost = batch_lanechange_path(
+            vehicle, target_lane, state_in_target_lane, sample_t, sample_s,
+            sample_vel, target_vel, obs_list, config)
+    else:
+        # 遍历所有采样组合（时间、纵向位置、速度）生成候选路径
+        candidates = []
+        for t in sample_t:  # 遍历采样时间
+            for s in sample_s:  # 遍历纵向位置采样点
+                for s_d in sample_vel:  # 遍历速度采样点
+                    # 定义目标状态（时间、纵向位置、横向位置为0、纵向速度）
+                    target_state = State(t=t, s=s, d=0, s_d=s_d)
+                    
+                    # 使用Frenet最优规划器计算特定路径
+                    path = frenet_optimal_planner.calc_spec_path(
+                        state_in_target_lane, target_state, target_state.t, dt)
+                    
+                    # 如果路径为空，跳过
+                    if not path.states:
+                        continue
+                    candidates.append(path)
+
+        # 将候选路径批量从Frenet坐标系转换为笛卡尔坐标系，转换失败的路径直接丢弃
+        valid = Trajectory.batch_frenet_to_cartesian(candidates, target_lane,
+                                                     vehicle.current_state)
+        for path, ok in zip(candidates, valid):
+            if not ok:
+                continue
+            
+            # 计算路径的综合成本（多维度评估）
+            path.cost = (
+                cost.smoothness(path, target_lane.course_spline,  # 平滑度成本
+                                config["weights"]) * dt +
+                cost.vel_diff(path, target_vel, config["weights"]) * dt +  # 速度差异成本
+                cost.guidance(path, config["weights"]) * dt +  # 引导成本
+                cost.acc(path, config["weights"]) * dt +  # 加速度成本
+                cost.jerk(path, config["weights"]) * dt +  # 加加速度成本
+                cost.obs(vehicle, path, obs_list, config) +  # 障碍物避让成本
+                cost.changelane(config["weights"]))  # 变道成本
+            
+            # 检查路径是否满足非完整约束（车辆运动学约束）
+            if not path.is_nonholonomic():
+                continue
+            
+            # 如果当前路径成本更低，更新最优路径
+            if path.cost < best_cost:
+                best_cost = path.cost
+                best_path = path
 
     # 如果找到有效路径，返回最优路径
     if best_path is not None:
@@ -772,6 +871,7 @@ def stop_trajectory_generator(vehicle: control_Vehicle,
             sample_stop_t = np.linspace(0.5, 2.0, 4)
         best_path = None
         best_cost = math.inf
+        candidates = []
         for d in sample_d:
             for stop_t in sample_stop_t:
                 target_state = State(s=min_s, s_d=0, d=d)
@@ -783,16 +883,20 @@ def stop_trajectory_generator(vehicle: control_Vehicle,
                 while len(path.states) < course_t / dt:
                     t += dt
                     path.states.append(State(t=t, s=s, d=d))
+                candidates.append(path)
 
-                path.frenet_to_cartesian(lanes, current_state)
-                path.cost = (cost.smoothness(path, lanes[0].course_spline,
-                                            config["weights"]) * dt +
-                            cost.guidance(path, config["weights"]) * dt +
-                            cost.jerk(path, config["weights"]) * dt +
-                            cost.stop(config["weights"]))
-                if path.cost < best_cost:
-                    best_cost = path.cost
-                    best_path = path
+        valid = Trajectory.batch_frenet_to_cartesian(candidates, lanes, current_state)
+        for path, ok in zip(candidates, valid):
+            if not ok:
+                continue
+            path.cost = (cost.smoothness(path, lanes[0].course_spline,
+                                        config["weights"]) * dt +
+                        cost.guidance(path, config["weights"]) * dt +
+                        cost.jerk(path, config["weights"]) * dt +
+                        cost.stop(config["weights"]))
+            if path.cost < best_cost:
+                best_cost = path.cost
+                best_path = path
     """
     step 5：如果所有路径都不合适，返回一个默认的紧急停车轨迹
     """
@@ -890,8 +994,10 @@ def lanekeeping_trajectory_generator(vehicle: control_Vehicle,
     best_path = None
     best_cost = math.inf
     if center_paths is not None:
-        for path in center_paths:
-            path.frenet_to_cartesian(lanes, current_state)
+        valid = Trajectory.batch_frenet_to_cartesian(center_paths, lanes, current_state)
+        for path, ok in zip(center_paths, valid):
+            if not ok:
+                continue
             path.cost = (
                 cost.smoothness(path, lanes[0].course_spline, config["weights"])
                 * dt + cost.vel_diff(path, target_vel, config["weights"]) * dt +
@@ -912,8 +1018,10 @@ def lanekeeping_trajectory_generator(vehicle: control_Vehicle,
                                                      config)
     best_cost = math.inf
     if paths is not None:
-        for path in paths:
-            path.frenet_to_cartesian(lanes, current_state)
+        valid = Trajectory.batch_frenet_to_cartesian(paths, lanes, current_state)
+        for path, ok in zip(paths, valid):
+            if not ok:
+                continue
             path.cost = (
                 cost.smoothness(path, lanes[0].course_spline, config["weights"])
                 * dt + cost.vel_diff(path, target_vel, config["weights"]) * dt +
@@ -988,8 +1096,10 @@ def decision_trajectory_generator(
         offset_frame = len(fullpath.states)
         best_path = None
         best_cost = math.inf
-        for path in seg_paths:
-            path.frenet_to_cartesian(lanes, current_state)
+        valid = Trajectory.batch_frenet_to_cartesian(seg_paths, lanes, current_state)
+        for path, ok in zip(seg_paths, valid):
+            if not ok:
+                continue
             path.cost = (
                 cost.smoothness(path, lanes[0].course_spline, config["weights"]) * dt
                 + cost.vel_diff(path, vehicle.target_speed, config["weights"]) * dt
@@ -0,0 +1,93 @@
+"""
+测试配置覆盖项（Batch_Scenarios_Runner 的 --set）能够传到交通管理器与规划器
+功能：
+1. run_model 把覆盖后的配置同时传给 Model 与 TrafficManager，TrafficManager 不再重新读取 config.yaml
+2. TrafficManager 在决策与规划时使用的 self.config 即为传入的配置
+用法: python -m pytest trafficManager/test_config_overrides.py 或 python trafficManager/test_config_overrides.py
+"""
+import os
+import sys
+import types
+from unittest import mock
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, PROJECT_ROOT)
+# Classic_Scenarios_Selection 按相对路径读取 loc_config.yaml
+os.chdir(PROJECT_ROOT)
+
+import trafficManager  # 将 trafficManager 目录加入 sys.path
+from trafficManager.traffic_manager import TrafficManager
+from utils.load_config import load_config
+
+CONFIG_FILE = os.path.join(PROJECT_ROOT, "trafficManager", "config.yaml")
+OVERRIDES = {"DECISION_INTERVAL": 7, "BATCH_LANE_CHANGE": False, "LC_OBS_TOP_K": 4}
+
+
+def make_model():
+    """只含 TrafficManager 初始化时用到的属性的模型"""
+    return types.SimpleNamespace(headless=True, sim_mode="Replay", communication=False,
+                                 Scenario_Name="test_config_overrides", rouFile=None)
+
+
+def make_traffic_manager(config):
+    # 传入各模块，避免创建消息日志与规划进程
+    return TrafficManager(make_model(), predictor=object(), ego_decision=object(),
+                          ego_planner=object(), multi_decision=object(),
+                          multi_veh_planner=object(), config=config)
+
+
+def test_traffic_manager_uses_given_config():
+    config = load_config(CONFIG_FILE)
+    config.update(OVERRIDES)
+    traffic_manager = make_traffic_manager(config)
+    assert traffic_manager.config is config
+    for key, value in OVERRIDES.items():
+        assert traffic_manager.config[key] == value
+    assert traffic_manager.last_decision_time == -OVERRIDES["DECISION_INTERVAL"]
+
+
+def test_run_model_passes_overrides_to_traffic_manager():
+    import Classic_Scenarios_Selection as css
+
+    received = {}
+
+    def fake_traffic_manager(model, config=None):
+        received["config"] = config
+        return make_traffic_manager(config)
+
+    model = mock.MagicMock(tpEnd=True, timeStep=0)
+    with mock.patch.object(css, "Model", return_value=model) as model_cls, \
+            mock.patch.object(css, "TrafficManager", side_effect=fake_traffic_manager), \
+            mock.patch.object(css.traci, "close"), \
+            mock.patch.dict(css.loc_config, {"LOC_CONFIG": CONFIG_FILE}):
+        css.run_model("test_config_overrides", "net.xml", "rou.xml", None, "0",
+                      headless=True, config_overrides=OVERRIDES)
+
+    config = received["config"]
+    assert config is model_cls.call_args.kwargs["config"]
+    for key, value in OVERRIDES.items():
+        assert config[key] == value
+
+
+def test_run_model_reraises_setup_error():
+    """model.start() 推进了仿真时钟后初始化出错，抛出的是原异常而不是 UnboundLocalError"""
+    import Classic_Scenarios_Selection as css
+
+    model = mock.MagicMock(tpEnd=True, timeStep=1)
+    with mock.patch.object(css, "Model", return_value=model), \
+            mock.patch.object(css, "TrafficManager", side_effect=ValueError("setup failed")), \
+            mock.patch.object(css.traci, "close"), \
+            mock.patch.dict(css.loc_config, {"LOC_CONFIG": CONFIG_FILE}):
+        try:
+            css.run_model("test_config_overrides", "net.xml", "rou.xml", None, "0", headless=True)
+        except ValueError as e:
+            assert str(e) == "setup failed"
+        else:
+            raise AssertionError("run_model did not re-raise the setup error")
+
+
+if __name__ == "__main__":
+    test_traffic_manager_uses_given_config()
+    test_run_model_passes_overrides_to_traffic_manager()
+    test_run_model_reraises_setup_error()
+    print("ok")
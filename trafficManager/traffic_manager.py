@@ -10,7 +10,6 @@ import copy
 import time
 import os
 from typing import Dict, List, Union
-from pynput import keyboard
 
 # 7.26 导入read_stop_info.py中的函数
 from read_stop_info import extract_stop_info
@@ -36,8 +35,7 @@ from trafficManager.predictor.abstract_predictor import AbstractPredictor
 from utils.load_config import load_config
 from utils.obstacles import StaticObstacle
 from utils.roadgraph import AbstractLane, JunctionLane, NormalLane, RoadGraph
-from utils import data_copy
-from utils.trajectory import State, Trajectory
+from utils.trajectory import ArrayTrajectory, State
 
 import logger
 
@@ -57,7 +55,8 @@ class TrafficManager:
         sumo_model: The SUMO traffic simulation model.
         T: The current simulation time.
         lastseen_vehicles: A dictionary containing the last seen state of each vehicle.
-        config: The configuration dictionary.
+        config: The configuration dictionary. It is loaded from config_file_path unless a config
+                dictionary (e.g. config.yaml with command line overrides) is given.
         predictor: An instance of the UncontrolledPredictor class.
         ego_decision: An instance of the EgoDecisionMaker class.
         ego_planner: An instance of the EgoPlanner class.
@@ -71,21 +70,28 @@ class TrafficManager:
                  ego_planner: AbstractEgoPlanner = None,
                  multi_decision=None,
                  multi_veh_planner: AbstractMultiPlanner = None,
-                 config_file_path=None):
+                 config_file_path=None,
+                 config: dict = None):
         self.sumo_model = model
         self.time_step = 0
         self.lastseen_vehicles = {} # 上一帧的车辆信息
         self.lastseen_facilities = {} # 上一帧的设施(RSU)信息
         # 9.15 初始化RSU查询记录集合
         self.queried_rsus = set() # 记录已发送询问消息的RSU
-        # 如果未提供配置文件路径，使用相对于当前文件的路径
-        if config_file_path is None:
-            current_dir = os.path.dirname(os.path.abspath(__file__))
-            config_file_path = os.path.join(current_dir, "config.yaml")
-        self.config = load_config(config_file_path) # 交通管理配置文件
+        if config is not None:
+            # 调用方已加载并覆盖过的配置（例如批量运行的 --set），与 Model 使用同一份
+            self.config = config
+        else:
+            # 如果未提供配置文件路径，使用相对于当前文件的路径
+            if config_file_path is None:
+                current_dir = os.path.dirname(os.path.abspath(__file__))
+                config_file_path = os.path.join(current_dir, "config.yaml")
+            self.config = load_config(config_file_path) # 交通管理配置文件
         self.last_decision_time = -self.config["DECISION_INTERVAL"]
         self.mul_decisions =None
-        self._set_up_keyboard_listener()
+        # 无界面模式下没有显示设备，不监听键盘
+        if not getattr(self.sumo_model, 'headless', False):
+            self._set_up_keyboard_listener()
         # 7.26 需停止车辆字典的初始化
         self.vehicles_with_stops = {}
         # 7.26 提取停车信息
@@ -94,7 +100,8 @@ class TrafficManager:
         # 8.18 承接使用模型的通信管理器控制参数,并控制是否开启通信功能
         self.if_traffic_communication = model.communication
         if self.if_traffic_communication:
-            self.communication_manager = CommunicationManager(self.sumo_model.Scenario_Name)
+            self.communication_manager = CommunicationManager(self.sumo_model.Scenario_Name,
+                                                              comm_radius=self.config.get("COMM_RADIUS"))
             # 初始化环境通信器，用于发送交叉口信息
             self.env_adapter = EnvironmentAdapter(self.sumo_model)
             self.env_communicator = EnvCommunicator(
@@ -122,6 +129,7 @@ class TrafficManager:
 
     # 从键盘中获取用户的输入
     def _set_up_keyboard_listener(self):
+        from pynput import keyboard
 
         def on_press(key):
             """
@@ -156,7 +164,7 @@ class TrafficManager:
         logging.info(f"Received user command: {user_input}")
     
     def plan(self, T: float, roadgraph: RoadGraph,
-             vehicles_info: dict, facilities: dict) -> Dict[int, Trajectory]:
+             vehicles_info: dict, facilities: dict) -> Dict[int, ArrayTrajectory]:
         """
         This function plans the trajectories of vehicles in a given roadgraph. 
         It takes in the total time T, the roadgraph, and the vehicles_info as parameters. 
@@ -184,6 +192,11 @@ class TrafficManager:
         # 8.19 新增提取车辆信息方法，添加通信信息提取方法，并将vehicle类更改为control_Vehicle
         vehicles = self.extract_vehicles(vehicles_info, roadgraph, T,
                                          through_timestep, self.sumo_model.sim_mode)
+        # 通信半径内的投递依赖各接收者的当前位置，每步刷新全部车辆的位置
+        if self.if_traffic_communication:
+            self.communication_manager.update_positions(
+                {vehicle_id: (vehicle.current_state.x, vehicle.current_state.y)
+                 for vehicle_id, vehicle in vehicles.items() if vehicle is not None})
         # 9.12 提取道路设备信息
         facilities = self.extract_facilities(facilities, roadgraph)
         # 9.16 处理RSU与Ego车辆的交互
@@ -294,15 +307,17 @@ class TrafficManager:
             self.lastseen_vehicles[vehicle_id].trajectory = trajectory
             # 检查trajectory是否为None，避免AttributeError
             if trajectory is not None:
-                output_trajectories[vehicle_id] = data_copy.deepcopy(trajectory)
                 # 检查states列表是否为空，避免索引越界
-                if hasattr(output_trajectories[vehicle_id], 'states') and len(output_trajectories[vehicle_id].states) > 0:
-                    del output_trajectories[vehicle_id].states[0]
+                if hasattr(trajectory, 'states') and len(trajectory.states) > 0:
+                    # 去掉第一个状态（当前状态），其余状态复制到列式轨迹中交给仿真模型逐步弹出
+                    output_trajectories[vehicle_id] = ArrayTrajectory.from_states(
+                        trajectory.states[1:], trajectory.cost)
                 else:
                     logging.warning(f"Vehicle {vehicle_id} has empty trajectory states or no states attribute")
+                    output_trajectories[vehicle_id] = ArrayTrajectory.from_states([])
             else:
                 logging.warning(f"Vehicle {vehicle_id} has None trajectory, skipping")
-                output_trajectories[vehicle_id] = Trajectory()  # 创建空轨迹作为默认值
+                output_trajectories[vehicle_id] = ArrayTrajectory.from_states([])  # 创建空轨迹作为默认值
 
         # update self.T
         self.time_step = current_time_step
@@ -5,6 +5,39 @@ from typing import Tuple
 import numpy as np
 
 
+def solve_tridiagonal(lower: np.ndarray, diag: np.ndarray, upper: np.ndarray,
+                      rhs: np.ndarray) -> np.ndarray:
+    """Solve a tridiagonal linear system with the Thomas algorithm, O(n).
+
+    Args:
+        lower (np.ndarray): sub-diagonal, size n-1
+        diag (np.ndarray): main diagonal, size n
+        upper (np.ndarray): super-diagonal, size n-1
+        rhs (np.ndarray): right hand side, size n
+
+    Returns:
+        np.ndarray: solution x of A x = rhs
+
+    Remark:
+        No pivoting is done, the matrix should be diagonally dominant,
+        which is always the case for the natural spline system.
+    """
+    n = diag.size
+    c_prime = np.empty(n)
+    d_prime = np.empty(n)
+    c_prime[0] = upper[0] / diag[0] if n > 1 else 0.0
+    d_prime[0] = rhs[0] / diag[0]
+    for i in range(1, n):
+        denom = diag[i] - lower[i - 1] * c_prime[i - 1]
+        if i < n - 1:
+            c_prime[i] = upper[i] / denom
+        d_prime[i] = (rhs[i] - lower[i - 1] * d_prime[i - 1]) / denom
+    x = np.empty(n)
+    x[-1] = d_prime[-1]
+    for i in range(n - 2, -1, -1):
+        x[i] = d_prime[i] - c_prime[i] * x[i + 1]
+    return x
+
 
 class Spline:
     """Use natural spline to construct the curve with a given list a points
@@ -15,17 +48,17 @@ class Spline:
         self.x_list = x_list
         n: int = x_list.size
         h = np.diff(x_list)
+        y_list = np.asarray(y_list, dtype=float)
 
-        main_diag = np.ones(n)
-        main_diag[1:-1] = 2 * (h[1:] + h[:-1])
-        A = np.diag(main_diag) + np.diag(h, k=1) + np.diag(h, k=-1)
-        A[0, 1] = 0
-        A[-1, -2] = 0
+        # The natural spline system is tridiagonal: c[0] = c[n-1] = 0 and
+        # h[i-1] * c[i-1] + 2 * (h[i-1] + h[i]) * c[i] + h[i] * c[i+1] = b[i]
         b = np.zeros(n)
         b[1:-1] = 3 * (np.divide(np.diff(y_list[1:]), h[1:]) -
                        np.divide(np.diff(y_list[:-1]), h[:-1]))
-
-        self.c = np.linalg.solve(A, b)
+        self.c = np.zeros(n)
+        if n > 2:
+            self.c[1:-1] = solve_tridiagonal(h[1:-1], 2 * (h[1:] + h[:-1]),
+                                             h[1:-1], b[1:-1])
         self.a = y_list
         self.d = np.divide(np.diff(self.c), 3 * h)
         self.b = np.divide(np.diff(self.a),
@@ -103,6 +136,167 @@ class Spline:
         index = max(min(index, self.x_list.size - 2), 0)
         return 6.0 * self.d[index]
 
+    def _segment_index(self, pos_x: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Vectorized version of the bisect lookup used by the scalar methods.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: segment index and dx of every x
+        """
+        pos_x = np.asarray(pos_x, dtype=float)
+        index = np.searchsorted(self.x_list, pos_x, side='right') - 1
+        index = np.clip(index, 0, self.x_list.size - 2)
+        return index, pos_x - self.x_list[index]
+
+    def calculate_approximation_many(self, pos_x: np.ndarray) -> np.ndarray:
+        """Array version of calculate_approximation.
+
+        Args:
+            pos_x (np.ndarray): x coordinates
+
+        Returns:
+            np.ndarray: approximated y coordinates
+        """
+        index, dx = self._segment_index(pos_x)
+        return self.a[index] + self.b[index] * dx + \
+               self.c[index] * dx**2.0 + self.d[index] * dx**3.0
+
+    def calculate_derivative_many(self, pos_x: np.ndarray) -> np.ndarray:
+        """Array version of calculate_derivative.
+
+        Args:
+            pos_x (np.ndarray): x coordinates
+
+        Returns:
+            np.ndarray: approximated dy/dx at every x
+        """
+        index, dx = self._segment_index(pos_x)
+        return self.b[index] + 2.0 * self.c[index] * dx + 3.0 * self.d[index] * dx**2.0
+
+    def calculate_second_derivative_many(self, pos_x: np.ndarray) -> np.ndarray:
+        """Array version of calculate_second_derivative.
+
+        Args:
+            pos_x (np.ndarray): x coordinates
+
+        Returns:
+            np.ndarray: approximated d^2y/dx^2 at every x
+        """
+        index, dx = self._segment_index(pos_x)
+        return 2.0 * self.c[index] + 6.0 * self.d[index] * dx
+
+    def calculate_third_derivative_many(self, pos_x: np.ndarray) -> np.ndarray:
+        """Array version of calculate_third_derivative.
+
+        Args:
+            pos_x (np.ndarray): x coordinates
+
+        Returns:
+            np.ndarray: approximated d^3y/dx^3 at every x
+        """
+        index, _ = self._segment_index(pos_x)
+        return 6.0 * self.d[index]
+
+
+class SegmentIndex:
+    """A polyline sampled along a Spline2D, with a uniform grid of buckets over
+       its segments, used to find the closest segment of a point quickly.
+    """
+    SEGMENT_STEP = 1.0  # arc length between two polyline points [m]
+    CELL_SIZE = 5.0  # grid cell size [m]
+    MAX_RINGS = 20  # farther points are matched against all segments
+    DENSE_LIMIT = 2_000_000  # max points * segments for a dense batch query
+
+    def __init__(self, s: np.ndarray, x: np.ndarray, y: np.ndarray) -> None:
+        """
+        Args:
+            s (np.ndarray): arc length of the polyline points
+            x (np.ndarray): x coordinates of the polyline points
+            y (np.ndarray): y coordinates of the polyline points
+        """
+        self.s = s
+        self.ax, self.ay = x[:-1], y[:-1]
+        self.vx, self.vy = np.diff(x), np.diff(y)
+        self.len2 = np.maximum(self.vx**2 + self.vy**2, 1e-12)
+
+        self.cells: dict[tuple[int, int], np.ndarray] = {}
+        buckets: dict[tuple[int, int], list[int]] = {}
+        ci = np.floor(x / self.CELL_SIZE).astype(int)
+        cj = np.floor(y / self.CELL_SIZE).astype(int)
+        for k in range(self.ax.size):
+            for i in range(min(ci[k], ci[k + 1]), max(ci[k], ci[k + 1]) + 1):
+                for j in range(min(cj[k], cj[k + 1]), max(cj[k], cj[k + 1]) + 1):
+                    buckets.setdefault((i, j), []).append(k)
+        for cell, segs in buckets.items():
+            self.cells[cell] = np.array(segs)
+        self.imin, self.imax = ci.min(), ci.max()
+        self.jmin, self.jmax = cj.min(), cj.max()
+
+    def _closest_on_segments(self, segs: np.ndarray, px: float,
+                             py: float) -> Tuple[np.ndarray, np.ndarray]:
+        t = ((px - self.ax[segs]) * self.vx[segs] +
+             (py - self.ay[segs]) * self.vy[segs]) / self.len2[segs]
+        t = np.clip(t, 0.0, 1.0)
+        ex = self.ax[segs] + t * self.vx[segs] - px
+        ey = self.ay[segs] + t * self.vy[segs] - py
+        return ex * ex + ey * ey, t
+
+    def nearest(self, px: float, py: float) -> Tuple[int, float]:
+        """Closest segment of one point, searching the grid ring by ring.
+
+        Returns:
+            Tuple[int, float]: segment index and the position on it in [0, 1]
+        """
+        ci = int(math.floor(px / self.CELL_SIZE))
+        cj = int(math.floor(py / self.CELL_SIZE))
+        max_ring = max(abs(ci - self.imin), abs(ci - self.imax),
+                       abs(cj - self.jmin), abs(cj - self.jmax))
+        if max_ring > self.MAX_RINGS:
+            dist2, t = self._closest_on_segments(
+                np.arange(self.ax.size), px, py)
+            k = int(np.argmin(dist2))
+            return k, float(t[k])
+
+        best_dist2, best_seg, best_t = math.inf, 0, 0.0
+        for r in range(max_ring + 1):
+            if r == 0:
+                ring = [(ci, cj)]
+            else:
+                ring = [(ci + di, cj + dj)
+                        for di in range(-r, r + 1) for dj in (-r, r)]
+                ring += [(ci + di, cj + dj)
+                         for di in (-r, r) for dj in range(-r + 1, r)]
+            segs = [self.cells[c] for c in ring if c in self.cells]
+            if segs:
+                segs = np.unique(np.concatenate(segs))
+                dist2, t = self._closest_on_segments(segs, px, py)
+                k = int(np.argmin(dist2))
+                if dist2[k] < best_dist2:
+                    best_dist2, best_seg, best_t = dist2[k], int(segs[k]), float(t[k])
+            # 第 r 圈之外的线段与该点的距离不小于 r 个网格
+            if best_dist2 <= (r * self.CELL_SIZE)**2:
+                break
+        return best_seg, best_t
+
+    def nearest_many(self, px: np.ndarray,
+                     py: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Closest segment of every point.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: segment indices and positions in [0, 1]
+        """
+        if px.size * self.ax.size > self.DENSE_LIMIT:
+            res = [self.nearest(x, y) for x, y in zip(px, py)]
+            return (np.array([r[0] for r in res], dtype=int),
+                    np.array([r[1] for r in res], dtype=float))
+        # 点数与线段数都不多时，一次计算所有点到所有线段的距离
+        t = ((px[:, None] - self.ax) * self.vx +
+             (py[:, None] - self.ay) * self.vy) / self.len2
+        t = np.clip(t, 0.0, 1.0)
+        ex = self.ax + t * self.vx - px[:, None]
+        ey = self.ay + t * self.vy - py[:, None]
+        segs = np.argmin(ex * ex + ey * ey, axis=1)
+        return segs, t[np.arange(px.size), segs]
+
 
 class Spline2D:
     """A 2 dimensional Spline with x coordinates and y coordinates are 1d spline 
@@ -127,6 +321,7 @@ class Spline2D:
 
         self.x_list = x_list
         self.y_list = y_list
+        self.segment_index: SegmentIndex = None  # built at the first projection
 
     def get_x_list(self):
         return self.x_list
@@ -227,6 +422,86 @@ class Spline2D:
         yaw = np.fmod(yaw, np.pi)
         return x, y, speed, yaw
 
+    def calc_position_many(self, pos_s: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Array version of calc_position.
+
+        Args:
+            pos_s (np.ndarray): longitudinal coordinates
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: x and y coordinates of every (s, 0)
+        """
+        return (self.sx.calculate_approximation_many(pos_s),
+                self.sy.calculate_approximation_many(pos_s))
+
+    def calc_curvature_many(self, pos_s: np.ndarray) -> np.ndarray:
+        """Array version of calc_curvature.
+
+        Args:
+            pos_s (np.ndarray): longitudinal coordinates
+
+        Returns:
+            np.ndarray: curvature (absolute value) at every (s, 0)
+        """
+        dx = self.sx.calculate_derivative_many(pos_s)
+        ddx = self.sx.calculate_second_derivative_many(pos_s)
+        dy = self.sy.calculate_derivative_many(pos_s)
+        ddy = self.sy.calculate_second_derivative_many(pos_s)
+        return np.abs(ddy * dx - ddx * dy) / ((dx**2 + dy**2)**1.5)
+
+    def calc_curvature_derivative_many(self, pos_s: np.ndarray) -> np.ndarray:
+        """Array version of calc_curvature_derivative.
+
+        Args:
+            pos_s (np.ndarray): longitudinal coordinates
+
+        Returns:
+            np.ndarray: derivative of curvature at every (s, 0)
+        """
+        dx = self.sx.calculate_derivative_many(pos_s)
+        ddx = self.sx.calculate_second_derivative_many(pos_s)
+        dddx = self.sx.calculate_third_derivative_many(pos_s)
+        dy = self.sy.calculate_derivative_many(pos_s)
+        ddy = self.sy.calculate_second_derivative_many(pos_s)
+        dddy = self.sy.calculate_third_derivative_many(pos_s)
+
+        a = dx * ddy - dy * ddx
+        b = dx * dddy - dy * dddx
+        c = dx * ddx + dy * ddy
+        d = dx * dx + dy * dy
+        return (b * d - 3.0 * a * c) / (d * d * d)**(2.5)
+
+    def calc_yaw_many(self, pos_s: np.ndarray) -> np.ndarray:
+        """Array version of calc_yaw.
+
+        Args:
+            pos_s (np.ndarray): longitudinal coordinates
+
+        Returns:
+            np.ndarray: yaw angles in radians
+        """
+        dx = self.sx.calculate_derivative_many(pos_s)
+        dy = self.sy.calculate_derivative_many(pos_s)
+        return np.arctan2(dy, dx)
+
+    def frenet_to_cartesian1D_many(
+            self, pos_s: np.ndarray,
+            pos_d: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Array version of frenet_to_cartesian1D.
+
+        Args:
+            pos_s (np.ndarray): longitudinal coordinates
+            pos_d (np.ndarray | float): lateral coordinates
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: x and y coordinates of every (s, d)
+        """
+        rx, ry = self.calc_position_many(pos_s)
+        ryaw = self.calc_yaw_many(pos_s)
+        x = rx - np.sin(ryaw) * pos_d
+        y = ry + np.cos(ryaw) * pos_d
+        return x, y
+
     def cartesian_to_frenet1D(self, pos_x: float, pos_y: float) -> Tuple[float, float]:
         """Given the cartesian coordinate (pos_x, pos_y), computes its frenet coordinate
 
@@ -258,11 +533,94 @@ class Spline2D:
         d_d = speed * np.cos(yaw - r_yaw)
         return s, d, s_d, d_d
 
+    def cartesian_to_frenet1D_many(
+            self, pos_x: np.ndarray,
+            pos_y: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Array version of cartesian_to_frenet1D.
+
+        Args:
+            pos_x (np.ndarray): x coordinates
+            pos_y (np.ndarray): y coordinates
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: the corresponding frenet coordinates (s, d)
+        """
+        pos_x = np.asarray(pos_x, dtype=float)
+        pos_y = np.asarray(pos_y, dtype=float)
+        s = self.project_many(pos_x, pos_y)
+        rx, ry = self.calc_position_many(s)
+        ryaw = self.calc_yaw_many(s)
+
+        dx = pos_x - rx
+        dy = pos_y - ry
+        cross_rd_nd = np.cos(ryaw) * dy - np.sin(ryaw) * dx
+        d = np.copysign(np.hypot(dx, dy), cross_rd_nd)
+        return s, d
+
+    # The projection may extrapolate this far beyond both ends of the line,
+    # so that points slightly before/after the line keep a continuous s.
+    PROJECTION_MARGIN = 10.0  # [m]
+    NEWTON_ITERATIONS = 5
+
+    def build_segment_index(self) -> SegmentIndex:
+        margin = self.PROJECTION_MARGIN
+        num = max(int(math.ceil(
+            (self.s[-1] - self.s[0] + 2 * margin) / SegmentIndex.SEGMENT_STEP)) + 1,
+            self.s.size)
+        ps = np.linspace(self.s[0] - margin, self.s[-1] + margin, num)
+        px, py = self.calc_position_many(ps)
+        self.segment_index = SegmentIndex(ps, px, py)
+        return self.segment_index
+
+    def _refine_projection(self, seg: np.ndarray, t: np.ndarray,
+                           pos_x: np.ndarray, pos_y: np.ndarray) -> np.ndarray:
+        """Newton iterations on (x(s) - pos_x)^2 + (y(s) - pos_y)^2, starting
+           from the projection on the closest polyline segment.
+        """
+        ps = self.segment_index.s
+        step = ps[1] - ps[0]
+        s = ps[seg] + t * step
+        # 只在所选线段附近搜索
+        lower = np.maximum(ps[seg] - step, ps[0])
+        upper = np.minimum(ps[seg] + 2 * step, ps[-1])
+        for _ in range(self.NEWTON_ITERATIONS):
+            x, y = self.calc_position_many(s)
+            dx = self.sx.calculate_derivative_many(s)
+            dy = self.sy.calculate_derivative_many(s)
+            ddx = self.sx.calculate_second_derivative_many(s)
+            ddy = self.sy.calculate_second_derivative_many(s)
+            ex, ey = x - pos_x, y - pos_y
+            grad = ex * dx + ey * dy
+            hess = dx * dx + dy * dy + ex * ddx + ey * ddy
+            delta = np.where(hess > 1e-9, grad / np.where(hess > 1e-9, hess, 1.0), 0.0)
+            s = np.clip(s - delta, lower, upper)
+            if np.max(np.abs(delta)) < 1e-6:
+                break
+        return s
+
+    def project_many(self, pos_x: np.ndarray, pos_y: np.ndarray) -> np.ndarray:
+        """find the closest s on reference line for a batch of points
+
+        Args:
+            pos_x (np.ndarray): x coordinates
+            pos_y (np.ndarray): y coordinates
+
+        Returns:
+            np.ndarray: the corresponding s coordinates on reference line
+        """
+        if self.segment_index is None:
+            self.build_segment_index()
+        pos_x = np.asarray(pos_x, dtype=float)
+        pos_y = np.asarray(pos_y, dtype=float)
+        seg, t = self.segment_index.nearest_many(pos_x, pos_y)
+        return self._refine_projection(seg, t, pos_x, pos_y)
+
     def find_nearest_rs(self, pos_x: float, pos_y: float) -> float:
         """find the closest frenet coordinate on reference line, i.e.
            argmin_{s} (x(s, 0) - pos_x)^2 + (y(s, 0) - pos_y)^2
            where x(s, 0), y(s, 0) are the cartesian coordinates of (s, 0)
-           The computation is from coarse to fine to reduce computational burden.
+           The closest segment of the sampled polyline is looked up in a grid
+           index, then refined with Newton iterations.
 
         Args:
             pos_x (float): x coordinate
@@ -271,15 +629,9 @@ class Spline2D:
         Returns:
             float: the corresponding s coordinate on reference line
         """
-        precision_list = [5, 1, 0.05]
-        left, right = self.s[0], self.s[-1]
-        for precision in precision_list:
-            refined_s = np.arange(left, right + precision, precision)
-            positions = np.array([list(self.calc_position(s)) for s in refined_s])
-            dists = np.linalg.norm(positions - np.array([pos_x, pos_y]), axis=1)
-            ri = np.argmin(dists)
-            rs = refined_s[ri]
-            
-            left, right = rs - precision, rs + precision
-
-        return rs
+        if self.segment_index is None:
+            self.build_segment_index()
+        seg, t = self.segment_index.nearest(pos_x, pos_y)
+        s = self._refine_projection(np.array([seg]), np.array([t]),
+                                    pos_x, pos_y)
+        return float(s[0])
@@ -13,4 +13,13 @@ def deepcopy(data):
     # use pickle to deepcopy, it's faster than copy.deepcopy
     data_copied = pickle.loads(pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL))
     assert type(data) == type(data_copied)
-    return data_copied
\ No newline at end of file
+    return data_copied
+
+
+def clone(data):
+    # State, Trajectory, control_Vehicle and RoadGraph provide a structural clone(),
+    # which is much faster than the pickle round trip
+    clone_method = getattr(data, "clone", None)
+    if clone_method is not None:
+        return clone_method()
+    return deepcopy(data)
\ No newline at end of file
@@ -0,0 +1,20 @@
+"""
+dearpygui 的延迟导入：
+模块中以 `from utils.lazy_dpg import dpg` 代替 `import dearpygui.dearpygui as dpg`，
+只有第一次访问 dpg 的属性时才真正导入 dearpygui，无界面（headless）运行时不会加载。
+"""
+import importlib
+
+
+class LazyModule:
+    def __init__(self, name: str) -> None:
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attr: str):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return getattr(self._module, attr)
+
+
+dpg = LazyModule('dearpygui.dearpygui')
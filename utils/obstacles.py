@@ -1,9 +1,10 @@
+from __future__ import annotations
 from abc import ABC
 from enum import IntEnum
-import dearpygui.dearpygui as dpg
 import numpy as np
 
 from trafficManager.common.coord_conversion import cartesian_to_frenet2D
+from utils.lazy_dpg import dpg
 from trajectory import State, Trajectory
 from simBase import CoordTF
 from separate_axis_theorem import separate_axis_theorem
@@ -88,15 +88,11 @@ class AbstractLane(ABC):
             return
             
         s = np.linspace(0, self.course_spline.s[-1], num=50)
-        self.center_line = [
-            self.course_spline.calc_position(si) for si in s
-        ]
-        self.left_bound = [
-            self.course_spline.frenet_to_cartesian1D(si, self.width / 2) for si in s
-        ]
-        self.right_bound = [
-            self.course_spline.frenet_to_cartesian1D(si, -self.width / 2) for si in s
-        ]
+        self.center_line = list(zip(*self.course_spline.calc_position_many(s)))
+        self.left_bound = list(zip(
+            *self.course_spline.frenet_to_cartesian1D_many(s, self.width / 2)))
+        self.right_bound = list(zip(
+            *self.course_spline.frenet_to_cartesian1D_many(s, -self.width / 2)))
 
 
 @dataclass
@@ -190,6 +186,15 @@ class RoadGraph:
             logging.debug(f"cannot find lane {lane_id}")
             return None
 
+    def clone(self) -> RoadGraph:
+        """
+        Copy the lane indexes of the road graph. Lane and edge objects are shared,
+        their geometry (course_spline) is read-only after the network is built.
+        """
+        return RoadGraph(edges=dict(self.edges),
+                         lanes=dict(self.lanes),
+                         junction_lanes=dict(self.junction_lanes))
+
     def get_next_lane(self, lane_id: str) -> AbstractLane:
         lane = self.get_lane_by_id(lane_id)
         if isinstance(lane, NormalLane):
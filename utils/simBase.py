@@ -1,5 +1,5 @@
-import dearpygui.dearpygui as dpg
 from typing import Tuple
+from utils.lazy_dpg import dpg
 class CoordTF:
     # Ego is always in the center of the window
     def __init__(self, realSize: float, windowTag: str) -> None:
@@ -11,7 +11,6 @@ from utils.cubic_spline import Spline2D
 import numpy as np
 from dataclasses import dataclass, field
 from collections import deque
-import warnings
 import math
 
 import logger
@@ -121,6 +120,12 @@ class State(CertesianState, FrenetState):
         if self.vel == 0 and self.s_d != 0:
             self.vel = math.sqrt(self.s_d**2 + self.d_d**2)
 
+    def clone(self) -> State:
+        """fast copy: all fields are immutable scalars, so copying the instance dict is enough"""
+        state = object.__new__(type(self))
+        state.__dict__.update(self.__dict__)
+        return state
+
     """
     Modified from: https://blog.csdn.net/u013468614/article/details/108748016
     """
@@ -192,6 +197,14 @@ class Trajectory:
         last_state = self.states.pop(0)
         return last_state.x, last_state.y, last_state.yaw, last_state.vel, last_state.acc, last_state.laneID, last_state.s, last_state.routeIdx
 
+    def to_arrays(self, start: int = 0) -> ArrayTrajectory:
+        """copy states[start:] into a columnar ArrayTrajectory"""
+        return ArrayTrajectory.from_states(self.states[start:], self.cost)
+
+    def clone(self) -> Trajectory:
+        """fast copy: states are popped and modified in place, so every state is cloned"""
+        return Trajectory([state.clone() for state in self.states], self.cost)
+
     @property
     def xQueue(self) -> deque[float]:
         return deque([state.x for state in self.states])
@@ -253,93 +266,409 @@ class Trajectory:
 
     # 定义方法：将当前轨迹转换为笛卡尔坐标系下的状态
     def frenet_to_cartesian(self, lanes: list[AbstractLane],
-                            init_state: State) -> None:
-        warnings.filterwarnings("error")
-        if not isinstance(lanes, list):
-            lanes = [lanes]
-        lane_idx = 0
-        already_s = 0
-        for i in range(len(self.states)):
-            csp = lanes[lane_idx].course_spline
-            # 检查course_spline是否为空
-            if csp is None:
-                logging.warning("course_spline is None for lane %s", lanes[lane_idx].id)
+                            init_state: State) -> bool:
+        """
+        return whether the converted trajectory is valid (not empty and all
+        x, y, yaw, vel, acc are finite)
+        """
+        return bool(Trajectory.batch_frenet_to_cartesian([self], lanes, init_state)[0])
+
+    # 定义静态方法：将多条轨迹一次性转换为笛卡尔坐标系下的状态
+    @staticmethod
+    def batch_frenet_to_cartesian(paths: list[Trajectory],
+                                  lanes: list[AbstractLane],
+                                  init_state: State) -> np.ndarray:
+        """
+        Convert candidate paths on the same lanes in place. States with the
+        same length are stacked into arrays and converted with a few numpy
+        calls per lane. States beyond the last lane are removed.
+        return a bool mask of the paths whose conversion is valid
+        """
+        valid = np.zeros(len(paths), dtype=bool)
+        # 同一条轨迹可能在候选列表中出现多次，只转换一次
+        first: dict[int, int] = {}
+        groups: dict[int, list[int]] = {}
+        for i, path in enumerate(paths):
+            if id(path) not in first:
+                first[id(path)] = i
+                groups.setdefault(len(path.states), []).append(i)
+
+        for n, idxs in groups.items():
+            if n == 0:
                 continue
-            if self.states[i].s - already_s > csp.s[-1] - 0.1:
-                if lane_idx < len(lanes) - 1:
-                    lane_idx += 1
-                    # caution: 0.1 is the overlap length
-                    already_s += csp.s[-1] - 0.1
-                    csp = lanes[lane_idx].course_spline
-                    # 检查新的course_spline是否为空
-                    if csp is None:
-                        logging.warning("course_spline is None for lane %s", lanes[lane_idx].id)
-                        continue
-                else:
-                    del self.states[i:]
-                    break
-            rx, ry = csp.calc_position(self.states[i].s - already_s)
-            ryaw = csp.calc_yaw(self.states[i].s - already_s)
-            rkappa = csp.calc_curvature(self.states[i].s - already_s)
-            self.states[i].complete_cartesian2D(rx, ry, ryaw, rkappa)
-            self.states[i].laneID = lanes[lane_idx].id
-
-        # deal with all state with state.yaw =none
-        for i in range(len(self.states)):
-            if self.states[i].yaw is None:
-                if i == 0:
-                    self.states[i].yaw = init_state.yaw
-                else:
-                    self.states[i].yaw = self.states[i - 1].yaw
-
-        for i in range(len(self.states)):
-            if len(self.states) == 1:
-                self.states[0].acc = init_state.acc
+            cols = np.array([[(state.t, state.s, state.s_d, state.d, state.d_d)
+                              for state in paths[i].states] for i in idxs],
+                            dtype=float)
+            t, s, s_d, d, d_d = np.moveaxis(cols, -1, 0)
+            columns, keep, ok, laneIDs = lanes_frenet_to_cartesian(
+                lanes, t, s, s_d, d, d_d, init_state)
+            if laneIDs is None:
                 break
-            if i == len(self.states) - 1:
-                self.states[-1].acc = self.states[-2].acc
-            else:
-                self.states[i].acc = (self.states[i + 1].vel - self.states[i].vel
-                                      ) / (self.states[i + 1].t - self.states[i].t)
-
-        # https://blog.csdn.net/m0_37454852/article/details/86514444
-        # https://baike.baidu.com/item/%E6%9B%B2%E7%8E%87/9985286
-        for i in range(1, len(self.states) - 1):
-            try:
-                dy = ((self.states[i + 1].y - self.states[i].y) /
-                      (self.states[i + 1].x - self.states[i].x) +
-                      (self.states[i].y - self.states[i - 1].y) /
-                      (self.states[i].x - self.states[i - 1].x)) / 2
-                ddy = ((self.states[i + 1].y - self.states[i].y) /
-                       (self.states[i + 1].x - self.states[i].x) -
-                       (self.states[i].y - self.states[i - 1].y) /
-                       (self.states[i].x - self.states[i - 1].x)) / (
-                           (self.states[i + 1].x - self.states[i - 1].x) / 2)
-            except RuntimeWarning:
-                self.states[i].cur = 0
-                continue
-            k = abs(ddy) / (1 + dy**2)**1.5
-            self.states[i].cur = k
-        # insert the first and last point
-        if (len(self.states) >= 3):
-            self.states[0].cur = self.states[1].cur
-            self.states[-1].cur = self.states[-2].cur
-
-        return
+            for r, i in enumerate(idxs):
+                m = keep[r]
+                states = paths[i].states
+                del states[m:]
+                rows = zip(*(columns[key][r, :m].tolist() for key in
+                             ('x', 'y', 's_d', 'vel', 'yaw', 'acc', 'cur', 'laneIdx')))
+                for state, (sx, sy, ssd, svel, syaw, sacc, scur, k) in zip(states, rows):
+                    state.x, state.y, state.s_d, state.vel = sx, sy, ssd, svel
+                    state.yaw, state.acc = syaw, sacc
+                    if m >= 3:
+                        state.cur = scur
+                    state.laneID = laneIDs[k]
+                valid[i] = ok[r]
+
+        for i, path in enumerate(paths):
+            valid[i] = valid[first[id(path)]]
+        return valid
 
     # 定义方法：将当前轨迹转换为Frenet坐标系下的状态
     def cartesian_to_frenet(self, csp: Spline2D) -> None:
         """
         Where s is by default monotonically increasing in the direction of the trajectory, and only the s,s',d,d' coordinates are updated
         """
+        if not self.states:
+            return
+        # Step 1: project all states onto the reference line at once
+        rs = csp.project_many([state.x for state in self.states],
+                              [state.y for state in self.states])
+
+        # Step 2: cartesian_to_frenet1D
+        rx, ry = csp.calc_position_many(rs)
+        ryaw = csp.calc_yaw_many(rs)
+        rkappa = csp.calc_curvature_many(rs)
         for index, state in enumerate(self.states):
-            rs = csp.find_nearest_rs(state.x, state.y)
-
-            # Step 2: cartesian_to_frenet1D
-            rx, ry = csp.calc_position(rs)
-            ryaw = csp.calc_yaw(rs)
-            rkappa = csp.calc_curvature(rs)
-            state.complete_frenet2D(rs, rx, ry, ryaw, rkappa)
+            state.complete_frenet2D(rs[index], rx[index], ry[index],
+                                    ryaw[index], rkappa[index])
 
     def is_nonholonomic(self) -> bool:
         return all([state.s_d < 1.5 * state.d_d] for state in self.states)
+
+
+def _cartesian_from_reference(rx: np.ndarray, ry: np.ndarray, ryaw: np.ndarray,
+                              rkappa: np.ndarray, s_d: np.ndarray, d: np.ndarray,
+                              d_d: np.ndarray) -> tuple[np.ndarray, ...]:
+    """
+    Array version of State.complete_cartesian2D.
+    return x, y, s_d, vel, yaw; yaw is nan where s_d <= 0.1
+    """
+    x = rx - np.sin(ryaw) * d
+    y = ry + np.cos(ryaw) * d
+    stopped = s_d <= 1e-1
+    s_d = np.where(stopped, 1e-1, s_d)
+    with np.errstate(all='ignore'):
+        vel = np.sqrt((1 - rkappa * d)**2 * s_d**2 + d_d**2)
+        yaw = np.arcsin(d_d / vel) + ryaw
+    vel = np.where(stopped, 1e-1, vel)
+    yaw = np.where(stopped, np.nan, yaw)
+    return x, y, s_d, vel, yaw
+
+
+def _complete_kinematics(t: np.ndarray, x: np.ndarray, y: np.ndarray,
+                         vel: np.ndarray, yaw: np.ndarray, init_yaw: float,
+                         init_acc: float) -> tuple[np.ndarray, ...]:
+    """
+    Fill the missing yaw, compute acc and curvature along the last axis.
+    return yaw, acc, cur
+    """
+    n = t.shape[-1]
+    # 缺失的航向角沿用上一个状态的航向角，第一个状态沿用 init_yaw
+    head = np.full(yaw.shape[:-1] + (1,), np.nan if init_yaw is None else init_yaw)
+    yaw = np.concatenate((head, yaw), axis=-1)
+    idx = np.where(np.isnan(yaw), 0, np.arange(n + 1))
+    np.maximum.accumulate(idx, axis=-1, out=idx)
+    yaw = np.take_along_axis(yaw, idx, axis=-1)[..., 1:]
+
+    acc = np.empty_like(vel)
+    if n == 1:
+        acc[..., 0] = init_acc
+    else:
+        with np.errstate(all='ignore'):
+            acc[..., :-1] = np.diff(vel, axis=-1) / np.diff(t, axis=-1)
+        acc[..., -1] = acc[..., -2]
+
+    # https://blog.csdn.net/m0_37454852/article/details/86514444
+    # https://baike.baidu.com/item/%E6%9B%B2%E7%8E%87/9985286
+    cur = np.zeros_like(x)
+    if n >= 3:
+        with np.errstate(all='ignore'):
+            k = np.diff(y, axis=-1) / np.diff(x, axis=-1)
+            dy = (k[..., 1:] + k[..., :-1]) / 2
+            ddy = (k[..., 1:] - k[..., :-1]) / ((x[..., 2:] - x[..., :-2]) / 2)
+            inner = np.abs(ddy) / (1 + dy**2)**1.5
+        # 除零或溢出的点曲率记为0
+        cur[..., 1:-1] = np.where(np.isfinite(inner), inner, 0.0)
+        cur[..., 0] = cur[..., 1]
+        cur[..., -1] = cur[..., -2]
+    return yaw, acc, cur
+
+
+def _finite_rows(*columns: np.ndarray) -> np.ndarray:
+    """rows whose values are all finite in every column"""
+    ok = np.ones(columns[0].shape[:-1], dtype=bool)
+    for column in columns:
+        ok &= np.isfinite(column).all(axis=-1)
+    return ok
+
+
+def frenet_to_cartesian_many(csp: Spline2D, t: np.ndarray, s: np.ndarray,
+                             s_d: np.ndarray, d: np.ndarray, d_d: np.ndarray,
+                             init_yaw: float = 0.0, init_acc: float = 0.0
+                             ) -> tuple[dict[str, np.ndarray], np.ndarray]:
+    """
+    Convert one or many candidate paths of shape (n_paths, n_points) against
+    a lane's spline, s is measured along the spline.
+    return the columns x, y, yaw, vel, acc, cur, s_d and a bool mask of the
+    paths whose values are all finite; errors never raise
+    """
+    t, s, s_d, d, d_d = (np.atleast_2d(np.asarray(a, dtype=float))
+                         for a in np.broadcast_arrays(t, s, s_d, d, d_d))
+    rx, ry = csp.calc_position_many(s)
+    ryaw = csp.calc_yaw_many(s)
+    rkappa = csp.calc_curvature_many(s)
+    x, y, s_d, vel, yaw = _cartesian_from_reference(rx, ry, ryaw, rkappa, s_d, d, d_d)
+    yaw, acc, cur = _complete_kinematics(t, x, y, vel, yaw, init_yaw, init_acc)
+    columns = {'x': x, 'y': y, 'yaw': yaw, 'vel': vel, 'acc': acc, 'cur': cur, 's_d': s_d}
+    return columns, _finite_rows(x, y, yaw, vel, acc)
+
+
+def lanes_frenet_to_cartesian(lanes: list[AbstractLane], t: np.ndarray,
+                              s: np.ndarray, s_d: np.ndarray, d: np.ndarray,
+                              d_d: np.ndarray, init_state: State
+                              ) -> tuple[dict[str, np.ndarray], np.ndarray,
+                                         np.ndarray, list[str]]:
+    """
+    Convert stacked (n_paths, n_points) Frenet states along consecutive lanes,
+    s is measured from the start of the first lane.
+    return
+        columns: x, y, yaw, vel, acc, cur, s_d and laneIdx (index into laneIDs),
+                 points beyond keep are nan
+        keep: number of leading points of every path that lie on the lanes
+        valid: bool mask of the paths that are not empty and all finite
+        laneIDs: IDs of the usable lanes, None if the first lane has no spline
+    """
+    if not isinstance(lanes, list):
+        lanes = [lanes]
+    # 可用车道截止到第一条没有 course_spline 的车道
+    splines = []
+    for lane in lanes:
+        if lane.course_spline is None:
+            logging.warning("course_spline is None for lane %s", lane.id)
+            break
+        splines.append(lane.course_spline)
+    n_paths = s.shape[0]
+    if not splines:
+        return {}, np.zeros(n_paths, dtype=int), np.zeros(n_paths, dtype=bool), None
+    laneIDs = [lane.id for lane in lanes[:len(splines)]]
+    # 第k条车道覆盖 (bounds[k-1], bounds[k]]，caution: 0.1 is the overlap length
+    bounds = np.cumsum([csp.s[-1] - 0.1 for csp in splines])
+    offsets = np.concatenate(([0.0], bounds[:-1]))
+
+    # 车道索引只增不减，超出最后一条车道的状态被截断
+    laneIdx = np.maximum.accumulate(np.searchsorted(bounds, s), axis=1)
+    onLane = laneIdx < len(splines)
+    laneIdx = np.minimum(laneIdx, len(splines) - 1)
+    local_s = s - offsets[laneIdx]
+    rx, ry, ryaw, rkappa = (np.zeros_like(s) for _ in range(4))
+    for k, csp in enumerate(splines):
+        mask = (laneIdx == k) & onLane
+        if mask.any():
+            rx[mask], ry[mask] = csp.calc_position_many(local_s[mask])
+            ryaw[mask] = csp.calc_yaw_many(local_s[mask])
+            rkappa[mask] = csp.calc_curvature_many(local_s[mask])
+    x, y, s_d, vel, yaw = _cartesian_from_reference(rx, ry, ryaw, rkappa, s_d, d, d_d)
+
+    keep = onLane.sum(axis=1)
+    acc, cur = np.full_like(s, np.nan), np.full_like(s, np.nan)
+    valid = np.zeros(n_paths, dtype=bool)
+    for m in np.unique(keep):
+        if m == 0:
+            continue
+        rows = np.flatnonzero(keep == m)
+        yaw[rows, :m], acc[rows, :m], cur[rows, :m] = _complete_kinematics(
+            t[rows, :m], x[rows, :m], y[rows, :m], vel[rows, :m],
+            yaw[rows, :m], init_state.yaw, init_state.acc)
+        valid[rows] = _finite_rows(x[rows, :m], y[rows, :m], yaw[rows, :m],
+                                   vel[rows, :m], acc[rows, :m])
+    beyond = ~onLane
+    for column in (x, y, s_d, vel, yaw):
+        column[beyond] = np.nan
+    columns = {'x': x, 'y': y, 'yaw': yaw, 'vel': vel, 'acc': acc, 'cur': cur,
+               's_d': s_d, 'laneIdx': laneIdx}
+    return columns, keep, valid, laneIDs
+
+
+# 列式轨迹中以 float64 数组存储的字段
+ARRAY_FIELDS = ('t', 's', 's_d', 's_dd', 'd', 'd_d', 'd_dd', 'x', 'y', 'yaw',
+                'vel', 'acc', 'cur')
+
+
+class StateView:
+    """
+    Lazy view of one state of an ArrayTrajectory. It reads and writes the
+    trajectory arrays and exposes the same attributes as State, so code
+    written for Trajectory.states keeps working.
+    """
+    __slots__ = ('_traj', '_idx')
+
+    def __init__(self, traj: ArrayTrajectory, idx: int) -> None:
+        object.__setattr__(self, '_traj', traj)
+        object.__setattr__(self, '_idx', idx)
+
+    def __getattr__(self, name: str):
+        traj = self._traj
+        if name in traj.columns:
+            return float(traj.columns[name][self._idx])
+        if name == 'laneID':
+            return traj.laneID[self._idx]
+        if name == 'routeIdx':
+            return int(traj.routeIdx[self._idx])
+        if name == 'stop_flag':
+            return bool(traj.stop_flag[self._idx])
+        if name in State.__dataclass_fields__:
+            # 未存储的字段（如 s_ddd、d_ddd）取 State 的默认值
+            return State.__dataclass_fields__[name].default
+        raise AttributeError(name)
+
+    def __setattr__(self, name: str, value) -> None:
+        traj = self._traj
+        if name in traj.columns:
+            traj.columns[name][self._idx] = value
+        elif name == 'laneID':
+            traj.laneID[self._idx] = value
+        elif name == 'routeIdx':
+            traj.routeIdx[self._idx] = value
+        elif name == 'stop_flag':
+            traj.stop_flag[self._idx] = value
+        else:
+            raise AttributeError(name)
+
+    def to_state(self) -> State:
+        return State(laneID=self.laneID, routeIdx=self.routeIdx,
+                     stop_flag=self.stop_flag,
+                     **{name: getattr(self, name) for name in ARRAY_FIELDS})
+
+
+class ArrayTrajectory:
+    """
+    Columnar trajectory: one contiguous numpy array per field in
+    ARRAY_FIELDS, plus laneID / routeIdx / stop_flag. Popping the first
+    state only moves `head`, and the queue properties are array views
+    instead of deques rebuilt on every access.
+    """
+
+    def __init__(self, data: np.ndarray, laneID: list, routeIdx: np.ndarray,
+                 stop_flag: np.ndarray, cost: float = 0.0) -> None:
+        # data: shape (len(ARRAY_FIELDS), n)，每一行为一个字段
+        self.data = data
+        self.columns: dict[str, np.ndarray] = dict(zip(ARRAY_FIELDS, data))
+        self.laneID = laneID
+        self.routeIdx = routeIdx
+        self.stop_flag = stop_flag
+        self.cost = cost
+        self.head = 0 # 第一个未弹出状态的下标
+
+    @classmethod
+    def from_states(cls, states: list[State], cost: float = 0.0) -> ArrayTrajectory:
+        n = len(states)
+        # yaw 为 None 的状态存为 nan
+        data = np.array([[getattr(state, name) for name in ARRAY_FIELDS]
+                         for state in states], dtype=float).reshape(n, len(ARRAY_FIELDS))
+        return cls(np.ascontiguousarray(data.T),
+                   [state.laneID for state in states],
+                   np.array([state.routeIdx for state in states], dtype=int),
+                   np.array([state.stop_flag for state in states], dtype=bool),
+                   cost)
+
+    @classmethod
+    def from_columns(cls, cost: float = 0.0, laneID: list = None,
+                     routeIdx=None, stop_flag=None, **columns) -> ArrayTrajectory:
+        """由各字段的序列构造轨迹，未给出的字段取 State 的默认值"""
+        n = len(next(iter(columns.values()))) if columns else 0
+        data = np.empty((len(ARRAY_FIELDS), n))
+        for row, name in enumerate(ARRAY_FIELDS):
+            if name in columns:
+                data[row] = columns[name]
+            else:
+                data[row] = State.__dataclass_fields__[name].default
+        return cls(data,
+                   list(laneID) if laneID is not None else [None] * n,
+                   np.asarray(routeIdx, dtype=int) if routeIdx is not None else np.zeros(n, dtype=int),
+                   np.asarray(stop_flag, dtype=bool) if stop_flag is not None else np.zeros(n, dtype=bool),
+                   cost)
+
+    def __len__(self):
+        return self.data.shape[1] - self.head
+
+    def state(self, i: int) -> StateView:
+        if i < 0:
+            i += len(self)
+        return StateView(self, self.head + i)
+
+    @property
+    def states(self) -> list[StateView]:
+        return [StateView(self, i) for i in range(self.head, self.data.shape[1])]
+
+    def to_trajectory(self) -> Trajectory:
+        return Trajectory([view.to_state() for view in self.states], self.cost)
+
+    def clone(self) -> ArrayTrajectory:
+        """copy the arrays of the unpopped states"""
+        h = self.head
+        return ArrayTrajectory(self.data[:, h:].copy(), self.laneID[h:],
+                               self.routeIdx[h:].copy(), self.stop_flag[h:].copy(), self.cost)
+
+    def pop_last_state(self) -> tuple:
+        """
+        return the last state of the trajectory:
+        x, y, yaw, vel, acc, stop_flag
+        """
+        i = self.head
+        self.head += 1
+        c = self.columns
+        return (float(c['x'][i]), float(c['y'][i]), float(c['yaw'][i]),
+                float(c['vel'][i]), float(c['acc'][i]), bool(self.stop_flag[i]))
+
+    def pop_last_state_r(self) -> tuple:
+        """
+        return the last state of the trajectory for replay model:
+        x, y, yaw, vel, acc, laneID, lanPos, routeIdx
+        """
+        i = self.head
+        self.head += 1
+        c = self.columns
+        return (float(c['x'][i]), float(c['y'][i]), float(c['yaw'][i]),
+                float(c['vel'][i]), float(c['acc'][i]), self.laneID[i],
+                float(c['s'][i]), int(self.routeIdx[i]))
+
+    @property
+    def xQueue(self) -> np.ndarray:
+        return self.columns['x'][self.head:]
+
+    @property
+    def yQueue(self) -> np.ndarray:
+        return self.columns['y'][self.head:]
+
+    @property
+    def yawQueue(self) -> np.ndarray:
+        return self.columns['yaw'][self.head:]
+
+    @property
+    def velQueue(self) -> np.ndarray:
+        return self.columns['vel'][self.head:]
+
+    @property
+    def accQueue(self) -> np.ndarray:
+        return self.columns['acc'][self.head:]
+
+    @property
+    def laneIDQueue(self) -> list[str]:
+        return self.laneID[self.head:]
+
+    @property
+    def lanePosQueue(self) -> np.ndarray:
+        return self.columns['s'][self.head:]
+
+    @property
+    def routeIdxQueue(self) -> np.ndarray:
+        return self.routeIdx[self.head:]